@@ -2,17 +2,92 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from datetime import datetime
-from utils.helpers import formatar_preco, formatar_nomes_colunas, formatar_colunas_historico
+from utils.helpers import formatar_precos, formatar_nomes_colunas, formatar_colunas_historico
 from core.gerenciamento_estoque import (
     carregar_produtos, adicionar_produto, editar_produto,
-    remover_produto, buscar_produto, registrar_movimentacao,
-    verificar_estoque_baixo, carregar_movimentacoes, criar_tabelas_movimentacoes, 
-    criar_tabelas_produtos
+    remover_produto, registrar_movimentacao,
+    criar_tabelas_movimentacoes,
+    criar_tabelas_produtos, ConflitoVersao
 )
+from core import metricas, mudancas
+from core.cache import versao_dados
+from core.classificacao import ROTULOS
+from core.consultas import (
+    buscar_movimentacoes, contar_produtos, opcoes_filtro_historico, opcoes_filtro_produtos, pagina_produtos
+)
+from core.relatorios import lucratividade_categorias, serie_movimentacoes
+from core.reposicao import planejar_reposicao
+from utils import config
 
 st.set_page_config(page_title="Estoque Inteligente", layout="wide")
 st.title("📦 Estoque Inteligente")
 
+ROTULOS_GRANULARIDADE = {"dia": "dia", "semana": "semana", "mes": "mês"}
+ROTULOS_ORDENACAO = {
+    "id_produto": "ID Produto",
+    "nome": "Nome",
+    "categoria": "Categoria",
+    "preco_unitario": "Preço Unitário",
+    "estoque_atual": "Estoque Atual",
+}
+
+# Trechos ao vivo (`st.fragment`) são reexecutados sozinhos a cada
+# intervalo; None desliga a atualização automática
+INTERVALO_AO_VIVO = config.MUDANCAS_INTERVALO_S or None
+
+# Leituras em cache, chaveadas pela versão dos dados: a de `core.cache`
+# (escritas deste processo) e a sequência do feed de `core.mudancas`
+# (escritas de qualquer processo, como o caixa de outro usuário ou a CLI).
+# Um rerun sem alterações não consulta o banco além da sequência.
+
+def _versao():
+    return versao_dados(), mudancas.ultima_sequencia()
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _produtos(versao):
+    return carregar_produtos()
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _mapa_produtos(versao):
+    """{id_produto: (nome, estoque_atual)} para selects e buscas por ID."""
+    produtos = _produtos(versao)
+    return dict(zip(
+        produtos["id_produto"].tolist(),
+        zip(produtos["nome"].tolist(), produtos["estoque_atual"].tolist()),
+    ))
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _lucratividade_categorias(versao, dias=30):
+    return lucratividade_categorias(dias)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _opcoes_produtos(versao):
+    return opcoes_filtro_produtos()
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _contar_produtos(versao, filtros):
+    return contar_produtos(filtros)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _pagina_produtos(versao, filtros, ordem, decrescente, limite, pagina):
+    return pagina_produtos(filtros, ordem, decrescente, limite, pagina)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _plano_reposicao(versao):
+    return planejar_reposicao()
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _opcoes_historico(versao):
+    return opcoes_filtro_historico()
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _pagina_movimentacoes(versao, filtros, limite, apos):
+    return buscar_movimentacoes(filtros, limite=limite, apos=apos)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _serie_movimentacoes(versao, filtros):
+    return serie_movimentacoes(filtros)
+
 def adicionar():
     st.subheader("➕ Adicionar Novo Produto")
     with st.form("form_adicionar"):
@@ -35,7 +110,8 @@ def adicionar():
 def editar():
     st.subheader("✏️ Editar Produto Existente")
     id_edit = st.number_input("ID do Produto a Editar", min_value=1, step=1)
-    produto_encontrado = buscar_produto(int(id_edit))
+    produtos = _produtos(_versao())
+    produto_encontrado = produtos[produtos["id_produto"] == int(id_edit)]
     if not produto_encontrado.empty:
         with st.form("form_editar"):
             nome = st.text_input("Nome", produto_encontrado.iloc[0]["nome"])
@@ -44,15 +120,23 @@ def editar():
             estoque = st.number_input("Estoque", value=produto_encontrado.iloc[0]["estoque_atual"])
             enviar = st.form_submit_button("Salvar Alterações")
 
-        if enviar:
+        # Versão do produto quando o formulário foi exibido (não a do rerun do envio)
+        chave_versao = f"versao_produto_{int(id_edit)}"
+        if not enviar:
+            st.session_state[chave_versao] = int(produto_encontrado.iloc[0]["versao"])
+        else:
             novos_dados = {
                 "nome": nome,
                 "categoria": categoria,
                 "preco_unitario": preco,
                 "estoque_atual": estoque
             }
-            editar_produto(int(id_edit), novos_dados)
-            st.success("Produto atualizado com sucesso!")
+            versao_lida = st.session_state.pop(chave_versao, None)
+            try:
+                editar_produto(int(id_edit), novos_dados, versao=versao_lida)
+                st.success("Produto atualizado com sucesso!")
+            except ConflitoVersao as e:
+                st.error(str(e))
     else:
         st.warning("ID não encontrado.")
 
@@ -63,76 +147,174 @@ def remover():
         remover_produto(int(id_remover))
         st.success("Produto removido com sucesso!")
 
+def _filtros_produtos(opcoes):
+    """Monta, na barra lateral, os filtros da grade (`core.consultas.filtro_produtos`)."""
+    categoria_filtro = st.sidebar.multiselect("Categoria (vazio = todas)", options=opcoes["categorias"])
+
+    preco_min, preco_max = float(opcoes["preco_min"]), float(opcoes["preco_max"])
+    if preco_min < preco_max:
+        faixa_preco = st.sidebar.slider("Faixa de Preço (R$)", min_value=preco_min, max_value=preco_max,
+                                        value=(preco_min, preco_max))
+    else:
+        faixa_preco = (preco_min, preco_max)
+
+    estoque_min, estoque_max = int(opcoes["estoque_min"]), int(opcoes["estoque_max"])
+    if estoque_min < estoque_max:
+        faixa_estoque = st.sidebar.slider("Estoque Atual", min_value=estoque_min, max_value=estoque_max,
+                                          value=(estoque_min, estoque_max))
+    else:
+        faixa_estoque = (estoque_min, estoque_max)
+
+    # Classes gravadas pelo job de `core.classificacao`; aqui só são lidas
+    rotulos = st.sidebar.multiselect("Classificação", ROTULOS) if opcoes["classificado"] else []
+
+    termo_busca = st.text_input("🔎 Buscar por Nome ou Categoria:")
+
+    # Faixas nos limites não filtram: a consulta fica sem condição à toa
+    return {
+        "categorias": tuple(categoria_filtro) or None,
+        "preco_min": faixa_preco[0] if faixa_preco[0] > preco_min else None,
+        "preco_max": faixa_preco[1] if faixa_preco[1] < preco_max else None,
+        "estoque_min": faixa_estoque[0] if faixa_estoque[0] > estoque_min else None,
+        "estoque_max": faixa_estoque[1] if faixa_estoque[1] < estoque_max else None,
+        "classes": tuple(rotulos) or None,
+        "termo": termo_busca or None,
+    }
+
+@st.fragment(run_every=INTERVALO_AO_VIVO)
+def _alertas_reposicao():
+    # Ponto de pedido por produto (velocidade de vendas, prazo e nível de serviço).
+    # A cada intervalo só a sequência é lida; o plano é refeito quando ela muda.
+    reposicao = _plano_reposicao(_versao())
+    if not reposicao.empty:
+        st.warning("⚠️ Produtos para repor (mais urgentes primeiro):")
+        st.dataframe(reposicao[["nome", "estoque_atual", "ponto_pedido", "quantidade_sugerida", "dias_cobertura"]].rename(columns={
+            "nome": "Produto",
+            "estoque_atual": "Estoque",
+            "ponto_pedido": "Ponto de Pedido",
+            "quantidade_sugerida": "Qtd. Sugerida",
+            "dias_cobertura": "Dias de Cobertura",
+        }).round(1))
+
+def _atualizar_grade(grade, filtros, ordem, decrescente):
+    """Aplica à página guardada em `grade` as mudanças do feed desde `grade["seq"]`.
+
+    Linhas da página alteradas são relidas no lugar, uma consulta só para
+    elas. Retorna False quando a página precisa ser recarregada inteira
+    (produto removido ou inserido, ou linha que saiu do filtro).
+    """
+    if grade.get("df") is None:
+        return False
+    resumo = mudancas.resumir(mudancas.mudancas_desde(grade["seq"]))
+    if not resumo["seq"]:
+        return True
+    grade["seq"] = resumo["seq"]
+    pagina_df = grade["df"]
+    na_pagina = set(pagina_df["id_produto"].tolist())
+    if resumo["removidos"] & na_pagina:
+        return False
+    if resumo["produtos"] - na_pagina or resumo["removidos"]:
+        # Produto de fora da página mudou: pode ter entrado ou saído do filtro
+        if contar_produtos(filtros) != grade["total"]:
+            return False
+
+    alterados = sorted((resumo["produtos"] | resumo["movimentacoes"]) & na_pagina)
+    if alterados:
+        linhas = pagina_produtos(dict(filtros, ids_produtos=alterados), ordem, decrescente, len(alterados))
+        if len(linhas) < len(alterados):
+            return False
+        # Mantém a posição das linhas; a ordenação é refeita na próxima recarga da página
+        atual = pagina_df.set_index("id_produto")
+        atual.loc[linhas["id_produto"], linhas.columns.drop("id_produto")] = linhas.set_index("id_produto").values
+        grade["df"] = atual.reset_index()
+        grade["atualizacao"] = f"{len(alterados)} linha(s) atualizada(s) às {datetime.now():%H:%M:%S}"
+    return True
+
+@st.fragment(run_every=INTERVALO_AO_VIVO)
+def _grade_produtos(filtros, ordem, decrescente, tamanho_pagina):
+    """Página da grade, mantida em dia pelo feed de `core.mudancas`."""
+    # Versão lida antes da página: o que mudar no meio chega na próxima rodada
+    versao = _versao()
+    consulta = repr((sorted(filtros.items()), ordem, decrescente, tamanho_pagina))
+    grade = st.session_state.get("grade_produtos")
+    if grade is None or grade["consulta"] != consulta or not _atualizar_grade(grade, filtros, ordem, decrescente):
+        grade = st.session_state["grade_produtos"] = {
+            "consulta": consulta,
+            "seq": versao[1],
+            "total": _contar_produtos(versao, filtros),
+            "pagina": None,
+        }
+
+    paginas = max(1, -(-grade["total"] // tamanho_pagina))
+    # Filtros mais restritos podem deixar a página atual além da última
+    if st.session_state.get("pagina_produtos", 1) > paginas:
+        st.session_state["pagina_produtos"] = paginas
+    pagina = int(st.number_input("Página", min_value=1, max_value=paginas, step=1, key="pagina_produtos")) - 1
+
+    # Só a página visível sai do banco e é formatada
+    if grade["pagina"] != pagina:
+        grade["df"] = _pagina_produtos(versao, filtros, ordem, decrescente, tamanho_pagina, pagina)
+        grade["pagina"] = pagina
+        grade["atualizacao"] = None
+    pagina_df = grade["df"].copy()
+    pagina_df["preco_unitario"] = formatar_precos(pagina_df["preco_unitario"])
+    legenda = f"{grade['total']} produto(s) · página {pagina + 1} de {paginas}"
+    if grade["atualizacao"]:
+        legenda += f" · {grade['atualizacao']}"
+    st.caption(legenda)
+    st.dataframe(formatar_nomes_colunas(pagina_df.drop(columns="versao")), hide_index=True)
+
+@st.fragment(run_every=INTERVALO_AO_VIVO)
+def _ranking_categorias():
+    ranking_df = _lucratividade_categorias(_versao())[["categoria", "receita"]]
+    ranking_df.columns = ["Categoria", "Lucro Total"]
+
+    if not ranking_df.empty:
+        fig = px.bar(
+            ranking_df,
+            x="Categoria",
+            y="Lucro Total",
+            text=formatar_precos(ranking_df["Lucro Total"]),
+            labels={"Lucro Total": "Lucro Total (R$)"},
+            title="Ranking de Categorias Mais Lucrativas"
+        )
+
+        fig.update_traces(textposition="outside")
+        fig.update_layout(yaxis_tickprefix="R$ ", yaxis_tickformat=".2f")
+
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("Nenhuma venda nos últimos 30 dias para calcular o ranking.")
+
 def visualizar_produtos():
     st.subheader("📦 Produtos em Estoque")
 
     try:
-        produtos = carregar_produtos()
+        opcoes = _opcoes_produtos(_versao())
 
-        if produtos.empty:
+        if not opcoes["total"]:
             st.warning("Nenhum produto encontrado.")
             return
 
-        estoque_baixo = verificar_estoque_baixo()
-        if not estoque_baixo.empty:
-            st.warning("⚠️ Produtos com estoque baixo:")
-            st.dataframe(estoque_baixo[["nome", "estoque_atual"]])
-
-        categorias = produtos["categoria"].dropna().unique()
-        categoria_filtro = st.sidebar.multiselect("Categoria", categorias, default=list(categorias))
-
-        preco_min = float(produtos["preco_unitario"].min())
-        preco_max = float(produtos["preco_unitario"].max())
-        faixa_preco = st.sidebar.slider("Faixa de Preço (R$)", min_value=preco_min, max_value=preco_max, value=(preco_min, preco_max))
-
-        estoque_min = int(produtos["estoque_atual"].min())
-        estoque_max = int(produtos["estoque_atual"].max())
-        faixa_estoque = st.sidebar.slider("Estoque Atual", min_value=estoque_min, max_value=estoque_max, value=(estoque_min, estoque_max))
+        # Reposição, grade e ranking se atualizam sozinhos (`INTERVALO_AO_VIVO`),
+        # cada um só com o que mudou; filtros e ordenação refazem a página toda
+        _alertas_reposicao()
 
-        df_filtrado = produtos[
-            (produtos["categoria"].isin(categoria_filtro)) &
-            (produtos["preco_unitario"] >= faixa_preco[0]) &
-            (produtos["preco_unitario"] <= faixa_preco[1]) &
-            (produtos["estoque_atual"] >= faixa_estoque[0]) &
-            (produtos["estoque_atual"] <= faixa_estoque[1])
-        ]
+        filtros = _filtros_produtos(opcoes)
 
-        termo_busca = st.text_input("🔎 Buscar por Nome ou Categoria:")
-        if termo_busca:
-            termo = termo_busca.lower()
-            df_filtrado = df_filtrado[
-                df_filtrado["nome"].str.lower().str.contains(termo) |
-                df_filtrado["categoria"].str.lower().str.contains(termo)
-            ]
+        col_ordem, col_direcao, col_tamanho = st.columns([2, 1, 1])
+        with col_ordem:
+            ordem = st.selectbox("Ordenar por", options=list(ROTULOS_ORDENACAO), format_func=ROTULOS_ORDENACAO.get)
+        with col_direcao:
+            decrescente = st.checkbox("Decrescente")
+        with col_tamanho:
+            tamanho_pagina = st.selectbox("Linhas por página", options=[50, 100, 500], index=1)
 
-        df_formatado = formatar_nomes_colunas(df_filtrado)
-        df_formatado["Preço Unitário"] = df_formatado["Preço Unitário"].apply(formatar_preco)
-
-        st.dataframe(df_formatado.sort_values("ID Produto"))
+        _grade_produtos(filtros, ordem, decrescente, tamanho_pagina)
 
         st.markdown("---")
         st.subheader("🏆 Ranking de Categorias Mais Lucrativas")
-
-        if "vendidos_ultimos_30_dias" in produtos.columns:
-            produtos["lucro_total"] = produtos["preco_unitario"] * produtos["vendidos_ultimos_30_dias"]
-            ranking_df = produtos.groupby("categoria")["lucro_total"].sum().reset_index()
-            ranking_df.columns = ["Categoria", "Lucro Total"]
-
-            fig = px.bar(
-                ranking_df.sort_values("Lucro Total", ascending=False),
-                x="Categoria",
-                y="Lucro Total",
-                text=ranking_df["Lucro Total"].apply(formatar_preco),
-                labels={"Lucro Total": "Lucro Total (R$)"},
-                title="Ranking de Categorias Mais Lucrativas"
-            )
-
-            fig.update_traces(textposition="outside")
-            fig.update_layout(yaxis_tickprefix="R$ ", yaxis_tickformat=".2f")
-
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("Coluna 'vendidos_ultimos_30_dias' não encontrada para calcular o ranking.")
+        _ranking_categorias()
 
 
     except Exception as e:
@@ -141,16 +323,15 @@ def visualizar_produtos():
 
 def tela_movimentacao():
     st.subheader("🔄 Movimentação de Estoque")
-    produtos = carregar_produtos()
+    mapa = _mapa_produtos(_versao())
 
     col1, col2 = st.columns(2)
     with col1:
-        produto_nome = st.selectbox(
+        id_produto = st.selectbox(
             "Selecione o Produto:",
-            options=produtos["nome"],
-            format_func=lambda x: f"{x} (Estoque: {produtos[produtos['nome'] == x]['estoque_atual'].values[0]})"
+            options=list(mapa),
+            format_func=lambda i: f"{mapa[i][0]} (Estoque: {mapa[i][1]})"
         )
-        id_produto = produtos[produtos["nome"] == produto_nome]["id_produto"].values[0]
 
     with col2:
         quantidade = st.number_input("Quantidade:", min_value=1, value=1)
@@ -193,70 +374,92 @@ def tela_movimentacao():
             except Exception as e:
                 st.error(f"Erro: {str(e)}")
 
+def _filtros_historico(opcoes):
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("🔍 Filtros - Histórico")
+
+    tipo_filtro = st.sidebar.selectbox("Tipo de Movimentação", options=["Todos"] + opcoes["tipos"])
+
+    produtos_opcoes = opcoes["produtos"]
+    produto_filtro = st.sidebar.multiselect(
+        "Produto (vazio = todos)",
+        options=list(produtos_opcoes),
+        format_func=lambda id_produto: produtos_opcoes[id_produto],
+    )
+
+    categoria_filtro = st.sidebar.multiselect("Categoria (vazio = todas)", options=opcoes["categorias"])
+
+    periodo = st.sidebar.date_input("Período", value=(opcoes["data_min"], opcoes["data_max"]))
+    data_inicio, data_fim = periodo if len(periodo) == 2 else (periodo[0], periodo[0])
+
+    qtd_min = int(opcoes["quantidade_min"])
+    qtd_max = int(opcoes["quantidade_max"])
+    if qtd_min < qtd_max:
+        qtd_range = st.sidebar.slider("Quantidade", min_value=qtd_min, max_value=qtd_max, value=(qtd_min, qtd_max))
+    else:
+        qtd_range = (qtd_min, qtd_max)
+
+    termo_busca = st.text_input("🔍 Buscar por Produto ou Categoria:")
+
+    return {
+        "tipo": tipo_filtro if tipo_filtro != "Todos" else None,
+        "ids_produtos": produto_filtro or None,
+        "categorias": categoria_filtro or None,
+        "data_inicio": data_inicio,
+        "data_fim": data_fim,
+        "quantidade_min": qtd_range[0] if qtd_range[0] > qtd_min else None,
+        "quantidade_max": qtd_range[1] if qtd_range[1] < qtd_max else None,
+        "termo": termo_busca or None,
+    }
+
+def _pagina_historico(filtros, tamanho_pagina):
+    """Controla a paginação por cursor, reiniciando quando os filtros mudam."""
+    chave_filtros = repr(sorted(filtros.items())) + str(tamanho_pagina)
+    if st.session_state.get("historico_filtros") != chave_filtros:
+        st.session_state["historico_filtros"] = chave_filtros
+        st.session_state["historico_cursores"] = [None]
+
+    cursores = st.session_state["historico_cursores"]
+    pagina, proximo = _pagina_movimentacoes(_versao(), filtros, tamanho_pagina, cursores[-1])
+
+    col_anterior, col_info, col_proxima = st.columns([1, 2, 1])
+    with col_anterior:
+        if st.button("⬅️ Anterior", disabled=len(cursores) == 1):
+            cursores.pop()
+            st.rerun()
+    with col_info:
+        st.caption(f"Página {len(cursores)}")
+    with col_proxima:
+        if st.button("Próxima ➡️", disabled=proximo is None):
+            cursores.append(proximo)
+            st.rerun()
+
+    return pagina
+
 def tela_historico():
     st.subheader("📜 Histórico de Movimentações")
     
     try:
-        movimentacoes = carregar_movimentacoes()
-        
-        if not movimentacoes.empty:
-            movimentacoes["data"] = pd.to_datetime(movimentacoes["data"], format='mixed', errors='coerce')
-            movimentacoes = movimentacoes.dropna(subset=['data'])
-            movimentacoes["data_formatada"] = movimentacoes["data"].dt.strftime("%d/%m/%Y %H:%M")
-
-            st.sidebar.markdown("---")
-            st.sidebar.subheader("🔍 Filtros - Histórico")
-
-            tipos = movimentacoes["tipo"].unique()
-            tipo_filtro = st.sidebar.selectbox("Tipo de Movimentação", options=["Todos"] + list(tipos))
-
-            produtos_opcoes = movimentacoes["nome"].unique()
-            produto_filtro = st.sidebar.multiselect("Produto", options=produtos_opcoes, default=list(produtos_opcoes))
-
-            categorias = movimentacoes["categoria"].unique()
-            categoria_filtro = st.sidebar.multiselect("Categoria", options=categorias, default=list(categorias))
-
-            data_min = movimentacoes["data"].min().date()
-            data_max = movimentacoes["data"].max().date()
-            data_inicio, data_fim = st.sidebar.date_input("Período", value=(data_min, data_max))
-
-            qtd_min = int(movimentacoes["quantidade"].min())
-            qtd_max = int(movimentacoes["quantidade"].max())
-            qtd_range = st.sidebar.slider("Quantidade", min_value=qtd_min, max_value=qtd_max, value=(qtd_min, qtd_max))
-
-            df_filtrado = movimentacoes[
-                ((movimentacoes["tipo"] == tipo_filtro) if tipo_filtro != "Todos" else True) &
-                (movimentacoes["nome"].isin(produto_filtro)) &
-                (movimentacoes["categoria"].isin(categoria_filtro)) &
-                (movimentacoes["data"].dt.date >= data_inicio) &
-                (movimentacoes["data"].dt.date <= data_fim) &
-                (movimentacoes["quantidade"] >= qtd_range[0]) &
-                (movimentacoes["quantidade"] <= qtd_range[1])
-            ]
-
-            termo_busca = st.text_input("🔍 Buscar por Produto ou Categoria:")
-            if termo_busca:
-                termo = termo_busca.lower()
-                df_filtrado = df_filtrado[
-                    df_filtrado["nome"].str.lower().str.contains(termo) |
-                    df_filtrado["categoria"].str.lower().str.contains(termo)
-                ]
-
-            df_filtrado = formatar_colunas_historico(df_filtrado)
+        opcoes = _opcoes_historico(_versao())
+
+        if opcoes["data_min"] is not None:
+            filtros = _filtros_historico(opcoes)
+            tamanho_pagina = st.selectbox("Linhas por página", options=[50, 100, 500], index=1)
+
+            pagina = _pagina_historico(filtros, tamanho_pagina)
+            pagina["data_formatada"] = pagina["data"].dt.strftime("%d/%m/%Y %H:%M")
 
             st.dataframe(
-                df_filtrado.sort_values("Data", ascending=False).drop(columns="Data"),
+                formatar_colunas_historico(pagina).drop(columns="Data"),
                 column_config={"Data/Hora": "Data/Hora"}
             )
 
             st.markdown("### 📈 Evolução das Movimentações por Produto")
 
-            df_filtrado["Data"] = pd.to_datetime(df_filtrado["Data"], errors="coerce")
-
-            evolucao = df_filtrado.groupby(["Data", "Nome", "Tipo"])["Quantidade"].sum().reset_index()
-            evolucao.rename(columns={
-                "Nome": "Produto"
-            }, inplace=True)
+            # Agrupada por dia, semana ou mês conforme o período: o gráfico tem tamanho limitado
+            evolucao, granularidade = _serie_movimentacoes(_versao(), filtros)
+            evolucao = formatar_colunas_historico(evolucao).rename(columns={"Nome": "Produto"})
+            evolucao["Data"] = pd.to_datetime(evolucao["Data"], errors="coerce")
 
             fig_evolucao = px.line(
                 evolucao,
@@ -265,7 +468,7 @@ def tela_historico():
                 color="Produto",
                 line_dash="Tipo",
                 markers=True,
-                title="Entradas e Saídas ao Longo do Tempo"
+                title=f"Entradas e Saídas ao Longo do Tempo (por {ROTULOS_GRANULARIDADE[granularidade]})"
             )
             fig_evolucao.update_layout(xaxis_title="Data", yaxis_title="Quantidade")
             st.plotly_chart(fig_evolucao, use_container_width=True)
@@ -277,6 +480,53 @@ def tela_historico():
     except Exception as e:
         st.error(f"Erro ao carregar histórico: {str(e)}")
         
+def tela_diagnostico():
+    """Página oculta (abra o app com ?diagnostico=1): onde o tempo está sendo gasto."""
+    st.subheader("🩺 Diagnóstico")
+
+    ligado = st.toggle("Coletar métricas", value=metricas.ativo())
+    if ligado != metricas.ativo():
+        metricas.ativar(ligado)
+        st.rerun()
+
+    resumo = metricas.resumo()
+    if resumo.empty:
+        st.info("Nenhuma medição ainda. Ligue a coleta e navegue pelas outras páginas.")
+        return
+
+    st.caption("Operações do core e páginas do app (`pagina:`), da maior latência total para a menor. "
+               "Os números são inclusivos: uma página conta as consultas das funções que chama.")
+    st.dataframe(resumo.round(3).rename(columns={
+        "operacao": "Operação",
+        "chamadas": "Chamadas",
+        "erros": "Erros",
+        "total_s": "Total (s)",
+        "media_ms": "Média (ms)",
+        "p50_ms": "p50 (ms)",
+        "p95_ms": "p95 (ms)",
+        "max_ms": "Máx. (ms)",
+        "consultas_por_chamada": "Consultas/chamada",
+        "linhas_lidas": "Linhas lidas",
+        "linhas_escritas": "Linhas escritas",
+        "bytes_por_chamada": "Bytes/chamada",
+    }), use_container_width=True)
+
+    paginas = resumo[resumo["operacao"].str.startswith("pagina:")]
+    if not paginas.empty:
+        fig = px.bar(paginas, x="operacao", y=["p50_ms", "p95_ms"], barmode="group",
+                     title="Custo de cada rerun por página (ms)")
+        fig.update_layout(xaxis_title="Página", yaxis_title="ms", legend_title="")
+        st.plotly_chart(fig, use_container_width=True)
+
+    col1, col2, col3 = st.columns(3)
+    col1.download_button("Baixar (Prometheus)", metricas.texto_prometheus(), "metricas.prom", "text/plain")
+    col2.download_button("Baixar (JSON)", metricas.texto_json(), "metricas.json", "application/json")
+    if col3.button("Zerar"):
+        metricas.zerar()
+        st.rerun()
+    if st.button("Gravar arquivo de métricas"):
+        st.success(f"Métricas gravadas em {metricas.exportar()}")
+
 opcoes_menu = {
     "Visualizar Produtos": visualizar_produtos,
     "Movimentação de Estoque": tela_movimentacao,
@@ -289,13 +539,18 @@ opcoes_menu = {
 def main():
     
     st.sidebar.title("Menu")
-    opcao_selecionada = st.sidebar.selectbox("Escolha uma ação:", list(opcoes_menu.keys()))
+    opcoes = dict(opcoes_menu)
+    if st.query_params.get("diagnostico") == "1" or metricas.ativo():
+        opcoes["Diagnóstico"] = tela_diagnostico
+    opcao_selecionada = st.sidebar.selectbox("Escolha uma ação:", list(opcoes.keys()))
 
     if opcao_selecionada == "Visualizar Produtos":
         st.sidebar.markdown("---")
         st.sidebar.subheader("🔎 Filtros")  # Aparece só nessa aba
 
-    opcoes_menu[opcao_selecionada]()
+    with metricas.trecho(f"pagina:{opcao_selecionada}"):
+        opcoes[opcao_selecionada]()
+    metricas.exportar_periodicamente()
 
 if __name__ == "__main__":
     criar_tabelas_movimentacoes()
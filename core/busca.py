@@ -0,0 +1,107 @@
+"""Busca de produtos por nome e categoria com índice FTS5.
+
+A tabela virtual `produtos_busca` (criada pela migração 3 de
+`core.esquema`) usa `produtos` como conteúdo externo e é mantida em
+sincronia por gatilhos, então qualquer escrita no catálogo — inclusive
+`adicionar_produto`, `editar_produto` e `remover_produto` — já atualiza o
+índice. O tokenizador remove acentos, portanto "guarana" encontra
+"Guaraná", e cada palavra digitada é tratada como prefixo.
+
+Se o SQLite não tiver FTS5, a busca cai para LIKE (sem ranking e sem
+remoção de acentos).
+"""
+import re
+
+import pandas as pd
+
+from core.classificacao import filtro_classe
+from core.conexao import obter_conexao
+from core.metricas import medido
+from core.vendas import limites_janela
+
+_PALAVRA = re.compile(r"\w+", re.UNICODE)
+
+# Colunas de `core.gerenciamento_estoque.carregar_produtos` sobre `produtos p`.
+# A coluna guardada `produtos.vendidos_ultimos_30_dias` não é mais mantida:
+# o valor vem de `vendas_diarias` (parâmetros: `limites_janela(30)`).
+SELECT_PRODUTOS = """SELECT p.id_produto, p.nome, p.categoria, p.preco_unitario, p.estoque_atual,
+       (SELECT COALESCE(SUM(v.quantidade), 0) FROM vendas_diarias v
+        WHERE v.id_produto = p.id_produto AND v.dia BETWEEN ? AND ?) AS vendidos_ultimos_30_dias,
+       p.versao"""
+
+
+def escapar_like(termo):
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def indice_disponivel(con=None):
+    con = con or obter_conexao()
+    return con.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'produtos_busca'"
+    ).fetchone() is not None
+
+
+def consulta_fts(termo):
+    """Converte o texto digitado em uma consulta FTS5 segura.
+
+    Cada palavra vira uma string entre aspas com `*` (prefixo), de modo que
+    caracteres como "(" ou aspas nunca são interpretados como sintaxe.
+    Retorna None se o texto não tiver nenhuma palavra.
+    """
+    palavras = _PALAVRA.findall(termo or "")
+    if not palavras:
+        return None
+    return " ".join(f'"{palavra}"*' for palavra in palavras)
+
+
+def filtro_termo(termo, coluna_id):
+    """Retorna (condição SQL, parâmetros) que restringe `coluna_id` aos produtos que casam com `termo`."""
+    if indice_disponivel():
+        consulta = consulta_fts(termo)
+        if consulta is None:
+            return "1 = 0", []
+        return (
+            f"{coluna_id} IN (SELECT rowid FROM produtos_busca WHERE produtos_busca MATCH ?)",
+            [consulta],
+        )
+    padrao = f"%{escapar_like(termo)}%"
+    return (
+        f"{coluna_id} IN (SELECT id_produto FROM produtos "
+        "WHERE nome LIKE ? ESCAPE '\\' OR categoria LIKE ? ESCAPE '\\')",
+        [padrao, padrao],
+    )
+
+
+@medido
+def pesquisar_produtos(termo, limite=50, classe=None):
+    """Retorna os produtos que casam com `termo`, do mais ao menos relevante.
+
+    `classe` restringe o resultado a uma classe gravada pelo job de
+    `core.classificacao` (rótulo, ABC ou XYZ).
+    """
+    con = obter_conexao()
+    janela = list(limites_janela(30))
+    if indice_disponivel(con):
+        consulta = consulta_fts(termo)
+        if consulta is None:
+            return pd.read_sql_query(f"{SELECT_PRODUTOS} FROM produtos p WHERE 0", con, params=janela)
+        sql = f"""{SELECT_PRODUTOS} FROM produtos_busca b
+JOIN produtos p ON p.id_produto = b.rowid
+WHERE produtos_busca MATCH ?"""
+        parametros = janela + [consulta]
+        ordem = " ORDER BY bm25(produtos_busca, 10.0, 1.0)"
+    else:
+        padrao = f"%{escapar_like(termo)}%"
+        sql = f"{SELECT_PRODUTOS} FROM produtos p WHERE (p.nome LIKE ? ESCAPE '\\' OR p.categoria LIKE ? ESCAPE '\\')"
+        parametros = janela + [padrao, padrao]
+        ordem = ""
+
+    if classe is not None:
+        condicao, valores = filtro_classe(classe, "p.id_produto")
+        sql += f" AND {condicao}"
+        parametros.extend(valores)
+    sql += ordem
+    if limite is not None:
+        sql += " LIMIT ?"
+        parametros.append(int(limite))
+    return pd.read_sql_query(sql, con, params=parametros)
@@ -0,0 +1,39 @@
+"""Contador de versão dos dados, usado como chave de cache.
+
+Toda função de escrita de `core.gerenciamento_estoque` e
+`core.estoque_rapido` incrementa a versão ao terminar (decorador
+`invalida_cache`). Quem guarda resultados em cache
+(por exemplo, `st.cache_data` no app) inclui `versao_dados()` na chave:
+enquanto nada for gravado, a mesma chave é reutilizada e o banco não é
+consultado.
+
+O contador vale para o processo atual; escritas feitas por outros
+processos não são percebidas por ele. Para elas, use também a sequência
+do feed de `core.mudancas` (o app combina as duas).
+"""
+import threading
+from functools import wraps
+
+_versao = 0
+_trava = threading.Lock()
+
+
+def versao_dados():
+    return _versao
+
+
+def invalidar():
+    global _versao
+    with _trava:
+        _versao += 1
+
+
+def invalida_cache(funcao):
+    """Incrementa a versão dos dados depois que `funcao` executar (com ou sem erro)."""
+    @wraps(funcao)
+    def envolvida(*args, **kwargs):
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            invalidar()
+    return envolvida
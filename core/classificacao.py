@@ -0,0 +1,269 @@
+"""Classificação de produtos: curva ABC, variabilidade XYZ e sazonalidade.
+
+O job lê as vendas das últimas `config.CLASSIFICACAO_SEMANAS` semanas
+completas (segunda a domingo) do consolidado `vendas_diarias` e grava, por
+produto, na tabela `classificacao_produtos`:
+
+* classe ABC: participação acumulada na receita (A até 80%, B até 95%);
+* classe XYZ: coeficiente de variação da demanda semanal (X até 0,5,
+  Y até 1,0, Z acima disso ou sem venda);
+* sazonalidade: quanto da venda do período cabe no melhor trimestre
+  (13 semanas seguidas), de 0 (uniforme) a 1 (tudo concentrado);
+* rótulo: "Sazonais" para os sazonais, senão "Alta saída" (A e B) ou
+  "Baixa saída" (C).
+
+Como a janela só anda a cada semana fechada, execuções na mesma semana
+recalculam apenas os produtos novos ou com movimentação retroativa dentro
+da janela; a classe ABC, que depende do catálogo inteiro, é refeita a
+partir das receitas já gravadas. Os filtros (`filtro_classe`) só leem a
+tabela.
+"""
+import json
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from core.conexao import obter_conexao, transacao
+from core.metricas import medido
+from utils import config
+
+ROTULOS = ("Alta saída", "Baixa saída", "Sazonais")
+CLASSES_ABC = ("A", "B", "C")
+CLASSES_XYZ = ("X", "Y", "Z")
+
+
+def classes_abc(receita, limites=None):
+    """Classe ABC de cada posição de `receita` pela participação acumulada.
+
+    A participação considerada é a acumulada *antes* do produto, de modo
+    que o produto que cruza o limite ainda entra na classe. Em caso de
+    empate vale a ordem de entrada. Produtos sem receita são sempre C.
+    """
+    limites = limites or config.CLASSIFICACAO_LIMITES_ABC
+    receita = np.asarray(receita, dtype=float)
+    classes = np.full(len(receita), "C", dtype=object)
+    total = receita.sum()
+    if total <= 0:
+        return classes
+
+    ordem = np.argsort(-receita, kind="stable")
+    ordenada = receita[ordem]
+    anterior = (np.cumsum(ordenada) - ordenada) / total
+    classes[ordem] = np.select(
+        [(ordenada > 0) & (anterior < limites[0]), (ordenada > 0) & (anterior < limites[1])],
+        ["A", "B"],
+        default="C",
+    )
+    return classes
+
+
+def classes_xyz(coeficiente_variacao, limites=None):
+    """Classe XYZ pelo coeficiente de variação (NaN, isto é, sem venda, é Z)."""
+    limites = limites or config.CLASSIFICACAO_LIMITES_XYZ
+    cv = np.asarray(coeficiente_variacao, dtype=float)
+    with np.errstate(invalid="ignore"):
+        return np.select([cv <= limites[0], cv <= limites[1]], ["X", "Y"], default="Z").astype(object)
+
+
+def indice_sazonalidade(semanal):
+    """Índice de sazonalidade por linha de uma matriz produto × semana.
+
+    Mede a fração da venda contida na melhor sequência de um quarto das
+    semanas (circular), reescalada para que 0 seja venda uniforme e 1 seja
+    venda toda dentro dela. Linhas sem venda dão NaN.
+    """
+    semanas = semanal.shape[1]
+    trimestre = max(1, semanas // 4)
+    estendida = np.concatenate([semanal, semanal[:, :trimestre - 1]], axis=1)
+    acumulado = np.cumsum(np.pad(estendida, ((0, 0), (1, 0))), axis=1)
+    melhor = (acumulado[:, trimestre:] - acumulado[:, :-trimestre]).max(axis=1)
+    total = semanal.sum(axis=1)
+    uniforme = trimestre / semanas
+    with np.errstate(divide="ignore", invalid="ignore"):
+        indice = (melhor / total - uniforme) / (1 - uniforme)
+    return np.where(total > 0, np.clip(indice, 0.0, 1.0), np.nan)
+
+
+def janela_classificacao(hoje=None, semanas=None):
+    """(primeiro dia, último dia) das `semanas` semanas completas antes de `hoje`."""
+    hoje = hoje or date.today()
+    semanas = semanas or config.CLASSIFICACAO_SEMANAS
+    ate = hoje - timedelta(days=hoje.isoweekday())
+    return ate - timedelta(weeks=semanas) + timedelta(days=1), ate
+
+
+def _estatisticas(con, inicio, fim, semanas, ids=None):
+    """Vendas semanais dos produtos (todos, ou só `ids`) e suas métricas."""
+    if ids is None:
+        produtos = [linha[0] for linha in con.execute("SELECT id_produto FROM produtos ORDER BY id_produto")]
+    else:
+        produtos = [
+            linha[0] for linha in con.execute(
+                "SELECT id_produto FROM produtos WHERE id_produto IN (SELECT value FROM json_each(?)) "
+                "ORDER BY id_produto",
+                (json.dumps(sorted(int(i) for i in ids)),),
+            )
+        ]
+    produtos = np.array(produtos, dtype=np.int64)
+
+    filtro, parametros = "", [inicio.isoformat(), inicio.isoformat(), fim.isoformat()]
+    if ids is not None:
+        filtro = "AND id_produto IN (SELECT value FROM json_each(?))"
+        parametros.append(json.dumps(produtos.tolist()))
+    vendas = pd.read_sql_query(
+        f"""SELECT id_produto, CAST((julianday(dia) - julianday(?)) / 7 AS INTEGER) AS semana,
+       SUM(quantidade) AS quantidade, SUM(receita) AS receita
+FROM vendas_diarias
+WHERE dia BETWEEN ? AND ? {filtro}
+GROUP BY 1, 2""",
+        con,
+        params=parametros,
+    )
+
+    semanal = np.zeros((len(produtos), semanas), dtype=np.float64)
+    receita = np.zeros(len(produtos), dtype=np.float64)
+    # O consolidado pode ter vendas de produtos já removidos do catálogo
+    id_venda = vendas["id_produto"].to_numpy(dtype=np.int64)
+    conhecidos = np.isin(id_venda, produtos)
+    linhas = np.searchsorted(produtos, id_venda[conhecidos])
+    colunas = vendas["semana"].to_numpy(dtype=np.int64)[conhecidos]
+    np.add.at(semanal, (linhas, colunas), vendas["quantidade"].to_numpy(dtype=np.float64)[conhecidos])
+    np.add.at(receita, linhas, vendas["receita"].to_numpy(dtype=np.float64)[conhecidos])
+
+    media = semanal.mean(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cv = np.where(media > 0, semanal.std(axis=1) / media, np.nan)
+    sazonalidade = indice_sazonalidade(semanal)
+    # Com poucas semanas vendidas, concentração é acaso, não sazonalidade
+    poucas = (semanal > 0).sum(axis=1) < config.CLASSIFICACAO_MIN_SEMANAS_SAZONAL
+    sazonalidade = np.where(poucas, np.nan, sazonalidade)
+
+    return pd.DataFrame({
+        "id_produto": produtos,
+        "quantidade": semanal.sum(axis=1).astype(np.int64),
+        "receita": receita,
+        "coeficiente_variacao": cv,
+        "sazonalidade": sazonalidade,
+        "classe_xyz": classes_xyz(cv),
+    })
+
+
+def _reclassificar_abc(con):
+    """Refaz classe ABC e rótulo do catálogo inteiro a partir das métricas gravadas."""
+    atual = pd.read_sql_query(
+        "SELECT id_produto, receita, sazonalidade, classe_abc, rotulo FROM classificacao_produtos ORDER BY id_produto",
+        con,
+    )
+    abc = classes_abc(atual["receita"].to_numpy())
+    with np.errstate(invalid="ignore"):
+        sazonal = atual["sazonalidade"].to_numpy(dtype=float) >= config.CLASSIFICACAO_LIMITE_SAZONAL
+    rotulo = np.where(sazonal, "Sazonais", np.where(abc == "C", "Baixa saída", "Alta saída"))
+
+    mudou = (atual["classe_abc"].to_numpy() != abc) | (atual["rotulo"].to_numpy() != rotulo)
+    con.executemany(
+        "UPDATE classificacao_produtos SET classe_abc = ?, rotulo = ? WHERE id_produto = ?",
+        zip(abc[mudou].tolist(), rotulo[mudou].tolist(), atual["id_produto"].to_numpy()[mudou].tolist()),
+    )
+
+
+@medido
+def classificar_produtos(hoje=None, completo=False):
+    """Atualiza `classificacao_produtos`. Retorna o número de produtos recalculados.
+
+    Na primeira execução da semana (ou com `completo=True`, ou se os
+    parâmetros em `config` mudaram) recalcula o catálogo inteiro; nas
+    demais, só os produtos que precisam.
+    """
+    semanas = config.CLASSIFICACAO_SEMANAS
+    inicio, ate = janela_classificacao(hoje, semanas)
+    assinatura = json.dumps({
+        "semanas": semanas,
+        "limites_abc": list(config.CLASSIFICACAO_LIMITES_ABC),
+        "limites_xyz": list(config.CLASSIFICACAO_LIMITES_XYZ),
+        "limite_sazonal": config.CLASSIFICACAO_LIMITE_SAZONAL,
+        "min_semanas_sazonal": config.CLASSIFICACAO_MIN_SEMANAS_SAZONAL,
+    }, sort_keys=True)
+
+    with transacao(modo="IMMEDIATE") as con:
+        estado = con.execute(
+            "SELECT ate, ultimo_id_movimentacao, parametros FROM classificacao_estado WHERE id = 1"
+        ).fetchone()
+        ultimo_id = con.execute("SELECT COALESCE(MAX(id_movimentacao), 0) FROM movimentacoes").fetchone()[0]
+
+        if completo or estado is None or estado[0] != ate.isoformat() or estado[2] != assinatura:
+            ids, removidos = None, 0
+            con.execute("DELETE FROM classificacao_produtos")
+        else:
+            # Só vendas com data dentro da janela mudam as métricas
+            ids = {
+                linha[0] for linha in con.execute(
+                    "SELECT DISTINCT id_produto FROM movimentacoes "
+                    "WHERE id_movimentacao > ? AND tipo = 'saida' AND data < ?",
+                    (estado[1], (ate + timedelta(days=1)).isoformat()),
+                )
+            }
+            ids.update(
+                linha[0] for linha in con.execute(
+                    "SELECT id_produto FROM produtos "
+                    "WHERE id_produto NOT IN (SELECT id_produto FROM classificacao_produtos)"
+                )
+            )
+            removidos = con.execute(
+                "DELETE FROM classificacao_produtos WHERE id_produto NOT IN (SELECT id_produto FROM produtos)"
+            ).rowcount
+
+        recalculados = 0
+        if ids is None or ids or removidos:
+            if ids is None or ids:
+                metricas = _estatisticas(con, inicio, ate, semanas, ids)
+                linhas = metricas.astype(object).where(metricas.notna(), None)
+                con.executemany(
+                    "INSERT OR REPLACE INTO classificacao_produtos (id_produto, quantidade, receita, "
+                    "coeficiente_variacao, sazonalidade, classe_xyz, classe_abc, rotulo) "
+                    "VALUES (?, ?, ?, ?, ?, ?, '', '')",
+                    linhas.itertuples(index=False, name=None),
+                )
+                recalculados = len(metricas)
+            _reclassificar_abc(con)
+
+        con.execute(
+            "INSERT OR REPLACE INTO classificacao_estado (id, ate, ultimo_id_movimentacao, parametros) "
+            "VALUES (1, ?, ?, ?)",
+            (ate.isoformat(), ultimo_id, assinatura),
+        )
+    return recalculados
+
+
+@medido
+def classificacoes():
+    """A classificação gravada de cada produto (não recalcula nada)."""
+    return pd.read_sql_query(
+        """SELECT c.id_produto, p.nome, p.categoria, c.quantidade, c.receita, c.coeficiente_variacao,
+       c.sazonalidade, c.classe_abc, c.classe_xyz, c.rotulo
+FROM classificacao_produtos c
+JOIN produtos p ON p.id_produto = c.id_produto
+ORDER BY c.id_produto""",
+        obter_conexao(),
+    )
+
+
+def filtro_classe(classe, coluna_id):
+    """Retorna (condição SQL, parâmetros) que restringe `coluna_id` aos produtos de `classe`.
+
+    `classe` é um valor ou uma lista de valores, cada um podendo ser um
+    rótulo ("Alta saída", ...), uma classe ABC ("A") ou XYZ ("X").
+    """
+    valores = [classe] if isinstance(classe, str) else list(classe)
+    lista = json.dumps(valores)
+    return (
+        f"{coluna_id} IN (SELECT id_produto FROM classificacao_produtos "
+        "WHERE rotulo IN (SELECT value FROM json_each(?)) "
+        "OR classe_abc IN (SELECT value FROM json_each(?)) "
+        "OR classe_xyz IN (SELECT value FROM json_each(?)))",
+        [lista, lista, lista],
+    )
+
+
+if __name__ == "__main__":
+    print(f"{classificar_produtos()} produto(s) classificado(s).")
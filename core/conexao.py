@@ -0,0 +1,130 @@
+"""Conexões SQLite de longa duração, reutilizadas por thread.
+
+Cada thread mantém uma conexão por arquivo de banco. Os pragmas são
+aplicados apenas na abertura e o esquema é garantido uma única vez por
+processo, em vez de a cada leitura.
+
+Escritas devem usar `transacao(modo="IMMEDIATE")`: o lock de escrita é
+obtido no BEGIN, antes de qualquer leitura, então duas escritas
+concorrentes são serializadas em vez de falharem no meio. Se o banco
+continuar ocupado depois do `busy_timeout`, o BEGIN é repetido algumas
+vezes com espera exponencial (ver `config.SQLITE_TENTATIVAS_OCUPADO`).
+
+Com `core.metricas` ligado, cada conexão conta as instruções executadas
+(callback de trace), instalado ou removido na próxima `obter_conexao`.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from core import esquema, metricas
+from utils import config
+
+_local = threading.local()
+_esquemas_prontos = set()
+_trava_esquema = threading.Lock()
+
+
+def _abrir(caminho):
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    # isolation_level=None: as transações são abertas explicitamente em `transacao()`
+    con = sqlite3.connect(caminho, isolation_level=None)
+    con.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+    con.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+    con.execute(f"PRAGMA cache_size=-{int(config.SQLITE_CACHE_KB)}")
+    con.execute(f"PRAGMA mmap_size={int(config.SQLITE_MMAP_BYTES)}")
+    con.execute(f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT_MS)}")
+    return con
+
+
+def _garantir_esquema(con, caminho):
+    if caminho in _esquemas_prontos:
+        return
+    with _trava_esquema:
+        if caminho not in _esquemas_prontos:
+            esquema.migrar(con)
+            _esquemas_prontos.add(caminho)
+
+
+def obter_conexao(db_path=None):
+    """Retorna a conexão da thread atual para `db_path` (padrão: `config.DB_PATH`)."""
+    caminho = db_path or config.DB_PATH
+    conexoes = getattr(_local, "conexoes", None)
+    if conexoes is None:
+        conexoes = _local.conexoes = {}
+
+    con = conexoes.get(caminho)
+    if con is None:
+        con = conexoes[caminho] = _abrir(caminho)
+    _garantir_esquema(con, caminho)
+
+    rastreadas = getattr(_local, "rastreadas", None)
+    if rastreadas is None:
+        rastreadas = _local.rastreadas = {}
+    if rastreadas.get(caminho, False) != metricas.ativo():
+        con.set_trace_callback(metricas.contar_consulta if metricas.ativo() else None)
+        rastreadas[caminho] = metricas.ativo()
+    return con
+
+
+def alteracoes():
+    """Total de linhas alteradas pelas conexões da thread atual desde a abertura."""
+    return sum(con.total_changes for con in (getattr(_local, "conexoes", None) or {}).values())
+
+
+def ocupado(erro):
+    """True se `erro` é SQLITE_BUSY (banco travado por outra conexão)."""
+    codigo = getattr(erro, "sqlite_errorcode", None)
+    if codigo is not None:
+        return codigo & 0xFF == sqlite3.SQLITE_BUSY
+    return isinstance(erro, sqlite3.OperationalError) and "locked" in str(erro)
+
+
+def _iniciar(con, modo):
+    espera = config.SQLITE_ESPERA_INICIAL_S
+    for tentativa in range(config.SQLITE_TENTATIVAS_OCUPADO):
+        try:
+            con.execute(f"BEGIN {modo}")
+            return
+        except sqlite3.OperationalError as erro:
+            if not ocupado(erro) or tentativa == config.SQLITE_TENTATIVAS_OCUPADO - 1:
+                raise
+        time.sleep(espera * random.uniform(0.5, 1.5))
+        espera *= 2
+
+
+@contextmanager
+def transacao(db_path=None, modo="DEFERRED"):
+    """Executa o bloco em uma transação; faz COMMIT ao sair ou ROLLBACK em erro.
+
+    Se a conexão já estiver em uma transação, o bloco participa dela.
+    """
+    con = obter_conexao(db_path)
+    if con.in_transaction:
+        yield con
+        return
+
+    _iniciar(con, modo)
+    try:
+        yield con
+    except BaseException:
+        if con.in_transaction:
+            con.rollback()
+        raise
+    else:
+        con.commit()
+
+
+def fechar_conexoes():
+    """Fecha as conexões abertas pela thread atual."""
+    conexoes = getattr(_local, "conexoes", None) or {}
+    for con in conexoes.values():
+        con.close()
+    conexoes.clear()
+    getattr(_local, "rastreadas", {}).clear()
+
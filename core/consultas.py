@@ -0,0 +1,297 @@
+"""Consultas parametrizadas para as telas do app.
+
+Os filtros da barra lateral viram uma cláusula WHERE com parâmetros e a
+paginação é feita por chave (keyset) sobre (data, id_movimentacao), de
+modo que cada página custa o mesmo independentemente do tamanho do
+histórico. As opções dos filtros vêm de agregados que usam índices.
+Meses antigos compactados em Parquet (`core.historico_arquivo`) são
+somados às consultas de forma transparente.
+
+A grade de produtos segue a mesma ideia: filtros e ordenação no SQL,
+página por LIMIT/OFFSET, contagem e limites dos sliders por agregados.
+"""
+import json
+from datetime import date, timedelta
+
+import pandas as pd
+
+from core import historico_arquivo
+from core.busca import filtro_termo
+from core.classificacao import filtro_classe
+from core.conexao import obter_conexao
+from core.metricas import medido
+
+TIPOS_MOVIMENTACAO = ("entrada", "saida")
+
+_SELECT_MOVIMENTACOES = """SELECT m.id_movimentacao, m.id_produto,
+       COALESCE(m.nome, p.nome) AS nome,
+       COALESCE(m.categoria, p.categoria) AS categoria,
+       m.tipo, m.quantidade, m.data, m.usuario, m.observacao
+FROM movimentacoes m
+LEFT JOIN produtos p ON p.id_produto = m.id_produto"""
+
+
+def _como_texto_data(valor, dia_seguinte=False):
+    if isinstance(valor, str):
+        valor = date.fromisoformat(valor[:10])
+    if dia_seguinte:
+        valor = valor + timedelta(days=1)
+    return valor.isoformat()
+
+
+def filtro_movimentacoes(tipo=None, ids_produtos=None, categorias=None, data_inicio=None,
+                         data_fim=None, quantidade_min=None, quantidade_max=None, termo=None):
+    """Monta (cláusula WHERE, parâmetros) para os filtros do histórico.
+
+    Filtros com valor None não restringem nada. As datas são comparadas como
+    texto ISO, o que usa o índice em `data`; `data_fim` é inclusiva.
+    """
+    condicoes, parametros = [], []
+    if tipo:
+        condicoes.append("m.tipo = ?")
+        parametros.append(tipo)
+    if ids_produtos is not None:
+        condicoes.append("m.id_produto IN (SELECT value FROM json_each(?))")
+        parametros.append(json.dumps([int(i) for i in ids_produtos]))
+    if categorias is not None:
+        condicoes.append("COALESCE(m.categoria, p.categoria) IN (SELECT value FROM json_each(?))")
+        parametros.append(json.dumps(list(categorias)))
+    if data_inicio is not None:
+        condicoes.append("m.data >= ?")
+        parametros.append(_como_texto_data(data_inicio))
+    if data_fim is not None:
+        condicoes.append("m.data < ?")
+        parametros.append(_como_texto_data(data_fim, dia_seguinte=True))
+    if quantidade_min is not None:
+        condicoes.append("m.quantidade >= ?")
+        parametros.append(int(quantidade_min))
+    if quantidade_max is not None:
+        condicoes.append("m.quantidade <= ?")
+        parametros.append(int(quantidade_max))
+    if termo:
+        condicao, valores = filtro_termo(termo, "m.id_produto")
+        condicoes.append(condicao)
+        parametros.extend(valores)
+
+    clausula = " WHERE " + " AND ".join(condicoes) if condicoes else ""
+    return clausula, parametros
+
+
+@medido
+def buscar_movimentacoes(filtros=None, limite=100, apos=None):
+    """Retorna uma página do histórico, da movimentação mais recente para a mais antiga.
+
+    `apos` é o cursor (data, id_movimentacao) devolvido pela página anterior.
+    Retorna (DataFrame, próximo cursor ou None se esta for a última página),
+    com `data` já convertida para timestamp. Meses compactados em Parquet
+    (`core.historico_arquivo`) entram na mesma ordem.
+    """
+    clausula, parametros = filtro_movimentacoes(**(filtros or {}))
+    if apos is not None:
+        clausula += " AND " if clausula else " WHERE "
+        clausula += "(m.data, m.id_movimentacao) < (?, ?)"
+        parametros += [apos[0], int(apos[1])]
+
+    sql = (
+        f"{_SELECT_MOVIMENTACOES}{clausula} "
+        "ORDER BY m.data DESC, m.id_movimentacao DESC LIMIT ?"
+    )
+    con = obter_conexao()
+    df = pd.read_sql_query(sql, con, params=parametros + [limite + 1])
+    df["cursor"] = df["data"]
+    df["data"] = pd.to_datetime(df["data"], format="mixed", errors="coerce")
+
+    # Linhas arquivadas são todas anteriores ao corte: só entram se a página
+    # do SQLite não encheu antes de chegar nele
+    corte = historico_arquivo.corte(con)
+    if corte is not None and (len(df) <= limite or df["cursor"].iloc[limite] < corte):
+        arquivadas = historico_arquivo.pagina(filtros, limite + 1, apos)
+        if not arquivadas.empty:
+            arquivadas["cursor"] = arquivadas["data"].map(lambda data: data.isoformat(sep=" "))
+            df = pd.concat([df, arquivadas], ignore_index=True).sort_values(
+                ["data", "id_movimentacao"], ascending=False, ignore_index=True
+            ).head(limite + 1)
+
+    proximo = None
+    if len(df) > limite:
+        df = df.iloc[:limite]
+        ultima = df.iloc[-1]
+        proximo = (ultima["cursor"], int(ultima["id_movimentacao"]))
+    return df.drop(columns="cursor"), proximo
+
+
+@medido
+def totais_diarios_movimentacoes(filtros=None):
+    """Soma as quantidades por dia, produto e tipo (SQLite + meses compactados)."""
+    clausula, parametros = filtro_movimentacoes(**(filtros or {}))
+    sql = f"""SELECT substr(m.data, 1, 10) AS data,
+       COALESCE(m.nome, p.nome) AS nome,
+       m.tipo,
+       SUM(m.quantidade) AS quantidade
+FROM movimentacoes m
+LEFT JOIN produtos p ON p.id_produto = m.id_produto{clausula}
+GROUP BY 1, 2, 3
+ORDER BY 1"""
+    totais = pd.read_sql_query(sql, obter_conexao(), params=parametros)
+    arquivados = historico_arquivo.totais_diarios(filtros)
+    if arquivados.empty:
+        return totais
+    return pd.concat([arquivados.drop(columns="id_produto"), totais], ignore_index=True).groupby(
+        ["data", "nome", "tipo"], as_index=False
+    )["quantidade"].sum()
+
+
+@medido
+def opcoes_filtro_historico():
+    """Valores para montar os filtros do histórico sem varrer `movimentacoes`.
+
+    Cada agregado é respondido por um índice (MIN/MAX em `data` e
+    `quantidade`, EXISTS por `tipo`) ou pelos agregados dos meses
+    compactados; produtos e categorias vêm do catálogo.
+    """
+    con = obter_conexao()
+    tipos = [
+        tipo for tipo in TIPOS_MOVIMENTACAO
+        if con.execute("SELECT EXISTS(SELECT 1 FROM movimentacoes WHERE tipo = ?)", (tipo,)).fetchone()[0]
+    ]
+    # Um agregado por subconsulta: só assim o SQLite resolve MIN/MAX pelo índice
+    data_min, data_max, qtd_min, qtd_max = con.execute(
+        """SELECT (SELECT MIN(data) FROM movimentacoes), (SELECT MAX(data) FROM movimentacoes),
+                  (SELECT MIN(quantidade) FROM movimentacoes), (SELECT MAX(quantidade) FROM movimentacoes)"""
+    ).fetchone()
+    arquivado = historico_arquivo.opcoes()
+    if arquivado is not None:
+        tipos = [tipo for tipo in TIPOS_MOVIMENTACAO if tipo in tipos or tipo in arquivado["tipos"]]
+        data_min, data_max = min(data_min or "9999", arquivado["data_min"]), max(data_max or "", arquivado["data_max"])
+        qtd_min = arquivado["quantidade_min"] if qtd_min is None else min(qtd_min, arquivado["quantidade_min"])
+        qtd_max = arquivado["quantidade_max"] if qtd_max is None else max(qtd_max, arquivado["quantidade_max"])
+    produtos = dict(con.execute("SELECT id_produto, nome FROM produtos ORDER BY nome").fetchall())
+    categorias = [
+        linha[0] for linha in con.execute(
+            "SELECT DISTINCT categoria FROM produtos WHERE categoria IS NOT NULL ORDER BY categoria"
+        )
+    ]
+    return {
+        "tipos": tipos,
+        "produtos": produtos,
+        "categorias": categorias,
+        "data_min": date.fromisoformat(data_min[:10]) if data_min else None,
+        "data_max": date.fromisoformat(data_max[:10]) if data_max else None,
+        "quantidade_min": qtd_min,
+        "quantidade_max": qtd_max,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Grade de produtos: filtros, ordenação e paginação no SQLite
+# ---------------------------------------------------------------------------
+
+ORDENACOES_PRODUTOS = ("id_produto", "nome", "categoria", "preco_unitario", "estoque_atual")
+
+
+def filtro_produtos(categorias=None, preco_min=None, preco_max=None, estoque_min=None,
+                    estoque_max=None, classes=None, termo=None, ids_produtos=None):
+    """Monta (cláusula WHERE, parâmetros) sobre `produtos p` para os filtros da grade.
+
+    Filtros com valor None não restringem nada; os intervalos são
+    inclusivos. `classes` aceita rótulos e classes ABC/XYZ de
+    `core.classificacao`; `termo` usa a busca de `core.busca`.
+    `ids_produtos` restringe a produtos específicos (ex.: as linhas de uma
+    página alteradas, no feed de `core.mudancas`).
+    """
+    condicoes, parametros = [], []
+    if ids_produtos is not None:
+        condicoes.append("p.id_produto IN (SELECT value FROM json_each(?))")
+        parametros.append(json.dumps([int(i) for i in ids_produtos]))
+    if categorias is not None:
+        condicoes.append("p.categoria IN (SELECT value FROM json_each(?))")
+        parametros.append(json.dumps(list(categorias)))
+    for coluna, operador, valor in (
+        ("preco_unitario", ">=", preco_min), ("preco_unitario", "<=", preco_max),
+        ("estoque_atual", ">=", estoque_min), ("estoque_atual", "<=", estoque_max),
+    ):
+        if valor is not None:
+            condicoes.append(f"p.{coluna} {operador} ?")
+            parametros.append(valor)
+    if classes:
+        condicao, valores = filtro_classe(classes, "p.id_produto")
+        condicoes.append(condicao)
+        parametros.extend(valores)
+    if termo:
+        condicao, valores = filtro_termo(termo, "p.id_produto")
+        condicoes.append(condicao)
+        parametros.extend(valores)
+
+    clausula = " WHERE " + " AND ".join(condicoes) if condicoes else ""
+    return clausula, parametros
+
+
+@medido
+def opcoes_filtro_produtos():
+    """Total, categorias e limites de preço e estoque para os filtros da grade, sem ler o catálogo inteiro.
+
+    `classificado` indica se o job de `core.classificacao` já gravou classes.
+    """
+    con = obter_conexao()
+    # Um agregado por subconsulta, como em `opcoes_filtro_historico`: cada um sai de um índice
+    total, preco_min, preco_max, estoque_min, estoque_max = con.execute(
+        """SELECT (SELECT COUNT(*) FROM produtos),
+                  (SELECT MIN(preco_unitario) FROM produtos), (SELECT MAX(preco_unitario) FROM produtos),
+                  (SELECT MIN(estoque_atual) FROM produtos), (SELECT MAX(estoque_atual) FROM produtos)"""
+    ).fetchone()
+    categorias = [
+        linha[0] for linha in con.execute(
+            "SELECT DISTINCT categoria FROM produtos WHERE categoria IS NOT NULL ORDER BY categoria"
+        )
+    ]
+    classificado = con.execute("SELECT EXISTS(SELECT 1 FROM classificacao_produtos)").fetchone()[0]
+    return {
+        "total": total,
+        "classificado": bool(classificado),
+        "categorias": categorias,
+        "preco_min": preco_min,
+        "preco_max": preco_max,
+        "estoque_min": estoque_min,
+        "estoque_max": estoque_max,
+    }
+
+
+@medido
+def contar_produtos(filtros=None):
+    """Número de produtos que passam nos filtros da grade."""
+    clausula, parametros = filtro_produtos(**(filtros or {}))
+    return obter_conexao().execute(f"SELECT COUNT(*) FROM produtos p{clausula}", parametros).fetchone()[0]
+
+
+@medido
+def pagina_produtos(filtros=None, ordem="id_produto", decrescente=False, limite=100, pagina=0):
+    """Uma página da grade de produtos, filtrada e ordenada no SQLite.
+
+    `ordem` é uma das `ORDENACOES_PRODUTOS` (empate resolvido pelo id) e
+    `pagina` começa em 0. `vendidos_ultimos_30_dias` é somado de
+    `vendas_diarias` só para os produtos da página. Retorna DataFrame com
+    as colunas de `core.gerenciamento_estoque.carregar_produtos`.
+    """
+    if ordem not in ORDENACOES_PRODUTOS:
+        raise ValueError(f"Ordenação inválida: {ordem!r}. Use uma de {ORDENACOES_PRODUTOS}.")
+    direcao = "DESC" if decrescente else "ASC"
+    ordenacao = f"{ordem} {direcao}" if ordem == "id_produto" else f"{ordem} {direcao}, id_produto {direcao}"
+    clausula, parametros = filtro_produtos(**(filtros or {}))
+    fim = date.today()
+    inicio = fim - timedelta(days=29)
+    sql = f"""WITH pagina AS (
+    SELECT p.id_produto, p.nome, p.categoria, p.preco_unitario, p.estoque_atual, p.versao
+    FROM produtos p{clausula}
+    ORDER BY {ordenacao}
+    LIMIT ? OFFSET ?
+)
+SELECT id_produto, nome, categoria, preco_unitario, estoque_atual,
+       (SELECT COALESCE(SUM(v.quantidade), 0) FROM vendas_diarias v
+        WHERE v.id_produto = pagina.id_produto AND v.dia BETWEEN ? AND ?) AS vendidos_ultimos_30_dias,
+       versao
+FROM pagina
+ORDER BY {ordenacao}"""
+    return pd.read_sql_query(
+        sql, obter_conexao(),
+        params=parametros + [int(limite), int(pagina) * int(limite), inicio.isoformat(), fim.isoformat()],
+    )
@@ -0,0 +1,155 @@
+"""Escritor único: fila assíncrona de movimentações com commit em grupo.
+
+Com `config.ESCRITOR_UNICO` ligado, `registrar_movimentacao` não abre
+mais uma transação por venda: entrega o pedido a uma fila `asyncio`
+atendida por uma única thread do processo. Essa thread junta os pedidos
+que já estiverem na fila (até `config.ESCRITOR_LOTE_MAX`, sem passar de
+`config.ESCRITOR_JANELA_MS` coletando) e grava todos em uma só transação,
+com as mesmas regras de `aplicar_movimentacao` (política "parcial" do
+lote). Cada pedido recebe o seu próprio resultado: um pedido recusado
+(sem estoque, produto inválido) não afeta os demais do grupo.
+
+As sessões do Streamlit são threads do mesmo processo, então deixam de
+disputar o lock de escrita do SQLite entre si; o custo do COMMIT é
+dividido pelo grupo.
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+
+from core.conexao import transacao
+from utils import config
+
+_estado = {"laco": None, "fila": None, "thread": None}
+_trava = threading.Lock()
+
+
+def _gravar(pedidos):
+    """Grava um grupo de pedidos em uma transação e resolve o futuro de cada um.
+
+    Cada pedido roda em um SAVEPOINT próprio: o que for recusado é desfeito
+    sem afetar os outros, e o grupo inteiro custa um único COMMIT.
+    """
+    from core.estoque_rapido import aplicar_movimentacao
+
+    resultados = []
+    try:
+        with transacao(modo="IMMEDIATE") as con:
+            for argumentos, _ in pedidos:
+                con.execute("SAVEPOINT pedido")
+                try:
+                    aplicar_movimentacao(con, *argumentos)
+                except Exception as erro:
+                    con.execute("ROLLBACK TO pedido")
+                    resultados.append(str(erro))
+                else:
+                    resultados.append(None)
+                con.execute("RELEASE pedido")
+    except Exception as erro:  # falha no BEGIN/COMMIT: nenhum pedido do grupo foi gravado
+        for _, futuro in pedidos:
+            if not futuro.done():
+                futuro.set_exception(erro)
+        return
+
+    for (_, futuro), motivo in zip(pedidos, resultados):
+        if not futuro.done():
+            futuro.set_result(motivo)
+
+
+async def _atender(fila):
+    laco = asyncio.get_running_loop()
+    janela = config.ESCRITOR_JANELA_MS / 1000
+    parar = False
+    while not parar:
+        pedido = await fila.get()
+        if pedido is None:
+            break
+        grupo = [pedido]
+        # Junta só o que já chegou, sem esperar por mais: enquanto o grupo
+        # grava, os próximos pedidos se acumulam para o grupo seguinte. A
+        # janela é um teto para a coleta, não um atraso fixo.
+        prazo = laco.time() + janela
+        while len(grupo) < config.ESCRITOR_LOTE_MAX and laco.time() < prazo:
+            try:
+                pedido = fila.get_nowait()
+            except asyncio.QueueEmpty:
+                # Uma volta do laço entrega os pedidos já enviados por outras threads
+                await asyncio.sleep(0)
+                if fila.empty():
+                    break
+                continue
+            if pedido is None:
+                parar = True
+                break
+            grupo.append(pedido)
+        # A gravação bloqueia o laço; novos pedidos se acumulam para o próximo grupo
+        _gravar(grupo)
+
+
+def _executar(laco, fila, pronto):
+    asyncio.set_event_loop(laco)
+    laco.call_soon(pronto.set)
+    laco.run_until_complete(_atender(fila))
+    laco.close()
+
+
+def iniciar():
+    """Sobe a thread do escritor (idempotente)."""
+    with _trava:
+        if _estado["thread"] is not None and _estado["thread"].is_alive():
+            return
+        laco = asyncio.new_event_loop()
+        fila = asyncio.Queue()
+        pronto = threading.Event()
+        thread = threading.Thread(target=_executar, args=(laco, fila, pronto), name="escritor-estoque", daemon=True)
+        thread.start()
+        pronto.wait()
+        _estado.update(laco=laco, fila=fila, thread=thread)
+
+
+def parar():
+    """Grava o que estiver na fila e encerra a thread do escritor."""
+    with _trava:
+        laco, fila, thread = _estado["laco"], _estado["fila"], _estado["thread"]
+        if thread is None:
+            return
+        laco.call_soon_threadsafe(fila.put_nowait, None)
+        thread.join()
+        _estado.update(laco=None, fila=None, thread=None)
+
+
+def ativo():
+    return _estado["thread"] is not None and _estado["thread"].is_alive()
+
+
+async def registrar(movimentacao):
+    """Versão assíncrona: enfileira `movimentacao` e aguarda o resultado.
+
+    `movimentacao` é a tupla de argumentos de `aplicar_movimentacao` sem a
+    conexão: (id_produto, tipo, quantidade[, usuario, observacao, venda]).
+
+    Deve ser chamada no laço do escritor (por exemplo, por um servidor
+    assíncrono rodando nele). Retorna None se a movimentação foi gravada
+    ou o motivo da recusa.
+    """
+    futuro = asyncio.get_running_loop().create_future()
+    await _estado["fila"].put((movimentacao, futuro))
+    return await futuro
+
+
+def enviar(movimentacao, timeout=None):
+    """Enfileira `movimentacao` a partir de qualquer thread e espera o resultado.
+
+    Retorna None se a movimentação foi gravada ou o motivo da recusa.
+    Sobe o escritor na primeira chamada.
+    """
+    if not ativo():
+        iniciar()
+    # Direto na fila, sem criar uma tarefa no laço por pedido
+    futuro = concurrent.futures.Future()
+    _estado["laco"].call_soon_threadsafe(_estado["fila"].put_nowait, (movimentacao, futuro))
+    return futuro.result(timeout if timeout is not None else config.ESCRITOR_TIMEOUT_S)
+
+
+atexit.register(parar)
@@ -0,0 +1,505 @@
+"""Esquema SQLite do sistema de estoque, com migrações versionadas.
+
+A versão aplicada fica em `PRAGMA user_version`. Cada migração roda em sua
+própria transação e só avança a versão se terminar sem erro, de modo que
+bancos antigos (inclusive os recriados sem chave por
+`to_sql(if_exists='replace')`) são atualizados no próprio arquivo.
+"""
+
+DDL_PRODUTOS = """CREATE TABLE IF NOT EXISTS produtos(
+    id_produto INTEGER PRIMARY KEY,
+    nome VARCHAR(100) NOT NULL,
+    categoria VARCHAR(50),
+    preco_unitario DECIMAL(10, 2) NOT NULL,
+    estoque_atual INTEGER NOT NULL DEFAULT 0,
+    vendidos_ultimos_30_dias INTEGER NOT NULL DEFAULT 0
+    );"""
+
+DDL_MOVIMENTACOES = """CREATE TABLE IF NOT EXISTS movimentacoes(
+    id_movimentacao INTEGER PRIMARY KEY,
+    id_produto INTEGER NOT NULL,
+    tipo VARCHAR(10) NOT NULL CHECK (tipo IN ('entrada', 'saida')),
+    quantidade INTEGER NOT NULL,
+    data TIMESTAMP NOT NULL,
+    usuario VARCHAR(50),
+    observacao TEXT,
+    nome VARCHAR(100),
+    categoria VARCHAR(100)
+    );"""
+
+# Colunas criadas pela migração 1 (DDLs acima). Fica congelado: migrações
+# posteriores acrescentam colunas em `COLUNAS`, não aqui.
+_COLUNAS_V1 = {
+    "produtos": ("id_produto", "nome", "categoria", "preco_unitario",
+                 "estoque_atual", "vendidos_ultimos_30_dias"),
+    "movimentacoes": ("id_movimentacao", "id_produto", "tipo", "quantidade", "data",
+                      "usuario", "observacao", "nome", "categoria"),
+}
+
+# Colunas de cada tabela na versão atual do esquema
+COLUNAS = {
+    "produtos": _COLUNAS_V1["produtos"] + ("versao",),
+    "movimentacoes": _COLUNAS_V1["movimentacoes"] + ("venda",),
+}
+
+# Valores usados ao copiar tabelas antigas que não tinham a coluna (ou tinham NULL)
+_PADROES_COPIA = {
+    "produtos": {
+        "nome": "''",
+        "preco_unitario": "0",
+        "estoque_atual": "0",
+        "vendidos_ultimos_30_dias": "0",
+    },
+    "movimentacoes": {},
+}
+
+
+def _colunas_existentes(con, tabela):
+    return [linha[1] for linha in con.execute(f"PRAGMA table_info({tabela})")]
+
+
+def _tabelas(con):
+    return {linha[0] for linha in con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _reconstruir_tabela(con, tabela, ddl, chave):
+    """Recria `tabela` com o DDL declarado, copiando os dados existentes.
+
+    Segue o procedimento recomendado pelo SQLite para alterações que o
+    ALTER TABLE não suporta: cria a tabela nova, copia, remove a antiga e
+    renomeia. Linhas com a mesma chave são deduplicadas mantendo a última.
+    """
+    existentes = _colunas_existentes(con, tabela)
+    if not existentes:
+        con.execute(ddl)
+        return
+
+    temporaria = f"{tabela}_migracao"
+    con.execute(f"DROP TABLE IF EXISTS {temporaria}")
+    con.execute(ddl.replace(f"IF NOT EXISTS {tabela}(", f"{temporaria}(", 1))
+
+    padroes = _PADROES_COPIA[tabela]
+    destino, origem = [], []
+    for coluna in _COLUNAS_V1[tabela]:
+        if coluna in existentes:
+            padrao = padroes.get(coluna)
+            destino.append(coluna)
+            origem.append(f"COALESCE({coluna}, {padrao})" if padrao else coluna)
+        elif coluna in padroes:
+            destino.append(coluna)
+            origem.append(padroes[coluna])
+
+    con.execute(
+        f"INSERT INTO {temporaria} ({', '.join(destino)}) "
+        f"SELECT {', '.join(origem)} FROM {tabela} "
+        f"WHERE rowid IN (SELECT MAX(rowid) FROM {tabela} WHERE {chave} IS NOT NULL GROUP BY {chave})"
+    )
+    con.execute(f"DROP TABLE {tabela}")
+    con.execute(f"ALTER TABLE {temporaria} RENAME TO {tabela}")
+
+
+def _v1_chaves_e_indices(con):
+    _reconstruir_tabela(con, "produtos", DDL_PRODUTOS, "id_produto")
+    _reconstruir_tabela(con, "movimentacoes", DDL_MOVIMENTACOES, "id_movimentacao")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_produtos_categoria ON produtos(categoria)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_produtos_nome ON produtos(nome)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_movimentacoes_produto_data ON movimentacoes(id_produto, data)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_movimentacoes_tipo_data ON movimentacoes(tipo, data)")
+
+
+def _v2_indices_historico(con):
+    # Ordenação/paginação do histórico por data e limites dos filtros (MIN/MAX)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_movimentacoes_data ON movimentacoes(data)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_movimentacoes_quantidade ON movimentacoes(quantidade)")
+
+
+def _fts5_disponivel(con):
+    return any(linha[0] == "ENABLE_FTS5" for linha in con.execute("PRAGMA compile_options"))
+
+
+def _v3_busca_produtos(con):
+    # Índice de busca com conteúdo externo (`produtos`), sincronizado por gatilhos
+    if not _fts5_disponivel(con):
+        return
+    con.execute(
+        """CREATE VIRTUAL TABLE IF NOT EXISTS produtos_busca USING fts5(
+        nome, categoria,
+        content='produtos', content_rowid='id_produto',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+        )"""
+    )
+    con.execute(
+        """CREATE TRIGGER IF NOT EXISTS produtos_busca_ai AFTER INSERT ON produtos BEGIN
+        INSERT INTO produtos_busca(rowid, nome, categoria)
+        VALUES (new.id_produto, new.nome, new.categoria);
+        END"""
+    )
+    con.execute(
+        """CREATE TRIGGER IF NOT EXISTS produtos_busca_ad AFTER DELETE ON produtos BEGIN
+        INSERT INTO produtos_busca(produtos_busca, rowid, nome, categoria)
+        VALUES ('delete', old.id_produto, old.nome, old.categoria);
+        END"""
+    )
+    con.execute(
+        """CREATE TRIGGER IF NOT EXISTS produtos_busca_au
+        AFTER UPDATE OF id_produto, nome, categoria ON produtos BEGIN
+        INSERT INTO produtos_busca(produtos_busca, rowid, nome, categoria)
+        VALUES ('delete', old.id_produto, old.nome, old.categoria);
+        INSERT INTO produtos_busca(rowid, nome, categoria)
+        VALUES (new.id_produto, new.nome, new.categoria);
+        END"""
+    )
+    con.execute("INSERT INTO produtos_busca(produtos_busca) VALUES ('rebuild')")
+
+
+def _v4_vendas_diarias(con):
+    # `venda` distingue vendas de outras saídas (perdas, consumo...). O
+    # histórico anterior não guardava essa informação; suas saídas são
+    # tratadas como vendas.
+    if "venda" not in _colunas_existentes(con, "movimentacoes"):
+        con.execute("ALTER TABLE movimentacoes ADD COLUMN venda INTEGER NOT NULL DEFAULT 0")
+        con.execute("UPDATE movimentacoes SET venda = 1 WHERE tipo = 'saida'")
+
+    # Consolidado diário de vendas por produto, mantido por gatilho a cada
+    # venda registrada; consultas de janela (7/30/90 dias) leem daqui.
+    con.execute(
+        """CREATE TABLE IF NOT EXISTS vendas_diarias(
+        id_produto INTEGER NOT NULL,
+        dia TEXT NOT NULL,
+        quantidade INTEGER NOT NULL,
+        receita REAL NOT NULL,
+        PRIMARY KEY (id_produto, dia)
+        ) WITHOUT ROWID"""
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_vendas_diarias_dia ON vendas_diarias(dia)")
+    con.execute(
+        """CREATE TRIGGER IF NOT EXISTS vendas_diarias_ai AFTER INSERT ON movimentacoes
+        WHEN new.tipo = 'saida' AND new.venda = 1 BEGIN
+        INSERT INTO vendas_diarias(id_produto, dia, quantidade, receita)
+        VALUES (
+            new.id_produto,
+            substr(new.data, 1, 10),
+            new.quantidade,
+            new.quantidade * COALESCE((SELECT preco_unitario FROM produtos WHERE id_produto = new.id_produto), 0)
+        )
+        ON CONFLICT(id_produto, dia) DO UPDATE SET
+            quantidade = quantidade + excluded.quantidade,
+            receita = receita + excluded.receita;
+        END"""
+    )
+    reconstruir_vendas_diarias(con)
+
+
+def reconstruir_vendas_diarias(con):
+    """Recalcula `vendas_diarias` a partir do histórico do SQLite (uso excepcional).
+
+    Os dias de meses já compactados em Parquet (migração 9) não estão mais
+    em `movimentacoes` e são preservados.
+    """
+    corte = ""
+    if "historico_corte" in _tabelas(con):
+        linha = con.execute("SELECT corte FROM historico_corte WHERE id = 1").fetchone()
+        corte = linha[0] if linha else ""
+    con.execute("DELETE FROM vendas_diarias WHERE dia >= ?", (corte,))
+    con.execute(
+        """INSERT INTO vendas_diarias(id_produto, dia, quantidade, receita)
+        SELECT m.id_produto, substr(m.data, 1, 10), SUM(m.quantidade),
+               SUM(m.quantidade * COALESCE(p.preco_unitario, 0))
+        FROM movimentacoes m
+        LEFT JOIN produtos p ON p.id_produto = m.id_produto
+        WHERE m.tipo = 'saida' AND m.venda = 1 AND m.data >= ?
+        GROUP BY 1, 2""",
+        (corte,),
+    )
+
+
+def _v5_plano_reposicao(con):
+    # Resultado em cache do planejador de reposição (`core.reposicao`)
+    con.execute(
+        """CREATE TABLE IF NOT EXISTS plano_reposicao(
+        id_produto INTEGER PRIMARY KEY,
+        media_diaria REAL NOT NULL,
+        desvio_diario REAL NOT NULL,
+        estoque_atual INTEGER NOT NULL,
+        estoque_seguranca REAL NOT NULL,
+        ponto_pedido REAL NOT NULL,
+        quantidade_sugerida INTEGER NOT NULL,
+        dias_cobertura REAL,
+        repor INTEGER NOT NULL
+        )"""
+    )
+    con.execute(
+        """CREATE TABLE IF NOT EXISTS plano_reposicao_estado(
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        dia TEXT NOT NULL,
+        ultimo_id_movimentacao INTEGER NOT NULL,
+        parametros TEXT NOT NULL
+        )"""
+    )
+
+
+def _v6_classificacao_produtos(con):
+    # Rótulos do job de classificação (`core.classificacao`), lidos pelos filtros
+    con.execute(
+        """CREATE TABLE IF NOT EXISTS classificacao_produtos(
+        id_produto INTEGER PRIMARY KEY,
+        quantidade INTEGER NOT NULL,
+        receita REAL NOT NULL,
+        coeficiente_variacao REAL,
+        sazonalidade REAL,
+        classe_abc TEXT NOT NULL,
+        classe_xyz TEXT NOT NULL,
+        rotulo TEXT NOT NULL
+        )"""
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_classificacao_rotulo ON classificacao_produtos(rotulo)")
+    con.execute(
+        """CREATE TABLE IF NOT EXISTS classificacao_estado(
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        ate TEXT NOT NULL,
+        ultimo_id_movimentacao INTEGER NOT NULL,
+        parametros TEXT NOT NULL
+        )"""
+    )
+
+
+def _v7_saldos_estoque(con):
+    # Saldos periódicos por produto (`core.saldos`): `saldo` é o estoque ao
+    # fim de `dia`, somando todas as movimentações até esse dia.
+    con.execute(
+        """CREATE TABLE IF NOT EXISTS saldos_estoque(
+        id_produto INTEGER NOT NULL,
+        dia TEXT NOT NULL,
+        saldo INTEGER NOT NULL,
+        PRIMARY KEY (id_produto, dia)
+        ) WITHOUT ROWID"""
+    )
+    # Movimentação retroativa (ou corrigida) invalida os saldos a partir do seu dia
+    con.execute(
+        """CREATE TRIGGER IF NOT EXISTS saldos_estoque_ai AFTER INSERT ON movimentacoes BEGIN
+        DELETE FROM saldos_estoque WHERE id_produto = new.id_produto AND dia >= substr(new.data, 1, 10);
+        END"""
+    )
+    con.execute(
+        """CREATE TRIGGER IF NOT EXISTS saldos_estoque_au
+        AFTER UPDATE OF id_produto, tipo, quantidade, data ON movimentacoes BEGIN
+        DELETE FROM saldos_estoque WHERE id_produto = old.id_produto AND dia >= substr(old.data, 1, 10);
+        DELETE FROM saldos_estoque WHERE id_produto = new.id_produto AND dia >= substr(new.data, 1, 10);
+        END"""
+    )
+
+
+def _v8_versao_produtos(con):
+    # Controle otimista: toda alteração de um produto incrementa `versao`, e
+    # quem editou a partir de uma leitura antiga recebe um conflito.
+    if "versao" not in _colunas_existentes(con, "produtos"):
+        con.execute("ALTER TABLE produtos ADD COLUMN versao INTEGER NOT NULL DEFAULT 0")
+    con.execute(
+        """CREATE TRIGGER IF NOT EXISTS produtos_versao_au AFTER UPDATE ON produtos
+        WHEN new.versao = old.versao BEGIN
+        UPDATE produtos SET versao = old.versao + 1 WHERE id_produto = new.id_produto;
+        END"""
+    )
+
+
+def _v9_historico_arquivado(con):
+    # Meses de `movimentacoes` compactados em Parquet (`core.historico_arquivo`).
+    # O SQLite guarda só as movimentações a partir de `corte` (primeiro dia
+    # de um mês); os agregados de cada mês arquivado respondem aos filtros
+    # do histórico sem abrir os arquivos.
+    con.execute(
+        """CREATE TABLE IF NOT EXISTS historico_corte(
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        corte TEXT NOT NULL
+        )"""
+    )
+    con.execute(
+        """CREATE TABLE IF NOT EXISTS historico_arquivado(
+        mes TEXT PRIMARY KEY,
+        arquivo TEXT NOT NULL,
+        linhas INTEGER NOT NULL,
+        id_min INTEGER NOT NULL,
+        id_max INTEGER NOT NULL,
+        data_min TEXT NOT NULL,
+        data_max TEXT NOT NULL,
+        quantidade_min INTEGER NOT NULL,
+        quantidade_max INTEGER NOT NULL,
+        entradas INTEGER NOT NULL,
+        saidas INTEGER NOT NULL
+        )"""
+    )
+    # Os snapshots de meses arquivados não podem mais ser refeitos a partir
+    # do SQLite: movimentação retroativa (ou corrigida) passa a ajustar os
+    # saldos a partir do seu dia em vez de apagá-los.
+    con.execute("DROP TRIGGER IF EXISTS saldos_estoque_ai")
+    con.execute("DROP TRIGGER IF EXISTS saldos_estoque_au")
+    con.execute(
+        """CREATE TRIGGER saldos_estoque_ai AFTER INSERT ON movimentacoes BEGIN
+        UPDATE saldos_estoque
+        SET saldo = saldo + CASE WHEN new.tipo = 'entrada' THEN new.quantidade ELSE -new.quantidade END
+        WHERE id_produto = new.id_produto AND dia >= substr(new.data, 1, 10);
+        END"""
+    )
+    con.execute(
+        """CREATE TRIGGER saldos_estoque_au
+        AFTER UPDATE OF id_produto, tipo, quantidade, data ON movimentacoes BEGIN
+        UPDATE saldos_estoque
+        SET saldo = saldo - CASE WHEN old.tipo = 'entrada' THEN old.quantidade ELSE -old.quantidade END
+        WHERE id_produto = old.id_produto AND dia >= substr(old.data, 1, 10);
+        UPDATE saldos_estoque
+        SET saldo = saldo + CASE WHEN new.tipo = 'entrada' THEN new.quantidade ELSE -new.quantidade END
+        WHERE id_produto = new.id_produto AND dia >= substr(new.data, 1, 10);
+        END"""
+    )
+
+
+def _v10_indices_grade_produtos(con):
+    # Grade de produtos paginada no SQL (`core.consultas.pagina_produtos`):
+    # limites dos sliders (MIN/MAX) e ordenação por preço e estoque pelo índice
+    con.execute("CREATE INDEX IF NOT EXISTS idx_produtos_preco ON produtos(preco_unitario)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_produtos_estoque ON produtos(estoque_atual)")
+
+
+def _v11_mudancas(con):
+    # Feed de mudanças (`core.mudancas`): uma linha por registro alterado,
+    # com a sequência da última alteração. Mantido por gatilhos, vale para
+    # qualquer escritor (app, API rápida, escritor único, CLI e importação).
+    con.execute(
+        """CREATE TABLE IF NOT EXISTS mudancas_sequencia(
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        valor INTEGER NOT NULL
+        )"""
+    )
+    con.execute("INSERT OR IGNORE INTO mudancas_sequencia (id, valor) VALUES (1, 0)")
+    con.execute(
+        """CREATE TABLE IF NOT EXISTS mudancas(
+        tabela TEXT NOT NULL,
+        id_registro INTEGER NOT NULL,
+        operacao TEXT NOT NULL CHECK (operacao IN ('I', 'U', 'D')),
+        seq INTEGER NOT NULL,
+        PRIMARY KEY (tabela, id_registro)
+        ) WITHOUT ROWID"""
+    )
+    con.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_mudancas_seq ON mudancas(seq)")
+
+    # UPDATE e, se não havia linha (changes() = 0), INSERT. Não usa OR
+    # REPLACE: dentro de um UPSERT que cai no DO UPDATE (importação de CSV),
+    # a política de conflito da instrução externa prevalece e o REPLACE vira
+    # erro de chave única. ON CONFLICT DO UPDATE funcionaria, mas custa o
+    # dobro neste gatilho, que roda em toda venda.
+    def gatilho(nome, evento, tabela, id_registro, operacao, quando=""):
+        con.execute(f"DROP TRIGGER IF EXISTS {nome}")
+        con.execute(
+            f"""CREATE TRIGGER {nome} {evento}{quando} BEGIN
+            UPDATE mudancas_sequencia SET valor = valor + 1 WHERE id = 1;
+            UPDATE mudancas SET operacao = '{operacao}', seq = (SELECT valor FROM mudancas_sequencia WHERE id = 1)
+            WHERE tabela = '{tabela}' AND id_registro = {id_registro};
+            INSERT INTO mudancas (tabela, id_registro, operacao, seq)
+            SELECT '{tabela}', {id_registro}, '{operacao}', valor FROM mudancas_sequencia
+            WHERE id = 1 AND changes() = 0;
+            END"""
+        )
+
+    gatilho("mudancas_produtos_ai", "AFTER INSERT ON produtos", "produtos", "new.id_produto", "I")
+    # Todo UPDATE de produto dispara `produtos_versao_au`, que incrementa a
+    # versão: registrar só esse segundo UPDATE grava uma linha por alteração
+    gatilho("mudancas_produtos_au", "AFTER UPDATE OF versao ON produtos", "produtos", "new.id_produto", "U",
+            " WHEN new.versao <> old.versao")
+    gatilho("mudancas_produtos_ad", "AFTER DELETE ON produtos", "produtos", "old.id_produto", "D")
+    # Movimentações são registradas pelo produto: "o histórico e as vendas
+    # deste produto mudaram". DELETE fica de fora: a compactação do
+    # histórico (`core.historico_arquivo`) move linhas sem mudar os dados.
+    gatilho("mudancas_movimentacoes_ai", "AFTER INSERT ON movimentacoes", "movimentacoes", "new.id_produto", "I")
+    gatilho("mudancas_movimentacoes_au", "AFTER UPDATE ON movimentacoes", "movimentacoes", "new.id_produto", "U")
+
+
+def _v12_vendas_diarias_ajustes(con):
+    # `vendas_diarias` só era mantido na inserção: UPDATE (inclusive o
+    # ON CONFLICT DO UPDATE da importação de CSV) e DELETE deixavam o
+    # consolidado defasado. Como nos gatilhos de `saldos_estoque` (migração
+    # 9), a linha antiga é subtraída e a nova somada; dias que zeram saem.
+    # A receita usa o preço atual do produto, como na inserção.
+    def subtrair(linha):
+        return f"""UPDATE vendas_diarias SET
+            quantidade = quantidade - {linha}.quantidade,
+            receita = receita - {linha}.quantidade
+                * COALESCE((SELECT preco_unitario FROM produtos WHERE id_produto = {linha}.id_produto), 0)
+        WHERE {linha}.tipo = 'saida' AND {linha}.venda = 1
+          AND id_produto = {linha}.id_produto AND dia = substr({linha}.data, 1, 10);
+        DELETE FROM vendas_diarias
+        WHERE id_produto = {linha}.id_produto AND dia = substr({linha}.data, 1, 10) AND quantidade <= 0;"""
+
+    con.execute("DROP TRIGGER IF EXISTS vendas_diarias_au")
+    con.execute("DROP TRIGGER IF EXISTS vendas_diarias_ad")
+    con.execute(
+        f"""CREATE TRIGGER vendas_diarias_au
+        AFTER UPDATE OF id_produto, tipo, quantidade, data, venda ON movimentacoes BEGIN
+        {subtrair("old")}
+        INSERT INTO vendas_diarias(id_produto, dia, quantidade, receita)
+        SELECT new.id_produto, substr(new.data, 1, 10), new.quantidade,
+               new.quantidade * COALESCE((SELECT preco_unitario FROM produtos WHERE id_produto = new.id_produto), 0)
+        WHERE new.tipo = 'saida' AND new.venda = 1
+        ON CONFLICT(id_produto, dia) DO UPDATE SET
+            quantidade = quantidade + excluded.quantidade,
+            receita = receita + excluded.receita;
+        END"""
+    )
+    # A compactação (`core.historico_arquivo`) apaga do SQLite as linhas
+    # anteriores ao corte depois de gravá-lo; o consolidado desses dias
+    # continua valendo e não é tocado.
+    con.execute(
+        f"""CREATE TRIGGER vendas_diarias_ad AFTER DELETE ON movimentacoes
+        WHEN old.data >= COALESCE((SELECT corte FROM historico_corte WHERE id = 1), '') BEGIN
+        {subtrair("old")}
+        END"""
+    )
+    reconstruir_vendas_diarias(con)
+
+
+# Lista ordenada de (versão, migração). Novas migrações entram sempre no final.
+MIGRACOES = [
+    (1, _v1_chaves_e_indices),
+    (2, _v2_indices_historico),
+    (3, _v3_busca_produtos),
+    (4, _v4_vendas_diarias),
+    (5, _v5_plano_reposicao),
+    (6, _v6_classificacao_produtos),
+    (7, _v7_saldos_estoque),
+    (8, _v8_versao_produtos),
+    (9, _v9_historico_arquivado),
+    (10, _v10_indices_grade_produtos),
+    (11, _v11_mudancas),
+    (12, _v12_vendas_diarias_ajustes),
+]
+
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+
+def versao(con):
+    return con.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrar(con):
+    """Aplica, em ordem, as migrações ainda não aplicadas ao banco de `con`.
+
+    `con` deve estar em modo autocommit (isolation_level=None), como as
+    conexões de `core.conexao`. Retorna a versão final do esquema.
+    """
+    if versao(con) >= VERSAO_ATUAL:
+        return versao(con)
+
+    for numero, migracao in MIGRACOES:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            # Relido dentro da transação: outro processo pode ter migrado antes
+            if versao(con) >= numero:
+                con.execute("COMMIT")
+                continue
+            migracao(con)
+            con.execute(f"PRAGMA user_version = {int(numero)}")
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+    return versao(con)
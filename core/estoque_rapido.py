@@ -0,0 +1,286 @@
+"""API transacional enxuta: sqlite3 puro, sem pandas no caminho de escrita.
+
+Para terminais de caixa, scripts e serviços que só registram vendas e
+mantêm o cadastro. Importar este módulo não carrega pandas nem NumPy
+(só `sqlite3`, `core.conexao` e `core.metricas`), e cada operação é uma
+ou duas instruções SQL sobre a conexão reutilizada da thread, sem montar
+DataFrames. Os produtos voltam como `Produto` (tupla nomeada, sem
+`__dict__`).
+
+As funções equivalentes de `core.gerenciamento_estoque` (que devolvem ou
+recebem DataFrames) chamam estas. Para análises, `como_dataframe`
+converte uma lista de registros, importando pandas só nessa hora.
+
+Erros de regra (produto inexistente, falta de estoque, quantidade
+inválida) levantam ValueError sem alterar nada; conflitos de edição
+levantam `ConflitoVersao`.
+"""
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from core.cache import invalida_cache
+from core.conexao import obter_conexao, transacao
+from core.metricas import medido
+from utils import config
+
+TIPOS_MOVIMENTACAO = ("entrada", "saida")
+CAMPOS_EDITAVEIS = ("nome", "categoria", "preco_unitario")
+VERDADEIROS = {"1", "true", "sim", "s", "yes", "y"}
+FALSOS = {"", "0", "false", "nao", "não", "n", "no"}
+
+
+class Produto(namedtuple("Produto", "id_produto nome categoria preco_unitario estoque_atual versao")):
+    """Linha de `produtos` (sem `vendidos_ultimos_30_dias`, que é calculado: ver `vendidos`)."""
+    __slots__ = ()
+
+
+_SELECT_PRODUTO = "SELECT id_produto, nome, categoria, preco_unitario, estoque_atual, versao FROM produtos"
+
+
+def interpretar_venda(valor):
+    """Converte o campo `venda` vindo de CSV/JSON em bool; None se não for reconhecido.
+
+    Textos são comparados (sem caixa e espaços) com `VERDADEIROS` e
+    `FALSOS`; números e bools seguem a regra de `bool`.
+    """
+    if isinstance(valor, str):
+        texto = valor.strip().lower()
+        if texto in VERDADEIROS:
+            return True
+        if texto in FALSOS:
+            return False
+        return None
+    if isinstance(valor, (bool, int, float)):
+        return bool(valor)
+    return None
+
+
+class ConflitoVersao(ValueError):
+    """O produto foi alterado por outra pessoa depois de lido."""
+
+
+def _agora():
+    return datetime.now().isoformat(sep=" ", timespec="seconds")
+
+
+def produto(id_produto):
+    """O produto `id_produto`, ou None se não existir."""
+    linha = obter_conexao().execute(f"{_SELECT_PRODUTO} WHERE id_produto = ?", (int(id_produto),)).fetchone()
+    return Produto._make(linha) if linha else None
+
+
+def produtos(ids_produtos=None):
+    """Produtos do catálogo (todos, ou os de `ids_produtos`), por id."""
+    con = obter_conexao()
+    if ids_produtos is None:
+        cursor = con.execute(f"{_SELECT_PRODUTO} ORDER BY id_produto")
+    else:
+        ids = [int(i) for i in ids_produtos]
+        cursor = con.execute(
+            f"{_SELECT_PRODUTO} WHERE id_produto IN ({', '.join('?' * len(ids))}) ORDER BY id_produto", ids
+        )
+    return [Produto._make(linha) for linha in cursor]
+
+
+def estoque(id_produto):
+    """Estoque atual de `id_produto` (ValueError se o produto não existir)."""
+    linha = obter_conexao().execute(
+        "SELECT estoque_atual FROM produtos WHERE id_produto = ?", (int(id_produto),)
+    ).fetchone()
+    if linha is None:
+        raise ValueError("ID de produto não encontrado")
+    return linha[0]
+
+
+def estoque_baixo(limite=10):
+    """Produtos com estoque abaixo de `limite`, do menor estoque para o maior."""
+    return [
+        Produto._make(linha) for linha in obter_conexao().execute(
+            f"{_SELECT_PRODUTO} WHERE estoque_atual < ? ORDER BY estoque_atual, id_produto", (int(limite),)
+        )
+    ]
+
+
+def vendidos(id_produto, dias=30, ate=None):
+    """Unidades vendidas de `id_produto` nos últimos `dias` dias até `ate` (consolidado `vendas_diarias`)."""
+    ate = ate or date.today()
+    linha = obter_conexao().execute(
+        "SELECT COALESCE(SUM(quantidade), 0) FROM vendas_diarias WHERE id_produto = ? AND dia BETWEEN ? AND ?",
+        (int(id_produto), (ate - timedelta(days=dias - 1)).isoformat(), ate.isoformat()),
+    ).fetchone()
+    return linha[0]
+
+
+def aplicar_movimentacao(con, id_produto, tipo, quantidade, usuario="Sistema", observacao="", venda=False):
+    """Aplica uma movimentação dentro da transação já aberta em `con`.
+
+    Atualiza o estoque com um UPDATE condicional e insere a linha em
+    `movimentacoes`. Levanta ValueError (sem ter alterado nada) se o
+    produto não existir, o tipo for inválido ou faltar estoque. Retorna o
+    id da movimentação.
+    """
+    id_produto = int(id_produto)
+    quantidade = int(quantidade)
+    if tipo not in TIPOS_MOVIMENTACAO:
+        raise ValueError("Tipo de movimentação inválido")
+    if quantidade <= 0:
+        raise ValueError("Quantidade inválida")
+
+    cur = con.cursor()
+    if tipo == "entrada":
+        cur.execute(
+            "UPDATE produtos SET estoque_atual = estoque_atual + ? WHERE id_produto = ?",
+            (quantidade, id_produto),
+        )
+    else:
+        cur.execute(
+            "UPDATE produtos SET estoque_atual = estoque_atual - ? "
+            "WHERE id_produto = ? AND estoque_atual >= ?",
+            (quantidade, id_produto, quantidade),
+        )
+
+    if cur.rowcount == 0:
+        existe = cur.execute(
+            "SELECT 1 FROM produtos WHERE id_produto = ?", (id_produto,)
+        ).fetchone()
+        if existe is None:
+            raise ValueError("ID de produto inválido")
+        raise ValueError("Quantidade indisponível em estoque")
+
+    cur.execute(
+        """INSERT INTO movimentacoes
+        (id_produto, tipo, quantidade, data, usuario, observacao, nome, categoria, venda)
+        SELECT id_produto, ?, ?, ?, ?, ?, nome, categoria, ?
+        FROM produtos WHERE id_produto = ?""",
+        (
+            tipo,
+            quantidade,
+            _agora(),
+            usuario,
+            observacao,
+            int(bool(venda) and tipo == "saida"),
+            id_produto,
+        ),
+    )
+    return cur.lastrowid
+
+
+def registrar_ajuste(con, id_produto, novo_estoque, usuario="Sistema", observacao="Ajuste de estoque"):
+    """Leva o estoque de `id_produto` a `novo_estoque` com uma movimentação de ajuste.
+
+    Deve ser chamada dentro de uma transação aberta em `con`. O ajuste é
+    uma entrada ou saída comum (não é venda), de modo que o razão continua
+    explicando o estoque. Retorna a diferença aplicada.
+    """
+    atual = con.execute("SELECT estoque_atual FROM produtos WHERE id_produto = ?", (id_produto,)).fetchone()
+    if atual is None:
+        raise ValueError("ID de produto não encontrado")
+    diferenca = int(novo_estoque) - int(atual[0])
+    if diferenca == 0:
+        return 0
+
+    con.execute(
+        """INSERT INTO movimentacoes
+        (id_produto, tipo, quantidade, data, usuario, observacao, nome, categoria, venda)
+        SELECT id_produto, ?, ?, ?, ?, ?, nome, categoria, 0
+        FROM produtos WHERE id_produto = ?""",
+        (
+            "entrada" if diferenca > 0 else "saida",
+            abs(diferenca),
+            _agora(),
+            usuario,
+            observacao,
+            id_produto,
+        ),
+    )
+    con.execute("UPDATE produtos SET estoque_atual = ? WHERE id_produto = ?", (int(novo_estoque), id_produto))
+    return diferenca
+
+
+@medido
+@invalida_cache
+def registrar_movimentacao(id_produto, tipo, quantidade, usuario="Sistema", observacao="", venda=False):
+    """Registra uma movimentação em uma transação IMMEDIATE (ou pelo escritor único).
+
+    Levanta ValueError com o motivo se a movimentação for recusada.
+    """
+    if config.ESCRITOR_UNICO:
+        # asyncio só é carregado por quem usa o escritor
+        from core import escritor
+        motivo = escritor.enviar((id_produto, tipo, quantidade, usuario, observacao, venda))
+        if motivo is not None:
+            raise ValueError(motivo)
+        return
+
+    with transacao(modo="IMMEDIATE") as con:
+        aplicar_movimentacao(con, id_produto, tipo, quantidade, usuario, observacao, venda)
+
+
+def vender(id_produto, quantidade, usuario="Sistema", observacao=""):
+    """Atalho para uma saída marcada como venda."""
+    registrar_movimentacao(id_produto, "saida", quantidade, usuario, observacao, venda=True)
+
+
+@medido
+@invalida_cache
+def adicionar_produto(nome, preco_unitario, categoria=None, estoque_inicial=0, usuario="Sistema"):
+    """Insere um produto e retorna o ID atribuído.
+
+    O estoque inicial, se houver, entra como movimentação de ajuste, de
+    modo que o razão em `movimentacoes` explica o estoque desde o início.
+    """
+    with transacao(modo="IMMEDIATE") as con:
+        novo_id = con.execute("SELECT COALESCE(MAX(id_produto), 0) + 1 FROM produtos").fetchone()[0]
+        con.execute(
+            "INSERT INTO produtos (id_produto, nome, categoria, preco_unitario, estoque_atual) VALUES (?, ?, ?, ?, 0)",
+            (novo_id, nome, categoria, preco_unitario),
+        )
+        registrar_ajuste(con, novo_id, int(estoque_inicial or 0), usuario, "Estoque inicial")
+    return novo_id
+
+
+def _conferir_produto(con, id_produto, versao):
+    atual = con.execute("SELECT versao FROM produtos WHERE id_produto = ?", (id_produto,)).fetchone()
+    if atual is None:
+        raise ValueError("ID de produto não encontrado")
+    if versao is not None and int(versao) != atual[0]:
+        raise ConflitoVersao("Produto alterado por outro usuário; recarregue e tente novamente")
+
+
+@medido
+@invalida_cache
+def editar_produto(id_produto, campos, estoque_atual=None, usuario="Sistema", versao=None):
+    """Atualiza `campos` (nome, categoria, preco_unitario) de um produto em um único UPDATE.
+
+    `estoque_atual`, se informado, vira uma movimentação de ajuste pela
+    diferença. Com `versao`, a edição só é aplicada se ninguém tiver
+    alterado o produto desde a leitura; senão levanta `ConflitoVersao`.
+    """
+    id_produto = int(id_produto)
+    campos = {c: v for c, v in campos.items() if c in CAMPOS_EDITAVEIS}
+    with transacao(modo="IMMEDIATE") as con:
+        _conferir_produto(con, id_produto, versao)
+        if campos:
+            con.execute(
+                f"UPDATE produtos SET {', '.join(f'{c} = ?' for c in campos)} WHERE id_produto = ?",
+                list(campos.values()) + [id_produto],
+            )
+        if estoque_atual is not None:
+            registrar_ajuste(con, id_produto, estoque_atual, usuario, "Ajuste de estoque (edição do produto)")
+
+
+@medido
+@invalida_cache
+def remover_produto(id_produto, versao=None):
+    """Remove um produto do catálogo (o histórico de movimentações é mantido)."""
+    id_produto = int(id_produto)
+    with transacao(modo="IMMEDIATE") as con:
+        _conferir_produto(con, id_produto, versao)
+        con.execute("DELETE FROM produtos WHERE id_produto = ?", (id_produto,))
+
+
+def como_dataframe(registros):
+    """DataFrame com os `Produto` de `registros` (pandas é importado aqui)."""
+    import pandas as pd
+
+    return pd.DataFrame.from_records(list(registros), columns=Produto._fields)
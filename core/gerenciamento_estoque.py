@@ -1,206 +1,477 @@
-import sqlite3
+import json
+import numpy as np
 import pandas as pd
 import os
+import time
 from datetime import datetime
+from itertools import islice
 
-DB_PATH = "data/raw/estoque.db"
+from core import esquema, estoque_rapido, historico_arquivo
+from core.cache import invalida_cache
+from core.busca import SELECT_PRODUTOS, pesquisar_produtos
+from core.classificacao import filtro_classe
+from core.estoque_rapido import ConflitoVersao  # noqa: F401 (reexportado para o app)
+from core.vendas import limites_janela
+from core.conexao import obter_conexao, transacao
+from core.metricas import medido
 
 def _get_connection():
-    """Abre (ou cria) uma conexão SQLite e garante estrutura necessária."""
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    con = sqlite3.connect(DB_PATH)
-    return con
+    """Retorna a conexão reutilizada da thread atual (o esquema já está garantido)."""
+    return obter_conexao()
 
 
+@medido
 def carregar_produtos():
-    """Retorna um DataFrame com a tabela `produtos` e cria a tabela se não existir."""
-    con = _get_connection()
-    criar_tabelas_produtos()  # garante existência da tabela
-    df = pd.read_sql_query("SELECT * FROM produtos", con)
-    con.close()
-
-    if "vendidos_ultimos_30_dias" not in df.columns:
-        df["vendidos_ultimos_30_dias"] = 0
+    """Retorna um DataFrame com a tabela `produtos`.
 
+    `vendidos_ultimos_30_dias` é calculado na leitura a partir do
+    consolidado `vendas_diarias`, de modo que vendas com mais de 30 dias
+    deixam de contar.
+    """
+    con = _get_connection()
+    inicio, fim = limites_janela(30)
+    df = pd.read_sql_query(
+        """SELECT p.id_produto, p.nome, p.categoria, p.preco_unitario, p.estoque_atual,
+       COALESCE(v.quantidade, 0) AS vendidos_ultimos_30_dias, p.versao
+FROM produtos p
+LEFT JOIN (
+    SELECT id_produto, SUM(quantidade) AS quantidade
+    FROM vendas_diarias WHERE dia BETWEEN ? AND ?
+    GROUP BY id_produto
+) v ON v.id_produto = p.id_produto""",
+        con,
+        params=(inicio, fim),
+    )
     return df
 
+def _substituir_conteudo(tabela, df):
+    """Troca as linhas de `tabela` pelas de `df`, preservando o esquema declarado."""
+    colunas = [c for c in esquema.COLUNAS[tabela] if c in df.columns]
+    linhas = df[colunas].astype(object).where(df[colunas].notna(), None)
+    with transacao(modo="IMMEDIATE") as con:
+        con.execute(f"DELETE FROM {tabela}")
+        if tabela == "movimentacoes":
+            # O gatilho de `vendas_diarias` refaz o consolidado ao reinserir;
+            # os saldos periódicos são refeitos por `core.saldos`. Só a parte
+            # viva é trocada: consolidado e snapshots de meses compactados em
+            # Parquet não podem ser refeitos a partir do SQLite e são mantidos.
+            corte = historico_arquivo.corte(con) or ""
+            con.execute("DELETE FROM vendas_diarias WHERE dia >= ?", (corte,))
+            con.execute("DELETE FROM saldos_estoque WHERE dia >= ?", (corte,))
+        con.executemany(
+            f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})",
+            linhas.itertuples(index=False, name=None),
+        )
+
+@medido
+@invalida_cache
 def salvar_produtos(df):
     """Salva o DataFrame `df` na tabela `produtos`, substituindo o conteúdo."""
-    con = _get_connection()
-    df.to_sql('produtos', con, if_exists='replace', index=False)
-    con.close()
+    _substituir_conteudo("produtos", df)
 
+@medido
 def carregar_movimentacoes():
-    """Retorna DataFrame da tabela `movimentacoes` e cria a tabela se não existir."""
+    """Retorna DataFrame da tabela `movimentacoes` (só a parte viva: meses
+    compactados por `core.historico_arquivo` ficam de fora)."""
     con = _get_connection()
-    criar_tabelas_movimentacoes()  # garante existência
     df = pd.read_sql_query("SELECT * FROM movimentacoes", con)
-    con.close()
     return df
 
+@medido
+@invalida_cache
 def salvar_movimentacoes(df):
-    con = _get_connection()
-    df.to_sql('movimentacoes', con, if_exists='replace', index=False)
-    con.close()
+    """Substitui a parte viva de `movimentacoes` por `df` (meses compactados em Parquet são mantidos)."""
+    _substituir_conteudo("movimentacoes", df)
 
+@medido
 def registrar_movimentacao(id_produto, tipo, quantidade, usuario="Sistema", observacao="", venda=False):
-    try:
-        produtos = carregar_produtos()
-        movimentacoes = carregar_movimentacoes()
-        
-        if id_produto not in produtos["id_produto"].values:
-            raise ValueError("ID de produto inválido")
-        
-        if tipo == "saida":
-            estoque_atual = produtos.loc[produtos["id_produto"] == id_produto, "estoque_atual"].values[0]
-            if estoque_atual < quantidade:
-                raise ValueError("Quantidade indisponível em estoque")
-        
-        nova_id = movimentacoes["id_movimentacao"].max() + 1 if not movimentacoes.empty else 1
-        produto_info = produtos[produtos["id_produto"] == id_produto].iloc[0]
-        nova_mov = pd.DataFrame([{
-            "id_movimentacao": nova_id,
-            "id_produto": id_produto,
-            "nome": produto_info["nome"],
-            "categoria": produto_info["categoria"],
-            "tipo": tipo,
-            "quantidade": quantidade,
-            "data": datetime.now().isoformat(sep=' ', timespec='seconds'),
-            "usuario": usuario,
-            "observacao": observacao
-        }])
-
-        if tipo == "entrada":
-            produtos.loc[produtos["id_produto"] == id_produto, "estoque_atual"] += quantidade
-        else:
-            produtos.loc[produtos["id_produto"] == id_produto, "estoque_atual"] -= quantidade
+    """Registra uma movimentação em uma única transação SQLite.
 
-            # Se for uma venda, atualiza a coluna vendidos_ultimos_30_dias
-            if venda:
-                produtos.loc[produtos["id_produto"] == id_produto, "vendidos_ultimos_30_dias"] += quantidade
+    Insere a linha em `movimentacoes` e atualiza `produtos` no próprio banco,
+    sem recarregar nem regravar as tabelas inteiras. A checagem de estoque é
+    feita pela cláusula WHERE do UPDATE, sob o lock de escrita obtido no
+    BEGIN IMMEDIATE: duas vendas simultâneas do mesmo produto nunca passam
+    ambas pela checagem com o mesmo saldo.
 
-        movimentacoes = pd.concat([movimentacoes, nova_mov], ignore_index=True)
-        salvar_movimentacoes(movimentacoes)
-        salvar_produtos(produtos)
+    Com `config.ESCRITOR_UNICO`, o pedido é gravado pelo escritor único de
+    `core.escritor`, em grupo com os de outras sessões. A gravação é a de
+    `core.estoque_rapido.registrar_movimentacao`; aqui a recusa vira False.
+    """
+    try:
+        estoque_rapido.registrar_movimentacao(id_produto, tipo, quantidade, usuario, observacao, venda)
         return True
     except Exception as e:
         print(f"Erro ao registrar movimentação: {str(e)}")
         return False
 
+POLITICAS_LOTE = ("parcial", "tudo_ou_nada")
+
+
+class _LoteRejeitado(Exception):
+    """Interrompe a transação do lote quando a política é `tudo_ou_nada`."""
+
+
+def _proximo_id_movimentacao(con):
+    return con.execute(
+        "SELECT COALESCE(MAX(id_movimentacao), 0) + 1 FROM movimentacoes"
+    ).fetchone()[0]
+
+
+def _normalizar_bloco(bloco, inicio, usuario):
+    df = pd.DataFrame.from_records(bloco)
+    df.index = pd.RangeIndex(inicio, inicio + len(df))
+    agora = datetime.now().isoformat(sep=' ', timespec='seconds')
+    padroes = {"usuario": usuario, "observacao": "", "venda": False, "data": agora}
+    for coluna in ("id_produto", "tipo", "quantidade"):
+        if coluna not in df.columns:
+            raise ValueError(f"Coluna obrigatória ausente no lote: {coluna}")
+    for coluna, padrao in padroes.items():
+        if coluna not in df.columns:
+            df[coluna] = padrao
+        else:
+            df[coluna] = df[coluna].where(df[coluna].notna(), padrao)
+    df["id_produto"] = pd.to_numeric(df["id_produto"], errors="coerce")
+    df["quantidade"] = pd.to_numeric(df["quantidade"], errors="coerce")
+    # Só datas ISO: "16/10/2026" viraria um dia que não ordena nem agrupa.
+    # O que não for reconhecido fica NaN e a linha é rejeitada.
+    df["data"] = pd.to_datetime(df["data"], errors="coerce", format="ISO8601").dt.strftime("%Y-%m-%d %H:%M:%S")
+    if df["venda"].dtype != bool:
+        # Textos como "0" ou "nao" não podem virar True; o que não for
+        # reconhecido fica None e a linha é rejeitada em `_validar_bloco`
+        df["venda"] = df["venda"].map(estoque_rapido.interpretar_venda).astype(object)
+    return df
+
+
+def _validar_bloco(df, estoque):
+    """Devolve (mascara_valida, motivos) para o bloco, de forma vetorizada.
+
+    `estoque` é uma Series id_produto -> estoque atual. O saldo corrente de
+    cada produto é obtido com um cumsum agrupado; apenas os produtos em que
+    alguma saída estoura o saldo são revisitados linha a linha, pois rejeitar
+    uma linha altera o saldo das seguintes.
+    """
+    motivos = pd.Series("", index=df.index, dtype=object)
+    motivos[~df["tipo"].isin(["entrada", "saida"])] = "Tipo de movimentação inválido"
+    motivos[~(df["quantidade"] > 0) | (df["quantidade"] % 1 != 0)] = "Quantidade inválida"
+    motivos[~df["id_produto"].isin(estoque.index)] = "ID de produto inválido"
+    motivos[df["venda"].isna()] = "Valor de venda inválido"
+    motivos[df["data"].isna()] = "Data inválida"
+
+    validas = motivos == ""
+    delta = np.where(df["tipo"] == "entrada", df["quantidade"], -df["quantidade"])
+    delta = pd.Series(np.where(validas, delta, 0), index=df.index)
+    saldo = estoque.reindex(df["id_produto"]).to_numpy() + delta.groupby(df["id_produto"]).cumsum().to_numpy()
+    estouro = validas & (df["tipo"] == "saida") & (saldo < 0)
+
+    revisar = validas & df["id_produto"].isin(df.loc[estouro, "id_produto"])
+    for id_produto, grupo in df.loc[revisar, ["tipo", "quantidade"]].groupby(df.loc[revisar, "id_produto"]):
+        atual = estoque[int(id_produto)]
+        sem_saldo = []
+        for indice, tipo, quantidade in zip(grupo.index, grupo["tipo"].tolist(), grupo["quantidade"].tolist()):
+            if tipo == "entrada":
+                atual += quantidade
+            elif atual >= quantidade:
+                atual -= quantidade
+            else:
+                sem_saldo.append(indice)
+        motivos[sem_saldo] = "Quantidade indisponível em estoque"
+
+    return motivos == "", motivos
+
+
+@medido
+@invalida_cache
+def registrar_movimentacoes_em_lote(movimentacoes, politica="parcial", usuario="Sistema", tamanho_bloco=5000):
+    """Registra um lote de movimentações (ex.: fechamento de caixa do PDV).
+
+    `movimentacoes` é qualquer iterável (inclusive um gerador) de dicionários
+    com `id_produto`, `tipo` e `quantidade`, e opcionalmente `usuario`,
+    `observacao`, `venda` e `data`. `venda` pode vir como texto de CSV/JSON
+    (ver `estoque_rapido.interpretar_venda`) e `data` deve estar em ISO
+    (gravada como "AAAA-MM-DD HH:MM:SS"); valores não reconhecidos
+    rejeitam a linha. O lote é consumido em blocos de
+    `tamanho_bloco` linhas, validado de forma vetorizada e gravado com
+    `executemany` em uma única transação.
+
+    Políticas:
+    - "parcial": aplica as linhas válidas e rejeita as demais;
+    - "tudo_ou_nada": qualquer linha inválida desfaz o lote inteiro.
+
+    Retorna um dicionário com o número de linhas `aplicadas` e a lista
+    `rejeitadas` de tuplas (índice da linha no lote, motivo).
+    """
+    if politica not in POLITICAS_LOTE:
+        raise ValueError(f"Política de lote inválida: {politica}")
+
+    iterador = iter(movimentacoes)
+    aplicadas = 0
+    rejeitadas = []
+    try:
+        with transacao(modo="IMMEDIATE") as con:
+            proximo_id = _proximo_id_movimentacao(con)
+            inicio = 0
+            while True:
+                bloco = list(islice(iterador, tamanho_bloco))
+                if not bloco:
+                    break
+                df = _normalizar_bloco(bloco, inicio, usuario)
+                inicio += len(bloco)
+
+                ids = [int(i) for i in df["id_produto"].dropna().unique()]
+                produtos = pd.read_sql_query(
+                    "SELECT id_produto, nome, categoria, estoque_atual FROM produtos "
+                    "WHERE id_produto IN (SELECT value FROM json_each(?))",
+                    con,
+                    params=(json.dumps(ids),),
+                    index_col="id_produto",
+                )
+                validas, motivos = _validar_bloco(df, produtos["estoque_atual"])
+                rejeitadas.extend(motivos[~validas].items())
+                if politica == "tudo_ou_nada" and not validas.all():
+                    raise _LoteRejeitado()
+
+                df = df[validas]
+                if df.empty:
+                    continue
+                df = df.assign(
+                    id_movimentacao=np.arange(proximo_id, proximo_id + len(df)),
+                    id_produto=df["id_produto"].astype("int64"),
+                    quantidade=df["quantidade"].astype("int64"),
+                    venda=(df["venda"].astype(bool) & (df["tipo"] == "saida")).astype("int64"),
+                )
+                proximo_id += len(df)
+                df = df.join(produtos[["nome", "categoria"]], on="id_produto")
+
+                colunas = list(esquema.COLUNAS["movimentacoes"])
+                con.executemany(
+                    "INSERT INTO movimentacoes (" + ", ".join(colunas) + ") "
+                    "VALUES (" + ", ".join("?" * len(colunas)) + ")",
+                    df[colunas].astype(object).itertuples(index=False, name=None),
+                )
+
+                sinal = np.where(df["tipo"] == "entrada", 1, -1)
+                totais = (sinal * df["quantidade"]).groupby(df["id_produto"], sort=False).sum()
+                con.executemany(
+                    "UPDATE produtos SET estoque_atual = estoque_atual + ? WHERE id_produto = ?",
+                    ((int(d), int(i)) for i, d in totais.items()),
+                )
+                aplicadas += len(df)
+    except _LoteRejeitado:
+        aplicadas = 0
+
+    return {"aplicadas": aplicadas, "rejeitadas": rejeitadas}
+
+@medido
 def adicionar_produto(produto):
-    df = carregar_produtos()
-    novo_id = df["id_produto"].max() + 1 if not df.empty else 1
+    """Insere um produto (dicionário com as colunas de `produtos`) via `estoque_rapido.adicionar_produto` e retorna o ID."""
+    estoque_inicial = int(produto.get("estoque_atual", 0) or 0)
+    novo_id = estoque_rapido.adicionar_produto(
+        produto.get("nome"), produto.get("preco_unitario"), produto.get("categoria"), estoque_inicial
+    )
     produto["id_produto"] = novo_id
-    produto["estoque_atual"] = produto.get("estoque_atual", 0)
+    produto["estoque_atual"] = estoque_inicial
     produto["vendidos_ultimos_30_dias"] = 0
-    df = pd.concat([df, pd.DataFrame([produto])], ignore_index=True)
-    salvar_produtos(df)
     return novo_id
 
-def editar_produto(id_produto, novos_dados):
-    df = carregar_produtos()
-    if id_produto not in df["id_produto"].values:
-        raise ValueError("ID de produto não encontrado")
-    
-    for chave, valor in novos_dados.items():
-        if chave in df.columns:
-            df.loc[df["id_produto"] == id_produto, chave] = valor
-    
-    salvar_produtos(df)
+@medido
+def editar_produto(id_produto, novos_dados, usuario="Sistema", versao=None):
+    """Atualiza os dados cadastrais de um produto.
+
+    Mudanças em `estoque_atual` não sobrescrevem o valor: viram uma
+    movimentação de ajuste pela diferença (ver `core.saldos`). Chaves que
+    não são colunas editáveis são ignoradas.
+
+    Com `versao` (a lida junto com o produto), a edição só é aplicada se
+    ninguém tiver alterado o produto desde então; senão levanta
+    `ConflitoVersao`.
+    """
+    estoque_rapido.editar_produto(id_produto, novos_dados, novos_dados.get("estoque_atual"), usuario, versao)
     return True
 
-def remover_produto(id_produto):
-    df = carregar_produtos()
-    if id_produto not in df["id_produto"].values:
-        raise ValueError("ID de produto não encontrado")
-    df = df[df["id_produto"] != id_produto]
-    salvar_produtos(df)
+@medido
+def remover_produto(id_produto, versao=None):
+    """Remove um produto do catálogo (o histórico de movimentações é mantido).
+
+    `versao` tem o mesmo papel que em `editar_produto`.
+    """
+    estoque_rapido.remover_produto(id_produto, versao)
     return True
 
-def buscar_produto(termo):
-    df = carregar_produtos()
-    if isinstance(termo, int):
-        resultado = df[df["id_produto"] == termo]
-    else:
-        termo = termo.lower()
-        mask = (
-            df["nome"].str.lower().str.contains(termo) |
-            df["categoria"].str.lower().str.contains(termo)
-        )
-        resultado = df[mask]
-    return resultado
+@medido
+def buscar_produto(termo, limite=None, classe=None):
+    """Busca por ID (int) ou por texto em nome/categoria.
 
+    A busca textual usa o índice FTS5 de `core.busca`: ignora acentos,
+    trata cada palavra como prefixo e ordena por relevância. `classe`
+    filtra pela classificação já gravada ("Alta saída", "A", "X"...); sem
+    termo, lista todos os produtos da classe.
+    """
+    if isinstance(termo, int) or (not termo and classe is not None):
+        condicoes, parametros = [], list(limites_janela(30))
+        if isinstance(termo, int):
+            condicoes.append("p.id_produto = ?")
+            parametros.append(termo)
+        if classe is not None:
+            condicao, valores = filtro_classe(classe, "p.id_produto")
+            condicoes.append(condicao)
+            parametros.extend(valores)
+        sql = f"{SELECT_PRODUTOS} FROM produtos p WHERE {' AND '.join(condicoes)} ORDER BY p.id_produto"
+        if limite is not None:
+            sql += " LIMIT ?"
+            parametros.append(int(limite))
+        return pd.read_sql_query(sql, _get_connection(), params=parametros)
+    return pesquisar_produtos(termo, limite=limite, classe=classe)
+
+@medido
 def verificar_estoque_baixo(limite=10):
     df = carregar_produtos()
     return df[df['estoque_atual'] < limite]
 
 def criar_tabelas_movimentacoes():
-    con = _get_connection()
-
-    cur = con.cursor()
-
-    cur.execute(
-    """CREATE TABLE if not exists movimentacoes(
-    id_movimentacao INT PRIMARY KEY,
-    id_produto INT NOT NULL,
-    tipo VARCHAR(10) CHECK (tipo IN ('entrada', 'saida')),
-    quantidade INT NOT NULL,
-    data TIMESTAMP NOT NULL,
-    usuario VARCHAR(50),
-    observacao TEXT,
-    nome VARCHAR(100),
-    categoria VARCHAR(100)
-    );""")
-
-    con.close()
+    esquema.migrar(_get_connection())
 
 def criar_tabelas_produtos():
-    con = _get_connection()
-
-    cur = con.cursor()
-
-    cur.execute(
-    """CREATE TABLE if not exists produtos(
-    id_produto INT PRIMARY KEY,
-    nome VARCHAR(100) NOT NULL,
-    categoria VARCHAR(50),
-    preco_unitario DECIMAL(10, 2) NOT NULL,
-    estoque_atual INT NOT NULL,
-    vendidos_ultimos_30_dias INT DEFAULT 0
-    );"""
+    esquema.migrar(_get_connection())
+
+
+COLUNAS_CSV_PRODUTOS = {
+    "id_produto": "Int64",
+    "nome": "string",
+    "categoria": "string",
+    "preco_unitario": "float64",
+    "estoque_atual": "Int64",
+    "vendidos_ultimos_30_dias": "Int64",
+}
+
+COLUNAS_CSV_MOVIMENTACOES = {
+    "id_movimentacao": "Int64",
+    "id_produto": "Int64",
+    "tipo": "string",
+    "quantidade": "Int64",
+    "data": "string",
+    "usuario": "string",
+    "observacao": "string",
+    "nome": "string",
+    "categoria": "string",
+    "venda": "Int64",
+}
+
+
+def _imprimir_progresso(tabela, linhas, linhas_por_segundo):
+    print(f"{tabela}: {linhas} linhas importadas ({linhas_por_segundo:,.0f} linhas/s)")
+
+
+# Colunas derivadas quando o arquivo não as traz. Arquivos antigos não têm
+# `venda`: suas saídas contam como vendas.
+DERIVADAS_CSV_MOVIMENTACOES = {
+    "venda": lambda bloco: (bloco["tipo"] == "saida").astype("Int64"),
+}
+
+
+def _upsert_csv(con, caminho, tabela, chave, colunas, tamanho_chunk, progresso, apos_id=None, derivadas=None,
+                ignorar=None):
+    """Lê `caminho` em blocos e faz upsert de cada bloco em `tabela`.
+
+    Apenas um bloco fica em memória por vez. Com `apos_id`, linhas cuja
+    `chave` seja menor ou igual a ele são ignoradas (importação incremental).
+    `derivadas` mapeia colunas ausentes do arquivo para funções que as
+    calculam a partir do bloco; `ignorar`, se houver, recebe o bloco e
+    devolve a máscara das linhas que não devem ser gravadas.
+    """
+    presentes = set(pd.read_csv(caminho, nrows=0).columns)
+    usar = [c for c in colunas if c in presentes]
+    if chave not in usar:
+        raise ValueError(f"Arquivo {caminho} não possui a coluna '{chave}'")
+    derivadas = {c: f for c, f in (derivadas or {}).items() if c not in usar}
+    gravar = usar + list(derivadas)
+
+    atualizar = ", ".join(f"{c} = excluded.{c}" for c in gravar if c != chave)
+    sql = (
+        f"INSERT INTO {tabela} ({', '.join(gravar)}) VALUES ({', '.join('?' * len(gravar))}) "
+        f"ON CONFLICT({chave}) DO UPDATE SET {atualizar}"
     )
 
-    con.close()
-
-
-def importar_csv_para_db(produtos_csv: str = "data/raw/produtos.csv", movimentacoes_csv: str = "data/raw/movimentacoes.csv"):
-    """Carrega dados dos arquivos CSV antigos e grava nas tabelas SQLite.
-
-    Se os arquivos existirem, suas informações substituem o conteúdo atual das
-    tabelas `produtos` e `movimentacoes` respectivamente.
+    total = 0
+    inicio = time.perf_counter()
+    leitor = pd.read_csv(
+        caminho,
+        usecols=usar,
+        dtype={c: colunas[c] for c in usar},
+        chunksize=tamanho_chunk,
+    )
+    for bloco in leitor:
+        bloco = bloco.assign(**{c: f(bloco) for c, f in derivadas.items()})[gravar]
+        if apos_id is not None:
+            bloco = bloco[bloco[chave] > apos_id]
+        if ignorar is not None:
+            bloco = bloco[~ignorar(bloco).fillna(False).astype(bool)]
+        if bloco.empty:
+            continue
+        linhas = bloco.astype(object).where(bloco.notna(), None)
+        con.executemany(sql, linhas.itertuples(index=False, name=None))
+        total += len(bloco)
+        progresso(tabela, total, total / max(time.perf_counter() - inicio, 1e-9))
+    return total
+
+
+def _ja_arquivadas(corte, id_max):
+    """Máscara (para `_upsert_csv`) das movimentações do bloco que já estão em Parquet."""
+    return lambda bloco: (bloco["data"] < corte) & (bloco["id_movimentacao"] <= id_max)
+
+
+@medido
+@invalida_cache
+def importar_csv_para_db(
+    produtos_csv: str = "data/raw/produtos.csv",
+    movimentacoes_csv: str = "data/raw/movimentacoes.csv",
+    tamanho_chunk: int = 50_000,
+    incremental: bool = False,
+    progresso=_imprimir_progresso,
+):
+    """Importa os arquivos CSV para o banco SQLite em blocos.
+
+    Os arquivos são lidos em blocos de `tamanho_chunk` linhas com tipos
+    explícitos e gravados com upsert no esquema existente (chaves, índices e
+    CHECKs são preservados), tudo em uma única transação. O uso de memória
+    depende do tamanho do bloco, não do arquivo.
+
+    `progresso(tabela, linhas, linhas_por_segundo)` é chamado após cada
+    bloco. Com `incremental=True`, só são importadas as movimentações com
+    `id_movimentacao` maior que o último já presente no banco.
+
+    Movimentações já compactadas em Parquet (`core.historico_arquivo`) não
+    voltam ao SQLite, onde seriam contadas duas vezes: linhas anteriores ao
+    corte com id até o maior arquivado são ignoradas. Linhas retroativas
+    novas (id maior) entram normalmente.
+
+    Retorna um dicionário com o número de linhas importadas por tabela.
     """
-    # Garante que o banco e as tabelas existam
-    criar_tabelas_produtos()
-    criar_tabelas_movimentacoes()
-
-    con = _get_connection()
+    importadas = {"produtos": 0, "movimentacoes": 0}
+    with transacao(modo="IMMEDIATE") as con:
+        # Importa produtos
+        if os.path.exists(produtos_csv):
+            importadas["produtos"] = _upsert_csv(
+                con, produtos_csv, "produtos", "id_produto",
+                COLUNAS_CSV_PRODUTOS, tamanho_chunk, progresso,
+            )
+            print("Produtos importados com sucesso.")
+        else:
+            print(f"Arquivo {produtos_csv} não encontrado. Nenhum dado importado para 'produtos'.")
+
+        # Importa movimentações
+        if os.path.exists(movimentacoes_csv):
+            apos_id = None
+            if incremental:
+                apos_id = _proximo_id_movimentacao(con) - 1
+            corte = historico_arquivo.corte(con)
+            arquivadas = _ja_arquivadas(corte, historico_arquivo.id_max_arquivado(con)) if corte else None
+            importadas["movimentacoes"] = _upsert_csv(
+                con, movimentacoes_csv, "movimentacoes", "id_movimentacao",
+                COLUNAS_CSV_MOVIMENTACOES, tamanho_chunk, progresso, apos_id,
+                derivadas=DERIVADAS_CSV_MOVIMENTACOES, ignorar=arquivadas,
+            )
+            print("Movimentações importadas com sucesso.")
+        else:
+            print(f"Arquivo {movimentacoes_csv} não encontrado. Nenhum dado importado para 'movimentacoes'.")
 
-    # Importa produtos
-    if os.path.exists(produtos_csv):
-        produtos_df = pd.read_csv(produtos_csv)
-        if "vendidos_ultimos_30_dias" not in produtos_df.columns:
-            produtos_df["vendidos_ultimos_30_dias"] = 0
-        produtos_df.to_sql("produtos", con, if_exists="replace", index=False)
-        print("Produtos importados com sucesso.")
-    else:
-        print(f"Arquivo {produtos_csv} não encontrado. Nenhum dado importado para 'produtos'.")
-
-    # Importa movimentações
-    if os.path.exists(movimentacoes_csv):
-        movimentacoes_df = pd.read_csv(movimentacoes_csv)
-        movimentacoes_df.to_sql("movimentacoes", con, if_exists="replace", index=False)
-        print("Movimentações importadas com sucesso.")
-    else:
-        print(f"Arquivo {movimentacoes_csv} não encontrado. Nenhum dado importado para 'movimentacoes'.")
-
-    con.close()
+    return importadas
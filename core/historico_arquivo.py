@@ -0,0 +1,428 @@
+"""Histórico compactado: meses fechados de `movimentacoes` em Parquet.
+
+`compactar()` grava cada mês anterior ao corte em
+`config.HISTORICO_ARQUIVO_DIR/ano=AAAA/mes=MM/movimentacoes.parquet`, com
+a data como timestamp, tipo/nome/categoria/usuário/observação codificados
+como dicionário e as linhas ordenadas por data (as estatísticas de cada
+row group permitem pular blocos pelo intervalo de datas). Depois apaga
+essas linhas do SQLite, que fica só com a cauda recente: o corte é o
+primeiro dia do mês `config.HISTORICO_MESES_VIVOS` meses antes do atual.
+
+As consultas do histórico (`core.consultas`, `core.relatorios`,
+`core.previsao_demanda`, `core.saldos`) juntam as duas partes. Os meses
+lidos são escolhidos pelos agregados de `historico_arquivado` (migração 9
+de `core.esquema`), sem listar ou abrir arquivos, e só as colunas usadas
+são lidas.
+
+Movimentações com data anterior ao corte que cheguem depois (importação
+retroativa) ficam no SQLite até a próxima compactação, que as mescla ao
+mês correspondente; até lá, a versão do SQLite prevalece sobre uma linha
+arquivada de mesmo id. O consolidado `vendas_diarias` não é afetado (o
+gatilho de exclusão ignora linhas anteriores ao corte) e os saldos de `core.saldos` ganham um snapshot
+no fim de cada mês compactado antes das linhas saírem do SQLite.
+
+Para compactar (por exemplo, uma vez por mês, fora do horário de pico):
+
+    python -m core.historico_arquivo [--meses-vivos 3]
+"""
+import argparse
+import os
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from core.busca import filtro_termo
+from core.conexao import obter_conexao, transacao
+from core.metricas import medido
+from utils import config
+
+# Mesma ordem de `core.consultas._SELECT_MOVIMENTACOES`
+COLUNAS_HISTORICO = ("id_movimentacao", "id_produto", "nome", "categoria", "tipo",
+                     "quantidade", "data", "usuario", "observacao")
+LINHAS_POR_GRUPO = 65_536
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError as erro:
+        raise RuntimeError("O histórico compactado requer o pacote 'pyarrow'.") from erro
+    return pa, ds, pq
+
+
+def _esquema(pa):
+    texto = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("id_movimentacao", pa.int64()),
+        ("id_produto", pa.int64()),
+        ("tipo", texto),
+        ("quantidade", pa.int64()),
+        ("data", pa.timestamp("us")),
+        ("usuario", texto),
+        ("observacao", texto),
+        ("nome", texto),
+        ("categoria", texto),
+        ("venda", pa.bool_()),
+    ])
+
+
+def _como_data(valor):
+    if isinstance(valor, str):
+        valor = date.fromisoformat(valor[:10])
+    if isinstance(valor, datetime):
+        valor = valor.date()
+    return valor
+
+
+def _texto_data(serie):
+    """Timestamps no formato de texto gravado pelo SQLite."""
+    return serie.dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def corte(con=None):
+    """Primeiro dia (texto ISO) mantido no SQLite, ou None se nada foi compactado."""
+    con = con or obter_conexao()
+    linha = con.execute("SELECT corte FROM historico_corte WHERE id = 1").fetchone()
+    return linha[0] if linha else None
+
+
+def id_max_arquivado(con=None):
+    """Maior `id_movimentacao` já gravado em Parquet (0 se nada foi compactado)."""
+    con = con or obter_conexao()
+    return con.execute("SELECT COALESCE(MAX(id_max), 0) FROM historico_arquivado").fetchone()[0]
+
+
+def _meses(con, filtros):
+    """(mes, arquivo) dos meses arquivados que podem ter linhas no período dos filtros."""
+    sql, parametros = "SELECT mes, arquivo FROM historico_arquivado WHERE 1 = 1", []
+    if filtros.get("data_inicio") is not None:
+        sql += " AND data_max >= ?"
+        parametros.append(_como_data(filtros["data_inicio"]).isoformat())
+    if filtros.get("data_fim") is not None:
+        sql += " AND data_min < ?"
+        parametros.append((_como_data(filtros["data_fim"]) + timedelta(days=1)).isoformat())
+    return con.execute(sql + " ORDER BY mes", parametros).fetchall()
+
+
+def _contexto(filtros):
+    """(conexão, meses, ids pendentes) ou None se nenhum mês arquivado interessa aos filtros.
+
+    Pendentes são as linhas do SQLite anteriores ao corte: elas prevalecem
+    sobre a versão arquivada de mesmo id.
+    """
+    con = obter_conexao()
+    limite = corte(con)
+    if limite is None:
+        return None
+    meses = _meses(con, filtros)
+    if not meses:
+        return None
+    pendentes = [linha[0] for linha in con.execute(
+        "SELECT id_movimentacao FROM movimentacoes WHERE data < ?", (limite,)
+    )]
+    return con, meses, pendentes
+
+
+def _filtro(con, filtros, pendentes, apos=None):
+    """Expressão do pyarrow equivalente a `core.consultas.filtro_movimentacoes` (+ cursor)."""
+    pa, ds, _ = _pyarrow()
+    condicoes = []
+    if filtros.get("tipo"):
+        condicoes.append(ds.field("tipo") == filtros["tipo"])
+    if filtros.get("ids_produtos") is not None:
+        condicoes.append(ds.field("id_produto").isin([int(i) for i in filtros["ids_produtos"]]))
+    if filtros.get("categorias") is not None:
+        condicoes.append(ds.field("categoria").isin(list(filtros["categorias"])))
+    if filtros.get("data_inicio") is not None:
+        inicio = pd.Timestamp(_como_data(filtros["data_inicio"]))
+        condicoes.append(ds.field("data") >= pa.scalar(inicio, pa.timestamp("us")))
+    if filtros.get("data_fim") is not None:
+        fim = pd.Timestamp(_como_data(filtros["data_fim"]) + timedelta(days=1))
+        condicoes.append(ds.field("data") < pa.scalar(fim, pa.timestamp("us")))
+    if filtros.get("quantidade_min") is not None:
+        condicoes.append(ds.field("quantidade") >= int(filtros["quantidade_min"]))
+    if filtros.get("quantidade_max") is not None:
+        condicoes.append(ds.field("quantidade") <= int(filtros["quantidade_max"]))
+    if filtros.get("termo"):
+        # A busca textual roda no catálogo do SQLite; o arquivo filtra pelos ids encontrados
+        condicao, valores = filtro_termo(filtros["termo"], "id_produto")
+        ids = [linha[0] for linha in con.execute(f"SELECT id_produto FROM produtos WHERE {condicao}", valores)]
+        condicoes.append(ds.field("id_produto").isin(ids))
+    if pendentes:
+        condicoes.append(~ds.field("id_movimentacao").isin(pendentes))
+    if apos is not None:
+        data = pa.scalar(pd.Timestamp(apos[0]), pa.timestamp("us"))
+        condicoes.append((ds.field("data") < data)
+                         | ((ds.field("data") == data) & (ds.field("id_movimentacao") < int(apos[1]))))
+
+    expressao = None
+    for condicao in condicoes:
+        expressao = condicao if expressao is None else expressao & condicao
+    return expressao
+
+
+def _ler(con, meses, filtros, pendentes, colunas, apos=None):
+    """Tabela do pyarrow com as linhas arquivadas de `meses` que passam nos filtros."""
+    pa, ds, _ = _pyarrow()
+    esquema = _esquema(pa)
+    arquivos = [os.path.join(config.HISTORICO_ARQUIVO_DIR, arquivo) for _, arquivo in meses]
+    # Cada arquivo tem o seu dicionário; agrupar e converter exige um só
+    return ds.dataset(arquivos, format="parquet", schema=esquema).to_table(
+        columns=list(colunas), filter=_filtro(con, filtros, pendentes, apos)
+    ).unify_dictionaries()
+
+
+def _vazio(colunas):
+    return pd.DataFrame({coluna: pd.Series(dtype="datetime64[ns]" if coluna == "data" else object)
+                         for coluna in colunas})
+
+
+@medido
+def pagina(filtros=None, limite=100, apos=None):
+    """Até `limite` movimentações arquivadas, da mais recente para a mais antiga.
+
+    `apos` é o cursor (data, id_movimentacao) de `core.consultas.buscar_movimentacoes`.
+    Os meses são lidos do mais recente para o mais antigo, parando quando a
+    página enche.
+    """
+    filtros = filtros or {}
+    contexto = _contexto(filtros)
+    if contexto is None:
+        return _vazio(COLUNAS_HISTORICO)
+    con, meses, pendentes = contexto
+    if apos is not None:
+        meses = [(mes, arquivo) for mes, arquivo in meses if mes <= str(apos[0])[:7]]
+
+    partes, faltam = [], limite
+    for mes in reversed(meses):
+        tabela = _ler(con, [mes], filtros, pendentes, COLUNAS_HISTORICO, apos)
+        if tabela.num_rows:
+            tabela = tabela.sort_by([("data", "descending"), ("id_movimentacao", "descending")])
+            partes.append(tabela.slice(0, faltam).to_pandas())
+            faltam -= len(partes[-1])
+        if faltam <= 0:
+            break
+    if not partes:
+        return _vazio(COLUNAS_HISTORICO)
+    return pd.concat(partes, ignore_index=True)
+
+
+@medido
+def totais_diarios(filtros=None):
+    """Quantidade arquivada por dia, produto e tipo.
+
+    Retorna DataFrame com data (texto ISO do dia), id_produto, nome, tipo e
+    quantidade, agregado pelo pyarrow sem montar as linhas no pandas.
+    """
+    filtros = filtros or {}
+    colunas = ["data", "id_produto", "nome", "tipo", "quantidade"]
+    contexto = _contexto(filtros)
+    if contexto is None:
+        return pd.DataFrame(columns=colunas)
+    con, meses, pendentes = contexto
+    pa, _, _ = _pyarrow()
+
+    tabela = _ler(con, meses, filtros, pendentes, ["data", "id_produto", "nome", "tipo", "quantidade"])
+    tabela = tabela.set_column(0, "data", tabela.column("data").cast(pa.date32()))
+    totais = tabela.group_by(["data", "id_produto", "nome", "tipo"]).aggregate([("quantidade", "sum")])
+    df = totais.rename_columns(colunas).to_pandas()
+    df["data"] = df["data"].astype(str)
+    for coluna in ("nome", "tipo"):
+        df[coluna] = df[coluna].astype(object)
+    return df
+
+
+def blocos(filtros=None, tamanho_bloco=50_000):
+    """Linhas arquivadas (colunas do histórico) em blocos, mês a mês e por id, com a data em texto."""
+    filtros = filtros or {}
+    contexto = _contexto(filtros)
+    if contexto is None:
+        return
+    con, meses, pendentes = contexto
+    for mes in meses:
+        tabela = _ler(con, [mes], filtros, pendentes, COLUNAS_HISTORICO).sort_by("id_movimentacao")
+        for inicio in range(0, tabela.num_rows, tamanho_bloco):
+            bloco = tabela.slice(inicio, tamanho_bloco).to_pandas()
+            bloco["data"] = _texto_data(bloco["data"])
+            yield bloco.astype({coluna: object for coluna in ("nome", "categoria", "tipo", "usuario", "observacao")})
+
+
+def opcoes():
+    """Agregados dos meses arquivados para os filtros do histórico (None se nada foi compactado)."""
+    linha = obter_conexao().execute(
+        """SELECT MIN(data_min), MAX(data_max), MIN(quantidade_min), MAX(quantidade_max),
+                  SUM(entradas), SUM(saidas)
+        FROM historico_arquivado"""
+    ).fetchone()
+    if linha[0] is None:
+        return None
+    data_min, data_max, qtd_min, qtd_max, entradas, saidas = linha
+    return {
+        "tipos": [tipo for tipo, n in (("entrada", entradas), ("saida", saidas)) if n],
+        "data_min": data_min,
+        "data_max": data_max,
+        "quantidade_min": qtd_min,
+        "quantidade_max": qtd_max,
+    }
+
+
+def variacao(inicio, limite, ids_produtos=None):
+    """Entradas − saídas arquivadas por produto com `inicio` <= data < `limite` (textos ISO).
+
+    `inicio` None significa desde o começo. Retorna Series indexada por id_produto.
+    """
+    filtros = {"data_fim": _como_data(limite)}
+    if inicio is not None:
+        filtros["data_inicio"] = _como_data(inicio)
+    if ids_produtos is not None:
+        filtros["ids_produtos"] = ids_produtos
+    contexto = _contexto(filtros)
+    if contexto is None:
+        return pd.Series(dtype="int64")
+    con, meses, pendentes = contexto
+    pa, ds, _ = _pyarrow()
+
+    # Limites exatos (com hora), além dos dias inteiros usados para escolher os meses
+    expressao = _filtro(con, {k: v for k, v in filtros.items() if k == "ids_produtos"}, pendentes)
+    intervalo = ds.field("data") < pa.scalar(pd.Timestamp(limite), pa.timestamp("us"))
+    if inicio is not None:
+        intervalo = intervalo & (ds.field("data") >= pa.scalar(pd.Timestamp(inicio), pa.timestamp("us")))
+    expressao = intervalo if expressao is None else expressao & intervalo
+
+    arquivos = [os.path.join(config.HISTORICO_ARQUIVO_DIR, arquivo) for _, arquivo in meses]
+    tabela = ds.dataset(arquivos, format="parquet", schema=_esquema(pa)).to_table(
+        columns=["id_produto", "tipo", "quantidade"], filter=expressao
+    )
+    df = tabela.to_pandas()
+    sinal = (df["tipo"].astype(object) == "entrada").map({True: 1, False: -1})
+    return (df["quantidade"] * sinal).groupby(df["id_produto"]).sum()
+
+
+def _novo_corte(hoje, meses_vivos):
+    mes = hoje.year * 12 + hoje.month - 1 - meses_vivos
+    return date(mes // 12, mes % 12 + 1, 1)
+
+
+def _mes_seguinte(mes):
+    ano, numero = int(mes[:4]), int(mes[5:7])
+    return date(ano + numero // 12, numero % 12 + 1, 1)
+
+
+def _gravar_mes(con, mes, limite_id):
+    """Mescla as linhas do SQLite do mês `mes` (AAAA-MM) ao seu arquivo. Retorna a linha de `historico_arquivado`."""
+    pa, ds, pq = _pyarrow()
+    esquema = _esquema(pa)
+    df = pd.read_sql_query(
+        """SELECT m.id_movimentacao, m.id_produto, m.tipo, m.quantidade, m.data, m.usuario, m.observacao,
+       COALESCE(m.nome, p.nome) AS nome, COALESCE(m.categoria, p.categoria) AS categoria, m.venda
+FROM movimentacoes m
+LEFT JOIN produtos p ON p.id_produto = m.id_produto
+WHERE m.data >= ? AND m.data < ? AND m.id_movimentacao <= ?""",
+        con,
+        params=(f"{mes}-01", _mes_seguinte(mes).isoformat(), limite_id),
+    )
+    # A data é convertida uma única vez aqui; as leituras já recebem timestamps
+    df["data"] = pd.to_datetime(df["data"], format="mixed")
+    df["venda"] = df["venda"].astype(bool)
+    tabela = pa.Table.from_pandas(df, schema=esquema, preserve_index=False)
+
+    relativo = f"ano={mes[:4]}/mes={mes[5:7]}/movimentacoes.parquet"
+    caminho = os.path.join(config.HISTORICO_ARQUIVO_DIR, relativo)
+    if os.path.exists(caminho):
+        # Mês já arquivado: a linha do SQLite substitui a arquivada de mesmo id
+        anterior = pq.read_table(caminho, schema=esquema)
+        anterior = anterior.filter(~ds.field("id_movimentacao").isin(df["id_movimentacao"].tolist()))
+        tabela = pa.concat_tables([anterior, tabela]).unify_dictionaries()
+    tabela = tabela.sort_by([("data", "ascending"), ("id_movimentacao", "ascending")]).combine_chunks()
+
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    pq.write_table(tabela, temporario, compression="zstd", row_group_size=LINHAS_POR_GRUPO)
+    os.replace(temporario, caminho)
+
+    resumo = tabela.select(["id_movimentacao", "quantidade", "data", "tipo"]).to_pandas()
+    tipos = resumo["tipo"].astype(object)
+    return (
+        mes, relativo, len(resumo),
+        int(resumo["id_movimentacao"].min()), int(resumo["id_movimentacao"].max()),
+        resumo["data"].min().strftime("%Y-%m-%d %H:%M:%S"), resumo["data"].max().strftime("%Y-%m-%d %H:%M:%S"),
+        int(resumo["quantidade"].min()), int(resumo["quantidade"].max()),
+        int((tipos == "entrada").sum()), int((tipos == "saida").sum()),
+    )
+
+
+@medido
+def compactar(meses_vivos=None, hoje=None):
+    """Move para Parquet as movimentações anteriores ao corte e as apaga do SQLite.
+
+    O corte é o primeiro dia do mês `meses_vivos` meses antes do mês de
+    `hoje` (padrão: `config.HISTORICO_MESES_VIVOS`) e nunca recua. Antes de
+    apagar, grava o snapshot de saldos do fim de cada mês novo no arquivo.
+
+    A linha de maior id fica sempre no SQLite (mesmo que antiga), para que
+    novos ids continuem maiores que os arquivados.
+
+    Retorna dicionário com os meses gravados, linhas apagadas e o corte.
+    """
+    _pyarrow()
+    from core.saldos import gerar_snapshot
+
+    meses_vivos = config.HISTORICO_MESES_VIVOS if meses_vivos is None else meses_vivos
+    con = obter_conexao()
+    anterior = corte(con)
+    novo = max(_novo_corte(hoje or date.today(), meses_vivos).isoformat(), anterior or "")
+
+    # Linhas gravadas depois deste ponto ficam para a próxima compactação
+    limite_id = con.execute("SELECT COALESCE(MAX(id_movimentacao), 0) FROM movimentacoes").fetchone()[0]
+    meses = [linha[0] for linha in con.execute(
+        "SELECT DISTINCT substr(data, 1, 7) FROM movimentacoes WHERE data < ? AND id_movimentacao <= ? ORDER BY 1",
+        (novo, limite_id),
+    )]
+    if not meses:
+        return {"meses": [], "apagadas": 0, "corte": anterior}
+
+    # Snapshots só dos meses que ainda estão inteiros no SQLite (os anteriores
+    # ao corte antigo são mantidos pelos gatilhos de `saldos_estoque`)
+    for mes in meses:
+        if anterior is None or mes >= anterior[:7]:
+            gerar_snapshot(_mes_seguinte(mes) - timedelta(days=1))
+
+    linhas = [_gravar_mes(con, mes, limite_id) for mes in meses]
+    with transacao(modo="IMMEDIATE") as con:
+        con.executemany(
+            """INSERT OR REPLACE INTO historico_arquivado
+            (mes, arquivo, linhas, id_min, id_max, data_min, data_max,
+             quantidade_min, quantidade_max, entradas, saidas)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            linhas,
+        )
+        con.execute("INSERT OR REPLACE INTO historico_corte (id, corte) VALUES (1, ?)", (novo,))
+        apagadas = con.execute(
+            """DELETE FROM movimentacoes
+            WHERE data < ? AND id_movimentacao <= ?
+              AND id_movimentacao < (SELECT MAX(id_movimentacao) FROM movimentacoes)""",
+            (novo, limite_id),
+        ).rowcount
+    return {"meses": meses, "apagadas": apagadas, "corte": novo}
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Compacta meses fechados de movimentações em Parquet.")
+    parser.add_argument("--meses-vivos", type=int, default=config.HISTORICO_MESES_VIVOS,
+                        help="meses fechados mantidos no SQLite além do mês atual")
+    opcoes = parser.parse_args(argumentos)
+
+    resultado = compactar(opcoes.meses_vivos)
+    if not resultado["meses"]:
+        print("Nada a compactar.")
+        return 0
+    print(f"{len(resultado['meses'])} mês(es) gravado(s) em {config.HISTORICO_ARQUIVO_DIR} "
+          f"({resultado['meses'][0]} a {resultado['meses'][-1]}); "
+          f"{resultado['apagadas']} movimentação(ões) removida(s) do SQLite; corte em {resultado['corte']}.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,275 @@
+"""Instrumentação leve: latência, consultas, linhas e bytes por operação.
+
+Funções do core são marcadas com o decorador `medido`; trechos arbitrários
+(por exemplo, a renderização de uma página do app) usam o gerenciador de
+contexto `trecho(nome)`. Cada operação acumula:
+
+- histograma de latência (baldes fixos, como os do Prometheus);
+- número de instruções SQL executadas (`set_trace_callback` nas conexões
+  de `core.conexao`, instalado só enquanto a medição está ligada);
+- linhas escritas (diferença de `total_changes` das conexões da thread);
+- linhas e bytes (estimados) retornados, quando o resultado é (ou contém)
+  um DataFrame;
+- erros.
+
+Desligada (padrão: `config.METRICAS_ATIVAS`), o decorador custa uma
+leitura de dicionário por chamada e `trecho` devolve um contexto vazio
+compartilhado. Os números são inclusivos: uma operação que chama outra
+também conta as consultas dela.
+
+O acumulado pode ser lido com `resumo()` (página oculta "Diagnóstico" do
+app) ou gravado em `config.METRICAS_ARQUIVO` com `exportar()`, em texto
+do Prometheus ou JSON (pela extensão do arquivo).
+"""
+import atexit
+import json
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+from utils import config
+
+# Limites superiores dos baldes de latência, em segundos
+BALDES = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+_estado = {"ativo": config.METRICAS_ATIVAS, "exportado_em": time.monotonic()}
+_operacoes = {}
+_trava = threading.Lock()
+_local = threading.local()
+_NULO = nullcontext()
+
+
+def ativo():
+    return _estado["ativo"]
+
+
+def ativar(ligado=True):
+    """Liga ou desliga a coleta no processo (o acumulado é mantido)."""
+    _estado["ativo"] = bool(ligado)
+
+
+def zerar():
+    with _trava:
+        _operacoes.clear()
+
+
+def contar_consulta(sql):
+    """Callback de `set_trace_callback`: conta as instruções da thread atual."""
+    # Instruções executadas por gatilhos chegam como comentários "-- TRIGGER ..."
+    if not sql.startswith("--"):
+        _local.consultas = getattr(_local, "consultas", 0) + 1
+
+
+def _alteracoes():
+    from core.conexao import alteracoes
+    return alteracoes()
+
+
+def _tamanho(resultado):
+    """(linhas, bytes) do primeiro DataFrame em `resultado`, ou (0, 0)."""
+    # Sem pandas carregado não há DataFrame (e `core.estoque_rapido` não o carrega)
+    pd = sys.modules.get("pandas")
+    if pd is None:
+        return 0, 0
+    if isinstance(resultado, tuple):
+        resultado = next((r for r in resultado if isinstance(r, pd.DataFrame)), None)
+    if isinstance(resultado, pd.DataFrame):
+        # Estimativa rasa (8 bytes por célula, como memory_usage sem deep para
+        # colunas numéricas e de objetos), sem o custo de percorrer as colunas
+        linhas, colunas = resultado.shape
+        return linhas, linhas * colunas * 8
+    return 0, 0
+
+
+class _Medicao:
+    __slots__ = ("nome", "inicio", "consultas", "alteracoes")
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.consultas = getattr(_local, "consultas", 0)
+        self.alteracoes = _alteracoes()
+        self.inicio = time.perf_counter()
+
+    def encerrar(self, resultado=None, erro=False):
+        duracao = time.perf_counter() - self.inicio
+        consultas = getattr(_local, "consultas", 0) - self.consultas
+        escritas = max(0, _alteracoes() - self.alteracoes)  # conexões fechadas no meio saem da soma
+        linhas, tamanho = _tamanho(resultado)
+        with _trava:
+            op = _operacoes.get(self.nome)
+            if op is None:
+                op = _operacoes[self.nome] = {
+                    "chamadas": 0, "erros": 0, "segundos": 0.0, "max_segundos": 0.0,
+                    "baldes": [0] * len(BALDES), "consultas": 0,
+                    "linhas_lidas": 0, "linhas_escritas": 0, "bytes": 0,
+                }
+            op["chamadas"] += 1
+            op["erros"] += erro
+            op["segundos"] += duracao
+            op["max_segundos"] = max(op["max_segundos"], duracao)
+            op["baldes"][next(i for i, limite in enumerate(BALDES) if duracao <= limite)] += 1
+            op["consultas"] += consultas
+            op["linhas_lidas"] += linhas
+            op["linhas_escritas"] += escritas
+            op["bytes"] += tamanho
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastro):
+        self.encerrar(erro=tipo is not None)
+        return False
+
+
+def trecho(nome):
+    """Gerenciador de contexto que mede o bloco como a operação `nome`."""
+    return _Medicao(nome) if _estado["ativo"] else _NULO
+
+
+def medido(funcao=None, *, nome=None):
+    """Decorador: mede cada chamada de `funcao` (nome padrão: módulo.função, sem o prefixo "core.")."""
+    def decorar(funcao):
+        rotulo = nome or f"{funcao.__module__.removeprefix('core.')}.{funcao.__qualname__}"
+
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if not _estado["ativo"]:
+                return funcao(*args, **kwargs)
+            medicao = _Medicao(rotulo)
+            try:
+                resultado = funcao(*args, **kwargs)
+            except BaseException:
+                medicao.encerrar(erro=True)
+                raise
+            medicao.encerrar(resultado)
+            return resultado
+        return envolvida
+
+    return decorar(funcao) if funcao is not None else decorar
+
+
+def _percentil(baldes, chamadas, p, maximo):
+    # Interpolação linear dentro do balde, como o histogram_quantile do Prometheus
+    alvo = chamadas * p
+    acumulado, anterior = 0, 0.0
+    for limite, n in zip(BALDES, baldes):
+        if n and acumulado + n >= alvo:
+            if math.isinf(limite):
+                return maximo
+            return min(maximo, anterior + (limite - anterior) * (alvo - acumulado) / n)
+        acumulado += n
+        anterior = limite
+    return maximo
+
+
+def resumo():
+    """DataFrame com uma linha por operação, da maior latência total para a menor."""
+    import pandas as pd
+
+    with _trava:
+        copia = {nome: dict(op, baldes=list(op["baldes"])) for nome, op in _operacoes.items()}
+    linhas = []
+    for nome, op in copia.items():
+        chamadas = op["chamadas"]
+        linhas.append({
+            "operacao": nome,
+            "chamadas": chamadas,
+            "erros": op["erros"],
+            "total_s": op["segundos"],
+            "media_ms": op["segundos"] * 1000 / chamadas,
+            "p50_ms": _percentil(op["baldes"], chamadas, 0.5, op["max_segundos"]) * 1000,
+            "p95_ms": _percentil(op["baldes"], chamadas, 0.95, op["max_segundos"]) * 1000,
+            "max_ms": op["max_segundos"] * 1000,
+            "consultas_por_chamada": op["consultas"] / chamadas,
+            "linhas_lidas": op["linhas_lidas"],
+            "linhas_escritas": op["linhas_escritas"],
+            "bytes_por_chamada": op["bytes"] / chamadas,
+        })
+    colunas = ["operacao", "chamadas", "erros", "total_s", "media_ms", "p50_ms", "p95_ms", "max_ms",
+               "consultas_por_chamada", "linhas_lidas", "linhas_escritas", "bytes_por_chamada"]
+    return pd.DataFrame(linhas, columns=colunas).sort_values("total_s", ascending=False, ignore_index=True)
+
+
+def _rotulo(nome):
+    return nome.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def texto_prometheus():
+    """Acumulado no formato de texto do Prometheus (histograma + contadores)."""
+    with _trava:
+        copia = {nome: dict(op, baldes=list(op["baldes"])) for nome, op in sorted(_operacoes.items())}
+
+    linhas = [
+        "# HELP estoque_operacao_segundos Latência das operações do core e das páginas do app.",
+        "# TYPE estoque_operacao_segundos histogram",
+    ]
+    for nome, op in copia.items():
+        rotulo = _rotulo(nome)
+        acumulado = 0
+        for limite, n in zip(BALDES, op["baldes"]):
+            acumulado += n
+            le = "+Inf" if math.isinf(limite) else repr(limite)
+            linhas.append(f'estoque_operacao_segundos_bucket{{operacao="{rotulo}",le="{le}"}} {acumulado}')
+        linhas.append(f'estoque_operacao_segundos_sum{{operacao="{rotulo}"}} {op["segundos"]!r}')
+        linhas.append(f'estoque_operacao_segundos_count{{operacao="{rotulo}"}} {op["chamadas"]}')
+
+    contadores = (
+        ("erros", "Chamadas que terminaram com exceção."),
+        ("consultas", "Instruções SQL executadas."),
+        ("linhas_lidas", "Linhas retornadas em DataFrames."),
+        ("linhas_escritas", "Linhas inseridas, alteradas ou removidas."),
+        ("bytes", "Bytes dos DataFrames retornados."),
+    )
+    for chave, ajuda in contadores:
+        linhas.append(f"# HELP estoque_{chave}_total {ajuda}")
+        linhas.append(f"# TYPE estoque_{chave}_total counter")
+        for nome, op in copia.items():
+            linhas.append(f'estoque_{chave}_total{{operacao="{_rotulo(nome)}"}} {op[chave]}')
+    return "\n".join(linhas) + "\n"
+
+
+def texto_json():
+    with _trava:
+        copia = {nome: dict(op, baldes=list(op["baldes"])) for nome, op in _operacoes.items()}
+    return json.dumps(
+        {"baldes": [None if math.isinf(b) else b for b in BALDES], "operacoes": copia},
+        ensure_ascii=False, indent=2,
+    )
+
+
+def exportar(caminho=None):
+    """Grava o acumulado em `caminho` (padrão: `config.METRICAS_ARQUIVO`).
+
+    Extensão .json grava JSON; qualquer outra, texto do Prometheus. A
+    escrita é atômica (arquivo temporário + rename), para o coletor nunca
+    ler um arquivo pela metade. Retorna o caminho gravado.
+    """
+    caminho = caminho or config.METRICAS_ARQUIVO
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    conteudo = texto_json() if caminho.endswith(".json") else texto_prometheus()
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, caminho)
+    _estado["exportado_em"] = time.monotonic()
+    return caminho
+
+
+def exportar_periodicamente():
+    """Exporta se a coleta está ligada e já passou `config.METRICAS_INTERVALO_S` desde a última vez."""
+    if _estado["ativo"] and time.monotonic() - _estado["exportado_em"] >= config.METRICAS_INTERVALO_S:
+        exportar()
+
+
+def _exportar_ao_sair():
+    if _operacoes:
+        exportar()
+
+
+atexit.register(_exportar_ao_sair)
@@ -0,0 +1,69 @@
+"""Feed de mudanças: o que foi alterado no banco desde a sequência N.
+
+Gatilhos (migração 11 de `core.esquema`) mantêm a tabela `mudancas`, com
+uma linha por registro alterado e a sequência da sua última alteração,
+tirada de um contador que só cresce. Todo escritor passa por eles: as
+funções de `core.gerenciamento_estoque` e `core.estoque_rapido`, o
+escritor único, a CLI e a importação de CSVs, neste ou em outro processo.
+
+- `produtos`: inserção (I), alteração (U) ou remoção (D) do produto;
+- `movimentacoes`: o histórico (e as vendas) do produto `id_registro`
+  mudou. Movimentações são agrupadas pelo produto, não pela linha.
+
+Cada registro aparece uma vez só, com a operação mais recente (um produto
+inserido e logo ajustado aparece como 'U'): a tabela tem no máximo uma
+linha por produto em cada "tabela" e não precisa de limpeza.
+
+Quem consome guarda a última sequência vista e pergunta
+`mudancas_desde(seq)`; a consulta usa o índice de `seq` e custa o número
+de registros alterados, não o tamanho das tabelas. Como em
+`core.estoque_rapido`, nada aqui carrega pandas.
+"""
+from collections import namedtuple
+
+from core.conexao import obter_conexao
+from core.metricas import medido
+
+
+class Mudanca(namedtuple("Mudanca", "seq tabela id_registro operacao")):
+    """Última alteração de um registro (`operacao`: 'I', 'U' ou 'D')."""
+    __slots__ = ()
+
+
+def ultima_sequencia():
+    """Sequência da alteração mais recente do banco (0 se nada mudou desde a migração)."""
+    return obter_conexao().execute("SELECT valor FROM mudancas_sequencia WHERE id = 1").fetchone()[0]
+
+
+@medido
+def mudancas_desde(seq, limite=None):
+    """Registros alterados depois da sequência `seq`, da mais antiga para a mais recente.
+
+    Com `limite`, devolve só as primeiras; o consumidor continua a partir
+    do `seq` da última recebida.
+    """
+    sql = "SELECT seq, tabela, id_registro, operacao FROM mudancas WHERE seq > ? ORDER BY seq"
+    parametros = [int(seq)]
+    if limite is not None:
+        sql += " LIMIT ?"
+        parametros.append(int(limite))
+    return [Mudanca._make(linha) for linha in obter_conexao().execute(sql, parametros)]
+
+
+def resumir(mudancas):
+    """Agrupa `mudancas` em {"seq", "produtos", "removidos", "movimentacoes"}.
+
+    `produtos` são os ids inseridos ou alterados, `removidos` os que saíram
+    do catálogo e `movimentacoes` os produtos cujo histórico mudou. `seq` é
+    a maior sequência vista (0 se a lista estiver vazia).
+    """
+    resumo = {"seq": 0, "produtos": set(), "removidos": set(), "movimentacoes": set()}
+    for mudanca in mudancas:
+        resumo["seq"] = max(resumo["seq"], mudanca.seq)
+        if mudanca.tabela == "movimentacoes":
+            resumo["movimentacoes"].add(mudanca.id_registro)
+        elif mudanca.operacao == "D":
+            resumo["removidos"].add(mudanca.id_registro)
+        else:
+            resumo["produtos"].add(mudanca.id_registro)
+    return resumo
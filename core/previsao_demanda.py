@@ -0,0 +1,391 @@
+"""Previsão de demanda vetorizada para todo o catálogo.
+
+As vendas (saídas marcadas como venda; perdas e ajustes ficam de fora)
+são lidas do consolidado `vendas_diarias` em uma única passada e
+acumuladas em uma matriz produto × dia. Todos os modelos
+trabalham sobre a matriz inteira: o laço é sobre o tempo, e cada passo
+atualiza todos os produtos de uma vez com operações NumPy.
+
+Modelos disponíveis:
+- "media_movel": média das últimas `janela` observações;
+- "holt_winters": suavização exponencial com nível, tendência amortecida
+  e sazonalidade semanal aditiva;
+- "croston": Croston com correção SBA, para demanda intermitente;
+- "auto": Croston para produtos intermitentes (intervalo médio entre
+  vendas > 1,32 dia), Holt-Winters para os demais.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from core.conexao import obter_conexao
+from core.metricas import medido
+from utils import config
+
+MODELOS = ("media_movel", "holt_winters", "croston")
+
+# Limite clássico de Syntetos-Boylan para demanda intermitente
+LIMITE_INTERMITENCIA = 1.32
+
+# Fator phi da tendência amortecida do Holt-Winters
+AMORTECIMENTO_TENDENCIA = 0.9
+
+
+@medido
+def matriz_demanda(dias=None, ate=None, tamanho_bloco=500_000):
+    """Monta a matriz de vendas diárias produto × dia.
+
+    Lê o consolidado `vendas_diarias` uma única vez (em blocos, pelo índice
+    de `dia`) para a janela de `dias` dias terminando em `ate` (inclusive).
+    Só vendas entram: saídas por perda ou ajuste (`venda = 0`) não são
+    demanda. O consolidado cobre também os meses compactados em Parquet
+    (`core.historico_arquivo`). Produtos sem venda no período aparecem com
+    linha zerada.
+
+    Retorna (ids_produtos, primeiro_dia, matriz float32 [produtos, dias]).
+    """
+    dias = dias or config.PREVISAO_HISTORICO_DIAS
+    ate = ate or date.today()
+    inicio = ate - timedelta(days=dias - 1)
+    con = obter_conexao()
+
+    ids = np.array([linha[0] for linha in con.execute("SELECT id_produto FROM produtos ORDER BY id_produto")],
+                   dtype=np.int64)
+    matriz = np.zeros((len(ids), dias), dtype=np.float32)
+
+    blocos = pd.read_sql_query(
+        "SELECT id_produto, dia, quantidade FROM vendas_diarias WHERE dia BETWEEN ? AND ?",
+        con,
+        params=(inicio.isoformat(), ate.isoformat()),
+        chunksize=tamanho_bloco,
+    )
+    base = np.datetime64(inicio, "D")
+    for bloco in blocos:
+        linhas = np.searchsorted(ids, bloco["id_produto"].to_numpy())
+        conhecidos = (linhas < len(ids)) & (ids[np.minimum(linhas, len(ids) - 1)] == bloco["id_produto"].to_numpy())
+        colunas = (bloco["dia"].to_numpy().astype("datetime64[D]") - base).astype(np.int64)
+        np.add.at(matriz, (linhas[conhecidos], colunas[conhecidos]), bloco["quantidade"].to_numpy()[conhecidos])
+
+    return ids, inicio, matriz
+
+
+def media_movel(matriz, janela=28):
+    """Previsão diária = média das últimas `janela` colunas.
+
+    Retorna (previsão por produto, desvio-padrão do erro de um passo).
+    """
+    janela = max(1, min(janela, matriz.shape[1] - 1))
+    acumulado = np.cumsum(np.pad(matriz, ((0, 0), (1, 0))), axis=1, dtype=np.float64)
+    medias = (acumulado[:, janela:] - acumulado[:, :-janela]) / janela
+    # a média das colunas [t-janela, t) prevê a coluna t
+    erros = matriz[:, janela:] - medias[:, :-1]
+    return medias[:, -1], _desvio(erros)
+
+
+def holt_winters(matriz, alfa=0.2, beta=0.03, gama=0.1, periodo=7, amortecimento=AMORTECIMENTO_TENDENCIA):
+    """Holt-Winters aditivo com tendência amortecida e sazonalidade de `periodo` dias.
+
+    O `amortecimento` (phi < 1) impede que ruído na tendência seja
+    extrapolado linearmente por todo o horizonte.
+
+    Retorna (nível, tendência, sazonalidade [produtos, periodo], desvio do
+    erro de um passo). A sazonalidade é indexada pela posição do dia no
+    ciclo a partir da primeira coluna da matriz.
+    """
+    n_produtos, n_dias = matriz.shape
+    if n_dias < 2 * periodo:
+        nivel = matriz.mean(axis=1)
+        return nivel, np.zeros(n_produtos), np.zeros((n_produtos, periodo)), _desvio(matriz - nivel[:, None])
+
+    primeiro_ciclo = matriz[:, :periodo].astype(np.float64)
+    nivel = primeiro_ciclo.mean(axis=1)
+    tendencia = (matriz[:, periodo:2 * periodo].mean(axis=1) - nivel) / periodo
+    sazonal = primeiro_ciclo - nivel[:, None]
+
+    soma_quadrados = np.zeros(n_produtos)
+    for t in range(periodo, n_dias):
+        y = matriz[:, t]
+        s = t % periodo
+        previsto = nivel + amortecimento * tendencia + sazonal[:, s]
+        soma_quadrados += (y - previsto) ** 2
+        nivel_anterior = nivel
+        nivel = alfa * (y - sazonal[:, s]) + (1 - alfa) * (nivel + amortecimento * tendencia)
+        tendencia = beta * (nivel - nivel_anterior) + (1 - beta) * amortecimento * tendencia
+        sazonal[:, s] = gama * (y - nivel) + (1 - gama) * sazonal[:, s]
+
+    desvio = np.sqrt(soma_quadrados / (n_dias - periodo))
+    return nivel, tendencia, sazonal, desvio
+
+
+def croston(matriz, alfa=0.1):
+    """Croston com correção SBA, vetorizado entre produtos.
+
+    Retorna (previsão diária por produto, desvio-padrão do erro de um passo).
+    """
+    n_produtos, n_dias = matriz.shape
+    tamanho = np.zeros(n_produtos)      # tamanho médio das vendas
+    intervalo = np.ones(n_produtos)     # intervalo médio entre vendas
+    desde_ultima = np.ones(n_produtos)
+    iniciado = np.zeros(n_produtos, dtype=bool)
+    soma_quadrados = np.zeros(n_produtos)
+    observacoes = np.zeros(n_produtos)
+
+    for t in range(n_dias):
+        y = matriz[:, t]
+        previsto = tamanho / intervalo
+        soma_quadrados += np.where(iniciado, (y - previsto) ** 2, 0.0)
+        observacoes += iniciado
+
+        venda = y > 0
+        primeira = venda & ~iniciado
+        tamanho = np.where(primeira, y, np.where(venda, tamanho + alfa * (y - tamanho), tamanho))
+        intervalo = np.where(primeira, desde_ultima,
+                             np.where(venda, intervalo + alfa * (desde_ultima - intervalo), intervalo))
+        iniciado |= venda
+        desde_ultima = np.where(venda, 1.0, desde_ultima + 1.0)
+
+    previsao = (1 - alfa / 2) * tamanho / intervalo
+    desvio = np.sqrt(soma_quadrados / np.maximum(observacoes, 1))
+    return previsao, desvio
+
+
+def intervalo_medio_entre_vendas(matriz):
+    """ADI: número de dias do histórico dividido pelo número de dias com venda."""
+    dias_com_venda = np.count_nonzero(matriz > 0, axis=1)
+    return np.where(dias_com_venda > 0, matriz.shape[1] / np.maximum(dias_com_venda, 1), np.inf)
+
+
+def _desvio(erros):
+    if erros.shape[1] == 0:
+        return np.zeros(erros.shape[0])
+    return np.sqrt(np.mean(np.square(erros, dtype=np.float64), axis=1))
+
+
+def _previsoes_diarias(matriz, modelo, horizonte):
+    """Retorna (previsão [produtos, horizonte], desvio de um passo) para `modelo`."""
+    if modelo == "media_movel":
+        media, desvio = media_movel(matriz)
+        return np.repeat(media[:, None], horizonte, axis=1), desvio
+    if modelo == "croston":
+        media, desvio = croston(matriz)
+        return np.repeat(media[:, None], horizonte, axis=1), desvio
+    if modelo == "holt_winters":
+        nivel, tendencia, sazonal, desvio = holt_winters(matriz)
+        passos = np.arange(1, horizonte + 1)
+        fator_tendencia = np.cumsum(AMORTECIMENTO_TENDENCIA ** passos)
+        posicoes = (matriz.shape[1] - 1 + passos) % sazonal.shape[1]
+        previsao = nivel[:, None] + tendencia[:, None] * fator_tendencia + sazonal[:, posicoes]
+        return np.maximum(previsao, 0.0), desvio
+    raise ValueError(f"Modelo de previsão desconhecido: {modelo}")
+
+
+def prever(matriz, modelo="auto", horizonte=None, confianca=0.95):
+    """Aplica `modelo` à matriz inteira.
+
+    `modelo` pode ser um nome de `MODELOS`, "auto" ou um array com o nome
+    do modelo de cada produto (como o produzido por `selecionar_modelos`);
+    nesse caso cada modelo é ajustado de uma vez sobre as linhas que o usam.
+
+    Retorna um dicionário de arrays (um valor por produto): `modelo`,
+    `demanda_diaria`, `previsao`, `limite_inferior` e `limite_superior`
+    (soma no horizonte, com banda de `confianca`).
+    """
+    horizonte = horizonte or config.PREVISAO_HORIZONTE_DIAS
+    n_produtos = matriz.shape[0]
+
+    if isinstance(modelo, str) and modelo != "auto":
+        diarias, desvio = _previsoes_diarias(matriz, modelo, horizonte)
+        nomes = np.full(n_produtos, modelo)
+    else:
+        if isinstance(modelo, str):
+            nomes = np.full(n_produtos, "auto", dtype=object)
+        else:
+            nomes = np.array(modelo, dtype=object)
+        automaticos = nomes == "auto"
+        if automaticos.any():
+            intermitente = intervalo_medio_entre_vendas(matriz[automaticos]) > LIMITE_INTERMITENCIA
+            nomes[automaticos] = np.where(intermitente, "croston", "holt_winters")
+        diarias = np.zeros((n_produtos, horizonte))
+        desvio = np.zeros(n_produtos)
+        for nome in np.unique(nomes):
+            linhas = nomes == nome
+            diarias[linhas], desvio[linhas] = _previsoes_diarias(matriz[linhas], nome, horizonte)
+
+    z = NormalDist().inv_cdf(0.5 + confianca / 2)
+    total = diarias.sum(axis=1)
+    margem = z * desvio * np.sqrt(horizonte)
+    return {
+        "modelo": nomes,
+        "demanda_diaria": total / horizonte,
+        "previsao": total,
+        "limite_inferior": np.maximum(total - margem, 0.0),
+        "limite_superior": total + margem,
+    }
+
+
+@medido
+def prever_demanda(modelo="auto", horizonte=None, historico_dias=None, confianca=0.95, ate=None):
+    """Previsão de demanda para todos os produtos do catálogo.
+
+    `modelo` aceita também "selecionado": usa, para cada produto, o modelo
+    escolhido pela última execução de `selecionar_modelos` (e "auto" para
+    produtos que ela não cobriu).
+
+    Retorna um DataFrame com `id_produto`, `nome`, `modelo`,
+    `demanda_diaria`, `previsao` (unidades no horizonte), a banda de
+    confiança e `dias_estoque_restante` (estoque atual ÷ demanda diária
+    prevista; NaN quando não há demanda prevista).
+    """
+    horizonte = horizonte or config.PREVISAO_HORIZONTE_DIAS
+    ids, _, matriz = matriz_demanda(historico_dias, ate)
+    if isinstance(modelo, str) and modelo == "selecionado":
+        modelo = _modelos_para(ids)
+    resultado = pd.DataFrame({"id_produto": ids, **prever(matriz, modelo, horizonte, confianca)})
+    resultado["horizonte_dias"] = horizonte
+
+    produtos = pd.read_sql_query(
+        "SELECT id_produto, nome, estoque_atual FROM produtos", obter_conexao()
+    )
+    resultado = produtos.merge(resultado, on="id_produto", how="right")
+    demanda = resultado["demanda_diaria"].where(resultado["demanda_diaria"] > 0)
+    resultado["dias_estoque_restante"] = resultado["estoque_atual"] / demanda
+    return resultado
+
+
+# ---------------------------------------------------------------------------
+# Seleção de modelo por produto (job noturno)
+# ---------------------------------------------------------------------------
+
+def backtest(matriz, modelos=MODELOS, origens=4, horizonte=7):
+    """Backtest com origem móvel para todos os produtos da matriz.
+
+    Para cada uma das `origens` últimas janelas de `horizonte` dias, cada
+    modelo é ajustado com o histórico anterior à janela e avaliado nela.
+    Retorna o erro absoluto médio [modelos, produtos].
+    """
+    n_dias = matriz.shape[1]
+    erros = np.zeros((len(modelos), matriz.shape[0]))
+    for k in range(origens, 0, -1):
+        corte = n_dias - k * horizonte
+        if corte < 2 * horizonte:
+            continue
+        real = matriz[:, corte:corte + horizonte]
+        for i, modelo in enumerate(modelos):
+            previsto, _ = _previsoes_diarias(matriz[:, :corte], modelo, horizonte)
+            erros[i] += np.abs(real - previsto).sum(axis=1)
+    return erros / (origens * horizonte)
+
+
+def _avaliar_fragmento(caminho_matriz, inicio, fim, modelos, origens, horizonte, caminho_saida):
+    """Executado nos processos de trabalho: avalia as linhas [inicio, fim) da matriz.
+
+    A matriz é aberta como memmap somente leitura, então os processos
+    compartilham as páginas do arquivo em vez de receber cópias.
+    """
+    matriz = np.load(caminho_matriz, mmap_mode="r")
+    erros = backtest(np.asarray(matriz[inicio:fim]), modelos, origens, horizonte)
+    temporario = caminho_saida + ".tmp.npy"
+    np.save(temporario, erros)
+    os.replace(temporario, caminho_saida)  # o checkpoint só aparece completo
+    return caminho_saida
+
+
+def _pasta_execucao(ate, dias, modelos, origens, horizonte):
+    chave = f"{ate.isoformat()}_{dias}d_{'-'.join(modelos)}_{origens}x{horizonte}"
+    return os.path.join(config.PREVISAO_DIR, "selecao", chave)
+
+
+def _preparar_matriz(pasta, dias, ate):
+    """Grava a matriz de demanda em `pasta` (uma vez por execução) e devolve (ids, caminho)."""
+    caminho_matriz = os.path.join(pasta, "matriz.npy")
+    caminho_ids = os.path.join(pasta, "ids.npy")
+    if os.path.exists(caminho_matriz) and os.path.exists(caminho_ids):
+        return np.load(caminho_ids), caminho_matriz
+
+    os.makedirs(pasta, exist_ok=True)
+    ids, _, matriz = matriz_demanda(dias, ate)
+    destino = np.lib.format.open_memmap(caminho_matriz + ".tmp.npy", mode="w+",
+                                        dtype=matriz.dtype, shape=matriz.shape)
+    destino[:] = matriz
+    destino.flush()
+    del destino
+    os.replace(caminho_matriz + ".tmp.npy", caminho_matriz)
+    np.save(caminho_ids, ids)
+    return ids, caminho_matriz
+
+
+@medido
+def selecionar_modelos(modelos=MODELOS, origens=4, horizonte=7, historico_dias=None, ate=None,
+                       processos=None, produtos_por_fragmento=2000, progresso=None):
+    """Escolhe, para cada produto, o modelo com menor erro no backtest.
+
+    Os produtos são divididos em fragmentos avaliados em paralelo por um
+    `ProcessPoolExecutor`. A matriz de demanda é gravada uma vez em um
+    arquivo .npy e lida pelos processos via memmap. Cada fragmento concluído
+    vira um checkpoint em disco; se a execução for interrompida, chamar a
+    função de novo com os mesmos parâmetros só processa o que falta.
+
+    O resultado é gravado em `config.PREVISAO_DIR/modelos_selecionados.csv`
+    e devolvido como DataFrame (`id_produto`, `modelo`, erro de cada modelo).
+    """
+    modelos = tuple(modelos)
+    dias = historico_dias or config.PREVISAO_HISTORICO_DIAS
+    ate = ate or date.today()
+    pasta = _pasta_execucao(ate, dias, modelos, origens, horizonte)
+    ids, caminho_matriz = _preparar_matriz(pasta, dias, ate)
+
+    fragmentos = [
+        (inicio, min(inicio + produtos_por_fragmento, len(ids)),
+         os.path.join(pasta, f"fragmento_{inicio:09d}.npy"))
+        for inicio in range(0, len(ids), produtos_por_fragmento)
+    ]
+    pendentes = [f for f in fragmentos if not os.path.exists(f[2])]
+
+    if pendentes:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            futuros = [
+                executor.submit(_avaliar_fragmento, caminho_matriz, inicio, fim,
+                                modelos, origens, horizonte, saida)
+                for inicio, fim, saida in pendentes
+            ]
+            for concluidos, futuro in enumerate(as_completed(futuros), start=1):
+                futuro.result()
+                if progresso is not None:
+                    progresso(len(fragmentos) - len(pendentes) + concluidos, len(fragmentos))
+
+    erros = np.concatenate([np.load(saida) for _, _, saida in fragmentos], axis=1) if fragmentos \
+        else np.zeros((len(modelos), 0))
+    resultado = pd.DataFrame({"id_produto": ids, "modelo": np.array(modelos)[erros.argmin(axis=0)]})
+    for i, modelo in enumerate(modelos):
+        resultado[f"erro_{modelo}"] = erros[i]
+
+    os.makedirs(config.PREVISAO_DIR, exist_ok=True)
+    resultado.to_csv(_caminho_selecao(), index=False)
+    with open(os.path.join(pasta, "concluido.json"), "w", encoding="utf-8") as arquivo:
+        json.dump({"produtos": int(len(ids)), "fragmentos": len(fragmentos)}, arquivo)
+    return resultado
+
+
+def _caminho_selecao():
+    return os.path.join(config.PREVISAO_DIR, "modelos_selecionados.csv")
+
+
+def modelos_selecionados():
+    """Resultado da última seleção de modelos (DataFrame vazio se nunca rodou)."""
+    if not os.path.exists(_caminho_selecao()):
+        return pd.DataFrame(columns=["id_produto", "modelo"])
+    return pd.read_csv(_caminho_selecao())
+
+
+def _modelos_para(ids):
+    selecao = modelos_selecionados().set_index("id_produto")["modelo"]
+    nomes = selecao.reindex(ids).to_numpy(dtype=object)
+    faltando = pd.isna(nomes)
+    if faltando.any():
+        nomes[faltando] = "auto"
+    return nomes
@@ -0,0 +1,304 @@
+"""Relatórios gerenciais calculados no SQLite e exportação em blocos.
+
+Os relatórios de vendas leem o consolidado `vendas_diarias` e os de
+estoque agregam `produtos` direto no SQL, de modo que o custo não depende
+do tamanho do histórico. As séries temporais são agrupadas em dia, semana
+ou mês conforme o período, limitando o número de pontos de cada gráfico.
+
+A exportação grava CSV, Parquet (requer `pyarrow`) ou XLSX (requer
+`openpyxl`) bloco a bloco, sem montar o resultado inteiro em memória.
+O histórico de movimentações inclui os meses compactados em Parquet
+(`core.historico_arquivo`).
+"""
+import itertools
+import json
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from core import historico_arquivo
+from core.classificacao import classes_abc
+from core.consultas import _SELECT_MOVIMENTACOES, filtro_movimentacoes
+from core.conexao import obter_conexao
+from core.metricas import medido
+from core.vendas import limites_janela, top_vendidos, vendas_por_categoria, vendas_por_produto
+
+GRANULARIDADES = ("dia", "semana", "mes")
+FORMATOS_EXPORTACAO = ("csv", "parquet", "xlsx")
+
+# Início do balde de cada granularidade, a partir de uma data ISO (texto)
+_BALDES = {
+    "dia": "substr({coluna}, 1, 10)",
+    "semana": "date(substr({coluna}, 1, 10), 'weekday 0', '-6 days')",
+    "mes": "substr({coluna}, 1, 7) || '-01'",
+}
+_DIAS_POR_BALDE = {"dia": 1, "semana": 7, "mes": 31}
+
+
+@medido
+def valorizacao_estoque():
+    """Valor do estoque (estoque atual × preço unitário) por categoria, do maior para o menor."""
+    return pd.read_sql_query(
+        """SELECT COALESCE(categoria, 'Sem categoria') AS categoria,
+       COUNT(*) AS produtos,
+       SUM(estoque_atual) AS unidades,
+       SUM(estoque_atual * preco_unitario) AS valor
+FROM produtos
+GROUP BY 1
+ORDER BY valor DESC""",
+        obter_conexao(),
+    )
+
+
+@medido
+def curva_abc(dias=90, ate=None, limites=None):
+    """Classifica os produtos em A, B e C pela participação acumulada na receita da janela.
+
+    Com os limites padrão (`config.CLASSIFICACAO_LIMITES_ABC`), A reúne os
+    produtos que somam os primeiros 80% da receita, B os 15% seguintes e C
+    o restante (inclusive quem não vendeu).
+    """
+    vendas = vendas_por_produto(dias, ate)[["id_produto", "quantidade", "receita"]]
+    abc = pd.read_sql_query("SELECT id_produto, nome, categoria FROM produtos", obter_conexao())
+    abc = abc.merge(vendas, on="id_produto", how="left").fillna({"quantidade": 0, "receita": 0.0})
+    abc = abc.sort_values(["receita", "id_produto"], ascending=[False, True], ignore_index=True)
+
+    total = abc["receita"].sum()
+    abc["participacao"] = abc["receita"] / total if total > 0 else 0.0
+    abc["participacao_acumulada"] = abc["participacao"].cumsum()
+    abc["classe"] = classes_abc(abc["receita"].to_numpy(), limites)
+    return abc
+
+
+@medido
+def giro_estoque(dias=90, ate=None):
+    """Giro e cobertura por produto: unidades vendidas na janela sobre o estoque atual.
+
+    O estoque médio do período não é armazenado; o estoque atual é usado
+    como aproximação. `dias_cobertura` é o estoque atual dividido pela
+    venda média diária (vazio para quem não vendeu na janela).
+    """
+    inicio, fim = limites_janela(dias, ate)
+    giro = pd.read_sql_query(
+        """SELECT p.id_produto, p.nome, p.categoria, p.estoque_atual,
+       COALESCE(v.quantidade, 0) AS vendidos
+FROM produtos p
+LEFT JOIN (
+    SELECT id_produto, SUM(quantidade) AS quantidade
+    FROM vendas_diarias WHERE dia BETWEEN ? AND ?
+    GROUP BY id_produto
+) v ON v.id_produto = p.id_produto""",
+        obter_conexao(),
+        params=(inicio, fim),
+    )
+    estoque = giro["estoque_atual"].to_numpy(dtype=float)
+    media = giro["vendidos"].to_numpy(dtype=float) / dias
+    with np.errstate(divide="ignore", invalid="ignore"):
+        giro["giro"] = np.where(estoque > 0, giro["vendidos"] / estoque, np.nan)
+        giro["dias_cobertura"] = np.where(media > 0, estoque / media, np.nan)
+    return giro.sort_values("giro", ascending=False, na_position="last", ignore_index=True)
+
+
+@medido
+def mais_vendidos(n=10, dias=30, ate=None):
+    """Os `n` produtos com mais unidades vendidas na janela (ver `core.vendas.top_vendidos`)."""
+    return top_vendidos(n, dias, ate)
+
+
+@medido
+def lucratividade_categorias(dias=30, ate=None):
+    """Receita por categoria na janela, com a participação de cada uma no total.
+
+    Não há custo cadastrado; como no restante do app, a receita de vendas
+    é usada como medida de lucratividade.
+    """
+    categorias = vendas_por_categoria(dias, ate)
+    total = categorias["receita"].sum()
+    categorias["participacao"] = categorias["receita"] / total if total > 0 else 0.0
+    return categorias
+
+
+def escolher_granularidade(inicio, fim, max_pontos=120):
+    """A granularidade mais fina que mantém o período em até `max_pontos` baldes."""
+    inicio, fim = (date.fromisoformat(str(d)[:10]) for d in (inicio, fim))
+    dias = (fim - inicio).days + 1
+    for granularidade in GRANULARIDADES:
+        if dias / _DIAS_POR_BALDE[granularidade] <= max_pontos:
+            return granularidade
+    return "mes"
+
+
+@medido
+def serie_movimentacoes(filtros=None, max_pontos=120, max_series=8):
+    """Quantidades movimentadas por período, produto e tipo, prontas para um gráfico de linhas.
+
+    O período é agrupado por dia, semana ou mês (`escolher_granularidade`),
+    e só os `max_series` produtos com maior volume ganham linha própria;
+    os demais são somados em "Outros". Assim o tamanho do resultado é
+    limitado por max_pontos × (max_series + 1) × 2, qualquer que seja o
+    histórico. Retorna (DataFrame com data, nome, tipo, quantidade; granularidade).
+    """
+    con = obter_conexao()
+    clausula, parametros = filtro_movimentacoes(**(filtros or {}))
+    origem = f"FROM movimentacoes m LEFT JOIN produtos p ON p.id_produto = m.id_produto{clausula}"
+    arquivados = historico_arquivo.totais_diarios(filtros)
+
+    inicio, fim = con.execute(f"SELECT MIN(m.data), MAX(m.data) {origem}", parametros).fetchone()
+    if not arquivados.empty:
+        inicio = min(inicio or "9999", arquivados["data"].min())
+        fim = max(fim or "", arquivados["data"].max())
+    if inicio is None:
+        return pd.DataFrame(columns=["data", "nome", "tipo", "quantidade"]), "dia"
+    granularidade = escolher_granularidade(inicio, fim, max_pontos)
+
+    if arquivados.empty:
+        principais = [
+            linha[0] for linha in con.execute(
+                f"SELECT m.id_produto {origem} GROUP BY m.id_produto ORDER BY SUM(m.quantidade) DESC LIMIT ?",
+                parametros + [int(max_series)],
+            )
+        ]
+    else:
+        volumes = pd.Series(dict(con.execute(
+            f"SELECT m.id_produto, SUM(m.quantidade) {origem} GROUP BY m.id_produto", parametros
+        ).fetchall()), dtype="int64")
+        volumes = volumes.add(arquivados.groupby("id_produto")["quantidade"].sum(), fill_value=0)
+        principais = [int(i) for i in volumes.nlargest(int(max_series)).index]
+    balde = _BALDES[granularidade].format(coluna="m.data")
+    serie = pd.read_sql_query(
+        f"""SELECT {balde} AS data,
+       CASE WHEN m.id_produto IN (SELECT value FROM json_each(?))
+            THEN COALESCE(m.nome, p.nome) ELSE 'Outros' END AS nome,
+       m.tipo,
+       SUM(m.quantidade) AS quantidade
+{origem}
+GROUP BY 1, 2, 3
+ORDER BY 1""",
+        con,
+        params=[json.dumps(principais)] + parametros,
+    )
+    if arquivados.empty:
+        return serie, granularidade
+
+    # Mesmos baldes de _BALDES, aplicados aos totais diários do arquivo
+    dias = pd.to_datetime(arquivados["data"])
+    if granularidade == "semana":
+        dias = dias - pd.to_timedelta(dias.dt.weekday, unit="D")
+    baldes = dias.dt.strftime("%Y-%m-01" if granularidade == "mes" else "%Y-%m-%d")
+    arquivados = arquivados.assign(
+        data=baldes,
+        nome=arquivados["nome"].where(arquivados["id_produto"].isin(principais), "Outros"),
+    )[["data", "nome", "tipo", "quantidade"]]
+    serie = pd.concat([arquivados, serie], ignore_index=True).groupby(
+        ["data", "nome", "tipo"], as_index=False
+    )["quantidade"].sum()
+    return serie, granularidade
+
+
+@medido
+def serie_vendas(dias=365, ate=None, max_pontos=120):
+    """Unidades e receita vendidas por período na janela, a partir de `vendas_diarias`.
+
+    Retorna (DataFrame com data, quantidade, receita; granularidade).
+    """
+    inicio, fim = limites_janela(dias, ate)
+    granularidade = escolher_granularidade(inicio, fim, max_pontos)
+    balde = _BALDES[granularidade].format(coluna="dia")
+    serie = pd.read_sql_query(
+        f"""SELECT {balde} AS data, SUM(quantidade) AS quantidade, SUM(receita) AS receita
+FROM vendas_diarias
+WHERE dia BETWEEN ? AND ?
+GROUP BY 1
+ORDER BY 1""",
+        obter_conexao(),
+        params=(inicio, fim),
+    )
+    return serie, granularidade
+
+
+def _formato(caminho, formato):
+    formato = (formato or os.path.splitext(caminho)[1].lstrip(".")).lower()
+    if formato not in FORMATOS_EXPORTACAO:
+        raise ValueError(f"Formato de exportação inválido: {formato!r}. Use um de {FORMATOS_EXPORTACAO}.")
+    return formato
+
+
+def _escrever_csv(blocos, caminho):
+    total = 0
+    with open(caminho, "w", encoding="utf-8", newline="") as arquivo:
+        for numero, bloco in enumerate(blocos):
+            bloco.to_csv(arquivo, index=False, header=numero == 0)
+            total += len(bloco)
+    return total
+
+
+def _escrever_parquet(blocos, caminho):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as erro:
+        raise RuntimeError("Exportar em Parquet requer o pacote 'pyarrow'.") from erro
+
+    total, escritor = 0, None
+    try:
+        for bloco in blocos:
+            tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(caminho, tabela.schema)
+            else:
+                tabela = tabela.cast(escritor.schema)
+            escritor.write_table(tabela)
+            total += len(bloco)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return total
+
+
+def _escrever_xlsx(blocos, caminho):
+    try:
+        from openpyxl import Workbook
+    except ImportError as erro:
+        raise RuntimeError("Exportar em XLSX requer o pacote 'openpyxl'.") from erro
+
+    # Modo write_only: as linhas vão para o arquivo conforme são adicionadas
+    livro = Workbook(write_only=True)
+    planilha = livro.create_sheet()
+    total = 0
+    for numero, bloco in enumerate(blocos):
+        if numero == 0:
+            planilha.append(list(bloco.columns))
+        for linha in bloco.astype(object).where(bloco.notna(), None).itertuples(index=False, name=None):
+            planilha.append(linha)
+        total += len(bloco)
+    livro.save(caminho)
+    return total
+
+
+_ESCRITORES = {"csv": _escrever_csv, "parquet": _escrever_parquet, "xlsx": _escrever_xlsx}
+
+
+def exportar(dados, caminho, formato=None):
+    """Grava um DataFrame ou um iterável de DataFrames (blocos) em CSV, Parquet ou XLSX.
+
+    O formato vem da extensão de `caminho` quando não informado. Retorna o
+    número de linhas gravadas.
+    """
+    formato = _formato(caminho, formato)
+    blocos = [dados] if isinstance(dados, pd.DataFrame) else dados
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    return _ESCRITORES[formato](blocos, caminho)
+
+
+@medido
+def exportar_movimentacoes(caminho, filtros=None, formato=None, tamanho_bloco=50_000):
+    """Exporta o histórico (com os filtros de `core.consultas`) lendo `tamanho_bloco` linhas por vez."""
+    clausula, parametros = filtro_movimentacoes(**(filtros or {}))
+    sql = f"{_SELECT_MOVIMENTACOES}{clausula} ORDER BY m.id_movimentacao"
+    blocos = pd.read_sql_query(sql, obter_conexao(), params=parametros, chunksize=tamanho_bloco)
+    # Meses compactados primeiro: os ids arquivados são menores que os do SQLite
+    return exportar(itertools.chain(historico_arquivo.blocos(filtros, tamanho_bloco), blocos), caminho, formato)
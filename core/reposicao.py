@@ -0,0 +1,176 @@
+"""Planejamento de reposição: ponto de pedido, estoque de segurança e quantidade sugerida.
+
+A velocidade de vendas de cada produto (média e desvio-padrão diários na
+janela `config.REPOSICAO_JANELA_DIAS`) vem do consolidado `vendas_diarias`,
+contando os dias sem venda como zero. Com o prazo de entrega L e o nível de
+serviço (z da normal):
+
+    estoque de segurança = z · desvio · √L
+    ponto de pedido      = média · L + estoque de segurança
+    quantidade sugerida  = ponto de pedido + média · cobertura − estoque atual
+
+O resultado fica em cache na tabela `plano_reposicao`. Em uma nova
+chamada no mesmo dia e com os mesmos parâmetros, só são recalculados os
+produtos com movimentação nova, estoque diferente do guardado ou ainda
+sem plano; ao virar o dia a janela desliza e o catálogo inteiro é
+recalculado (de forma vetorizada).
+"""
+import json
+from datetime import date
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from core.conexao import obter_conexao, transacao
+from core.metricas import medido
+from core.vendas import limites_janela
+from utils import config
+
+_COLUNAS_PLANO = ("id_produto", "media_diaria", "desvio_diario", "estoque_atual", "estoque_seguranca",
+                  "ponto_pedido", "quantidade_sugerida", "dias_cobertura", "repor")
+
+
+def _parametros(janela_dias, prazo_dias, nivel_servico, cobertura_dias):
+    return {
+        "janela_dias": janela_dias or config.REPOSICAO_JANELA_DIAS,
+        "prazo_dias": prazo_dias or config.REPOSICAO_PRAZO_ENTREGA_DIAS,
+        "nivel_servico": nivel_servico or config.REPOSICAO_NIVEL_SERVICO,
+        "cobertura_dias": cobertura_dias or config.REPOSICAO_COBERTURA_DIAS,
+    }
+
+
+def calcular_plano(estatisticas, parametros):
+    """Calcula o plano para um DataFrame com `id_produto`, `estoque_atual`, `total` e `total_quadrados`.
+
+    `total` e `total_quadrados` são a soma das vendas diárias e de seus
+    quadrados na janela. Todas as contas são vetorizadas.
+    """
+    janela = parametros["janela_dias"]
+    prazo = parametros["prazo_dias"]
+    z = NormalDist().inv_cdf(parametros["nivel_servico"])
+
+    media = estatisticas["total"].to_numpy(dtype=float) / janela
+    variancia = estatisticas["total_quadrados"].to_numpy(dtype=float) / janela - media ** 2
+    desvio = np.sqrt(np.maximum(variancia, 0.0))
+    estoque = estatisticas["estoque_atual"].to_numpy(dtype=float)
+
+    seguranca = z * desvio * np.sqrt(prazo)
+    ponto_pedido = media * prazo + seguranca
+    repor = (estoque <= ponto_pedido) & ((media > 0) | (estoque <= 0))
+    sugerida = np.where(repor, np.ceil(np.maximum(ponto_pedido + media * parametros["cobertura_dias"] - estoque, 0)), 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cobertura = np.where(media > 0, estoque / media, np.nan)
+
+    return pd.DataFrame({
+        "id_produto": estatisticas["id_produto"].to_numpy(),
+        "media_diaria": media,
+        "desvio_diario": desvio,
+        "estoque_atual": estoque.astype(np.int64),
+        "estoque_seguranca": seguranca,
+        "ponto_pedido": ponto_pedido,
+        "quantidade_sugerida": sugerida.astype(np.int64),
+        "dias_cobertura": cobertura,
+        "repor": repor.astype(np.int64),
+    })
+
+
+def _estatisticas(con, inicio, fim, ids=None):
+    filtro = ""
+    parametros = [inicio, fim]
+    if ids is not None:
+        filtro = "WHERE p.id_produto IN (SELECT value FROM json_each(?))"
+        parametros.append(json.dumps([int(i) for i in ids]))
+    return pd.read_sql_query(
+        f"""SELECT p.id_produto, p.estoque_atual,
+       COALESCE(v.total, 0) AS total, COALESCE(v.total_quadrados, 0) AS total_quadrados
+FROM produtos p
+LEFT JOIN (
+    SELECT id_produto, SUM(quantidade) AS total, SUM(quantidade * quantidade) AS total_quadrados
+    FROM vendas_diarias WHERE dia BETWEEN ? AND ?
+    GROUP BY id_produto
+) v ON v.id_produto = p.id_produto
+{filtro}""",
+        con,
+        params=parametros,
+    )
+
+
+def _produtos_alterados(con, ultimo_id):
+    alterados = {
+        linha[0] for linha in con.execute(
+            "SELECT DISTINCT id_produto FROM movimentacoes WHERE id_movimentacao > ?", (ultimo_id,)
+        )
+    }
+    alterados.update(
+        linha[0] for linha in con.execute(
+            """SELECT p.id_produto FROM produtos p
+            LEFT JOIN plano_reposicao r ON r.id_produto = p.id_produto
+            WHERE r.id_produto IS NULL OR r.estoque_atual != p.estoque_atual"""
+        )
+    )
+    return alterados
+
+
+@medido
+def atualizar_plano(janela_dias=None, prazo_dias=None, nivel_servico=None, cobertura_dias=None, hoje=None):
+    """Atualiza a tabela `plano_reposicao`, recalculando só o necessário.
+
+    Retorna o número de produtos recalculados.
+    """
+    parametros = _parametros(janela_dias, prazo_dias, nivel_servico, cobertura_dias)
+    hoje = hoje or date.today()
+    inicio, fim = limites_janela(parametros["janela_dias"], hoje)
+    assinatura = json.dumps(parametros, sort_keys=True)
+
+    with transacao(modo="IMMEDIATE") as con:
+        estado = con.execute(
+            "SELECT dia, ultimo_id_movimentacao, parametros FROM plano_reposicao_estado WHERE id = 1"
+        ).fetchone()
+        ultimo_id = con.execute("SELECT COALESCE(MAX(id_movimentacao), 0) FROM movimentacoes").fetchone()[0]
+
+        completo = estado is None or estado[0] != hoje.isoformat() or estado[2] != assinatura
+        if completo:
+            ids = None
+            con.execute("DELETE FROM plano_reposicao")
+        else:
+            ids = _produtos_alterados(con, estado[1])
+            con.execute("DELETE FROM plano_reposicao WHERE id_produto NOT IN (SELECT id_produto FROM produtos)")
+
+        recalculados = 0
+        if ids is None or ids:
+            plano = calcular_plano(_estatisticas(con, inicio, fim, ids), parametros)
+            linhas = plano.astype(object).where(plano.notna(), None)
+            con.executemany(
+                f"INSERT OR REPLACE INTO plano_reposicao ({', '.join(_COLUNAS_PLANO)}) "
+                f"VALUES ({', '.join('?' * len(_COLUNAS_PLANO))})",
+                linhas.itertuples(index=False, name=None),
+            )
+            recalculados = len(plano)
+
+        con.execute(
+            "INSERT OR REPLACE INTO plano_reposicao_estado (id, dia, ultimo_id_movimentacao, parametros) "
+            "VALUES (1, ?, ?, ?)",
+            (hoje.isoformat(), ultimo_id, assinatura),
+        )
+    return recalculados
+
+
+@medido
+def planejar_reposicao(apenas_repor=True, **parametros):
+    """Lista de reposição priorizada (menos dias de cobertura primeiro).
+
+    Atualiza o plano antes de ler. Com `apenas_repor=False`, devolve o
+    plano do catálogo inteiro.
+    """
+    atualizar_plano(**parametros)
+    filtro = "WHERE r.repor = 1" if apenas_repor else ""
+    return pd.read_sql_query(
+        f"""SELECT r.id_produto, p.nome, p.categoria, r.estoque_atual, r.media_diaria,
+       r.estoque_seguranca, r.ponto_pedido, r.quantidade_sugerida, r.dias_cobertura, r.repor
+FROM plano_reposicao r
+JOIN produtos p ON p.id_produto = r.id_produto
+{filtro}
+ORDER BY r.repor DESC, COALESCE(r.dias_cobertura, 0) ASC, r.media_diaria DESC""",
+        obter_conexao(),
+    )
@@ -0,0 +1,195 @@
+"""Razão de estoque: saldos periódicos, estoque em uma data e reconciliação.
+
+`movimentacoes` é a fonte da verdade; `produtos.estoque_atual` é apenas o
+saldo corrente guardado para leitura rápida. A tabela `saldos_estoque`
+(migração 7 de `core.esquema`) guarda, de tempos em tempos, o saldo de
+cada produto ao fim de um dia. O estoque em qualquer data é o snapshot
+mais próximo anterior somado às movimentações entre ele e a data, lidas
+pelo índice (id_produto, data): o custo cresce com o intervalo desde o
+snapshot, não com o histórico.
+
+Movimentações retroativas ajustam, por gatilho, os snapshots do produto a
+partir do seu dia (migração 9). Meses compactados em Parquet
+(`core.historico_arquivo`) têm snapshot no fim de cada mês; para datas
+no meio deles, a diferença vem dos arquivos.
+
+Os snapshots são gerados por `atualizar_snapshots`, a cada
+`config.SALDOS_INTERVALO_DIAS` dias, pelo job diário (`--snapshot` abaixo
+ou `python -m estoque snapshot`). Para conferir divergências entre
+`estoque_atual` e o razão:
+
+    python -m core.saldos [--snapshot] [--corrigir estoque|movimentacoes]
+"""
+import argparse
+import json
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from core import historico_arquivo
+from core.conexao import obter_conexao, transacao
+from core.estoque_rapido import registrar_ajuste
+from core.metricas import medido
+from utils import config
+
+CORRECOES = ("estoque", "movimentacoes")
+
+_SEM_LIMITE = "9999-12-31"
+
+
+def _sql_saldos(filtro=""):
+    # Parâmetros: último dia de snapshot aceito, limite (exclusivo) das movimentações
+    return f"""WITH base AS (
+    SELECT p.id_produto, p.estoque_atual,
+           (SELECT MAX(s.dia) FROM saldos_estoque s WHERE s.id_produto = p.id_produto AND s.dia <= ?) AS dia
+    FROM produtos p {filtro}
+)
+SELECT b.id_produto, b.estoque_atual, b.dia AS dia_snapshot,
+       COALESCE(s.saldo, 0) + COALESCE((
+           SELECT SUM(CASE WHEN m.tipo = 'entrada' THEN m.quantidade ELSE -m.quantidade END)
+           FROM movimentacoes m
+           WHERE m.id_produto = b.id_produto
+             AND m.data >= COALESCE(date(b.dia, '+1 day'), '') AND m.data < ?
+       ), 0) AS saldo
+FROM base b
+LEFT JOIN saldos_estoque s ON s.id_produto = b.id_produto AND s.dia = b.dia"""
+
+
+def _limites(momento):
+    """(último dia de snapshot aceito, limite exclusivo das movimentações) para `momento`.
+
+    Uma data é tratada como o fim daquele dia; um datetime, como o instante.
+    """
+    if momento is None:
+        return _SEM_LIMITE, _SEM_LIMITE
+    if isinstance(momento, str):
+        momento = datetime.fromisoformat(momento) if len(momento) > 10 else date.fromisoformat(momento)
+    if isinstance(momento, datetime):
+        limite = momento.isoformat(sep=" ", timespec="seconds")
+        dia = momento.date()
+    else:
+        dia = momento + timedelta(days=1)
+        limite = dia.isoformat()
+    # O snapshot de um dia cobre até a meia-noite seguinte, que não pode passar do limite
+    return (dia - timedelta(days=1)).isoformat(), limite
+
+
+@medido
+def estoque_em(momento=None, ids_produtos=None, con=None):
+    """Estoque de cada produto em `momento` (data, datetime ou texto ISO; None = agora).
+
+    Retorna DataFrame com id_produto, saldo e o dia do snapshot usado.
+    """
+    con = con or obter_conexao()
+    dia, limite = _limites(momento)
+    filtro, parametros = "", [dia]
+    if ids_produtos is not None:
+        filtro = "WHERE p.id_produto IN (SELECT value FROM json_each(?))"
+        parametros.append(json.dumps([int(i) for i in ids_produtos]))
+    parametros.append(limite)
+    saldos = pd.read_sql_query(
+        f"SELECT id_produto, saldo, dia_snapshot FROM ({_sql_saldos(filtro)}) ORDER BY id_produto",
+        con,
+        params=parametros,
+    )
+
+    # Movimentações entre o snapshot e `momento` que já saíram do SQLite
+    corte = historico_arquivo.corte(con)
+    if corte is not None and not saldos.empty:
+        fim = min(limite, corte)
+        for dia_snapshot, grupo in saldos.groupby(saldos["dia_snapshot"].fillna(""), sort=False):
+            inicio = (date.fromisoformat(dia_snapshot) + timedelta(days=1)).isoformat() if dia_snapshot else None
+            if inicio is not None and inicio >= fim:
+                continue
+            delta = historico_arquivo.variacao(inicio, fim, grupo["id_produto"].tolist())
+            saldos.loc[grupo.index, "saldo"] += grupo["id_produto"].map(delta).fillna(0).astype("int64")
+    return saldos
+
+
+@medido
+def gerar_snapshot(dia=None):
+    """Grava o saldo de todos os produtos ao fim de `dia` (padrão: ontem). Retorna o número de linhas."""
+    dia = dia or date.today() - timedelta(days=1)
+    aceito, limite = _limites(dia)
+    with transacao(modo="IMMEDIATE") as con:
+        return con.execute(
+            f"INSERT OR REPLACE INTO saldos_estoque (id_produto, dia, saldo) "
+            f"SELECT id_produto, ?, saldo FROM ({_sql_saldos()})",
+            (dia.isoformat(), aceito, limite),
+        ).rowcount
+
+
+@medido
+def atualizar_snapshots(hoje=None):
+    """Gera o snapshot de ontem se o último tiver mais de `config.SALDOS_INTERVALO_DIAS` dias.
+
+    Retorna o dia do snapshot gerado, ou None se ainda não era hora.
+    """
+    ontem = (hoje or date.today()) - timedelta(days=1)
+    ultimo = obter_conexao().execute("SELECT MAX(dia) FROM saldos_estoque").fetchone()[0]
+    if ultimo is not None and (ontem - date.fromisoformat(ultimo)).days < config.SALDOS_INTERVALO_DIAS:
+        return None
+    gerar_snapshot(ontem)
+    return ontem
+
+
+@medido
+def reconciliar(corrigir=None, usuario="Sistema"):
+    """Compara `produtos.estoque_atual` com o saldo do razão e lista as divergências.
+
+    Com `corrigir="estoque"`, o estoque guardado passa a ser o do razão.
+    Com `corrigir="movimentacoes"`, o estoque guardado é tido como a
+    contagem correta e uma movimentação de ajuste é registrada para cada
+    divergência. Retorna DataFrame com id_produto, estoque_atual, saldo e
+    diferenca (estoque_atual − saldo), antes da correção.
+    """
+    if corrigir is not None and corrigir not in CORRECOES:
+        raise ValueError(f"Correção inválida: {corrigir!r}. Use uma de {CORRECOES}.")
+
+    with transacao(modo="IMMEDIATE" if corrigir else "DEFERRED") as con:
+        divergencias = pd.read_sql_query(
+            f"SELECT id_produto, estoque_atual, saldo, estoque_atual - saldo AS diferenca "
+            f"FROM ({_sql_saldos()}) WHERE estoque_atual != saldo ORDER BY id_produto",
+            con,
+            params=(_SEM_LIMITE, _SEM_LIMITE),
+        )
+        if corrigir == "estoque":
+            con.executemany(
+                "UPDATE produtos SET estoque_atual = ? WHERE id_produto = ?",
+                zip(divergencias["saldo"].tolist(), divergencias["id_produto"].tolist()),
+            )
+        elif corrigir == "movimentacoes":
+            # O ajuste precisa partir do saldo do razão, não do estoque guardado
+            for id_produto, estoque, saldo in divergencias[["id_produto", "estoque_atual", "saldo"]].itertuples(
+                index=False, name=None
+            ):
+                con.execute("UPDATE produtos SET estoque_atual = ? WHERE id_produto = ?", (int(saldo), int(id_produto)))
+                registrar_ajuste(con, int(id_produto), int(estoque), usuario, "Ajuste de reconciliação")
+    return divergencias
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Confere o estoque guardado contra o razão de movimentações.")
+    parser.add_argument("--corrigir", choices=CORRECOES, help="corrige as divergências encontradas")
+    parser.add_argument("--snapshot", action="store_true",
+                        help=f"antes, grava o snapshot de ontem se o último tiver mais de {config.SALDOS_INTERVALO_DIAS} dias")
+    opcoes = parser.parse_args(argumentos)
+
+    if opcoes.snapshot:
+        dia = atualizar_snapshots()
+        print(f"Snapshot de saldos gravado para {dia}." if dia else "Snapshot de saldos ainda recente.")
+
+    divergencias = reconciliar(opcoes.corrigir)
+    if divergencias.empty:
+        print("Nenhuma divergência entre estoque_atual e movimentações.")
+        return 0
+    print(divergencias.to_string(index=False))
+    print(f"\n{len(divergencias)} produto(s) divergente(s).")
+    if opcoes.corrigir:
+        print(f"Corrigido(s) por '{opcoes.corrigir}'.")
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,90 @@
+"""Consultas de vendas em janelas móveis sobre o consolidado `vendas_diarias`.
+
+O consolidado tem uma linha por produto e dia e é mantido por gatilho a
+cada venda registrada (migração 4 de `core.esquema`). Por isso as janelas
+de 7/30/90 dias leem no máximo `dias` linhas por produto, sem varrer
+`movimentacoes`.
+"""
+from datetime import date, timedelta
+
+import pandas as pd
+
+from core.conexao import obter_conexao
+from core.metricas import medido
+
+JANELAS_PADRAO = (7, 30, 90)
+
+
+def limites_janela(dias=30, ate=None):
+    """Retorna (primeiro dia, último dia) em texto ISO de uma janela de `dias` dias terminando em `ate`."""
+    ate = ate or date.today()
+    return (ate - timedelta(days=dias - 1)).isoformat(), ate.isoformat()
+
+
+@medido
+def vendas_por_produto(dias=30, ate=None):
+    """Quantidade e receita vendidas por produto na janela, da maior receita para a menor."""
+    inicio, fim = limites_janela(dias, ate)
+    return pd.read_sql_query(
+        """SELECT v.id_produto, p.nome, p.categoria,
+       SUM(v.quantidade) AS quantidade, SUM(v.receita) AS receita
+FROM vendas_diarias v
+LEFT JOIN produtos p ON p.id_produto = v.id_produto
+WHERE v.dia BETWEEN ? AND ?
+GROUP BY v.id_produto
+ORDER BY receita DESC""",
+        obter_conexao(),
+        params=(inicio, fim),
+    )
+
+
+@medido
+def vendas_por_categoria(dias=30, ate=None):
+    """Quantidade e receita vendidas por categoria na janela, da maior receita para a menor."""
+    inicio, fim = limites_janela(dias, ate)
+    return pd.read_sql_query(
+        """SELECT COALESCE(p.categoria, 'Sem categoria') AS categoria,
+       SUM(v.quantidade) AS quantidade, SUM(v.receita) AS receita
+FROM vendas_diarias v
+LEFT JOIN produtos p ON p.id_produto = v.id_produto
+WHERE v.dia BETWEEN ? AND ?
+GROUP BY 1
+ORDER BY receita DESC""",
+        obter_conexao(),
+        params=(inicio, fim),
+    )
+
+
+@medido
+def top_vendidos(n=5, dias=30, ate=None):
+    """Os `n` produtos com mais unidades vendidas na janela."""
+    inicio, fim = limites_janela(dias, ate)
+    return pd.read_sql_query(
+        """SELECT v.id_produto, p.nome, SUM(v.quantidade) AS quantidade
+FROM vendas_diarias v
+LEFT JOIN produtos p ON p.id_produto = v.id_produto
+WHERE v.dia BETWEEN ? AND ?
+GROUP BY v.id_produto
+ORDER BY quantidade DESC
+LIMIT ?""",
+        obter_conexao(),
+        params=(inicio, fim, int(n)),
+    )
+
+
+@medido
+def vendas_em_janelas(janelas=JANELAS_PADRAO, ate=None):
+    """Unidades vendidas por produto em várias janelas de uma vez (uma coluna por janela)."""
+    ate = ate or date.today()
+    colunas = ", ".join(
+        f"SUM(CASE WHEN dia >= ? THEN quantidade ELSE 0 END) AS vendidos_{dias}_dias"
+        for dias in janelas
+    )
+    parametros = [limites_janela(dias, ate)[0] for dias in janelas]
+    parametros += [limites_janela(max(janelas), ate)[0], ate.isoformat()]
+    return pd.read_sql_query(
+        f"SELECT id_produto, {colunas} FROM vendas_diarias "
+        "WHERE dia BETWEEN ? AND ? GROUP BY id_produto",
+        obter_conexao(),
+        params=parametros,
+    )
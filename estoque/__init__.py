@@ -0,0 +1 @@
+"""Linha de comando do sistema de estoque (`python -m estoque --help`)."""
@@ -0,0 +1,265 @@
+"""Linha de comando para tarefas agendadas e integrações, sem o Streamlit.
+
+    python -m estoque [--banco CAMINHO] [--formato csv|json] COMANDO ...
+
+Comandos:
+- importar: importa produtos.csv/movimentacoes.csv para o banco;
+- movimentacoes: registra um lote de movimentações lido de um arquivo ou
+  da entrada padrão (CSV ou JSON, um objeto por linha) e lista as linhas
+  rejeitadas;
+- estoque-baixo: produtos com estoque abaixo do limite;
+- snapshot: grava o saldo de cada produto ao fim de ontem em
+  `saldos_estoque` se o último tiver mais de `config.SALDOS_INTERVALO_DIAS`
+  dias (ou sempre, com --dia), para que `core.saldos` não precise
+  percorrer o histórico inteiro;
+- mudancas: registros alterados depois de uma sequência do feed de
+  `core.mudancas` (para integrações que acompanham o estoque);
+- mais-vendidos e vendas-categoria: vendas da janela de dias;
+- previsao: previsão de demanda do catálogo (com --selecionar, refaz
+  antes a seleção de modelo por produto).
+
+Os resultados vão para a saída padrão em CSV (com cabeçalho) ou JSON (um
+objeto por linha), escritos conforme são produzidos; mensagens e
+progresso vão para a saída de erro. Códigos de saída: 0 sucesso, 1 falha
+ou linhas rejeitadas (ver cada comando), 2 uso incorreto.
+
+Exemplo (cron, todo dia às 2h):
+
+    0 2 * * * cd /srv/estoque && python -m estoque --formato json previsao --selecionar > previsao.jsonl
+    30 2 * * * cd /srv/estoque && python -m estoque snapshot
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sqlite3
+import sys
+from datetime import date
+
+from utils import config
+
+SAIDA_OK = 0
+SAIDA_FALHA = 1
+SAIDA_USO = 2
+
+FORMATOS = ("csv", "json")
+
+
+def _escrever(colunas, linhas, formato, saida=None):
+    """Escreve `linhas` (tuplas na ordem de `colunas`) em CSV ou JSON por linha. Retorna quantas."""
+    saida = saida or sys.stdout
+    total = 0
+    if formato == "csv":
+        escritor = csv.writer(saida, lineterminator="\n")
+        escritor.writerow(colunas)
+        for linha in linhas:
+            escritor.writerow(linha)
+            total += 1
+    else:
+        for linha in linhas:
+            saida.write(json.dumps(dict(zip(colunas, linha)), ensure_ascii=False, default=str) + "\n")
+            total += 1
+    saida.flush()
+    return total
+
+
+def _escrever_df(df, formato):
+    # Mesma conversão de `core.gerenciamento_estoque._substituir_conteudo`: NaN vira None
+    linhas = df.astype(object).where(df.notna(), None)
+    return _escrever(list(df.columns), linhas.itertuples(index=False, name=None), formato)
+
+
+def _abrir_entrada(caminho):
+    if caminho == "-":
+        return contextlib.nullcontext(sys.stdin)
+    return open(caminho, encoding="utf-8", newline="")
+
+
+def _ler_movimentacoes(arquivo, formato):
+    """Dicionários no formato de `registrar_movimentacoes_em_lote`, um por linha da entrada."""
+    if formato == "csv":
+        registros = csv.DictReader(arquivo)
+    else:
+        registros = (json.loads(linha) for linha in arquivo if linha.strip())
+    for registro in registros:
+        # `venda` segue como texto: quem interpreta é `registrar_movimentacoes_em_lote`
+        yield {c: (None if v == "" else v) for c, v in registro.items()}
+
+
+def _progresso(tabela, linhas, linhas_por_segundo):
+    print(f"{tabela}: {linhas} linhas importadas ({linhas_por_segundo:,.0f} linhas/s)", file=sys.stderr)
+
+
+def cmd_importar(opcoes):
+    from core.gerenciamento_estoque import importar_csv_para_db
+
+    caminhos = [c for c in (opcoes.produtos, opcoes.movimentacoes) if c]
+    faltando = [c for c in caminhos if not os.path.exists(c)]
+    if faltando:
+        print(f"Arquivo(s) não encontrado(s): {', '.join(faltando)}", file=sys.stderr)
+        return SAIDA_FALHA
+    # As mensagens do importador vão para stderr; stdout fica só com o resultado
+    with contextlib.redirect_stdout(sys.stderr):
+        importadas = importar_csv_para_db(
+            opcoes.produtos or "", opcoes.movimentacoes or "", opcoes.tamanho_bloco,
+            opcoes.incremental, progresso=_progresso,
+        )
+    _escrever(["tabela", "linhas"], importadas.items(), opcoes.formato)
+    return SAIDA_OK
+
+
+def cmd_movimentacoes(opcoes):
+    from core.gerenciamento_estoque import registrar_movimentacoes_em_lote
+
+    formato = opcoes.entrada
+    if formato is None:
+        formato = "json" if opcoes.arquivo.endswith((".json", ".jsonl")) else "csv"
+    with _abrir_entrada(opcoes.arquivo) as arquivo:
+        resultado = registrar_movimentacoes_em_lote(
+            _ler_movimentacoes(arquivo, formato), opcoes.politica, opcoes.usuario, opcoes.tamanho_bloco
+        )
+    _escrever(["linha", "motivo"], resultado["rejeitadas"], opcoes.formato)
+    print(f"{resultado['aplicadas']} movimentação(ões) aplicada(s), "
+          f"{len(resultado['rejeitadas'])} rejeitada(s).", file=sys.stderr)
+    return SAIDA_FALHA if resultado["rejeitadas"] else SAIDA_OK
+
+
+def cmd_estoque_baixo(opcoes):
+    # Só sqlite3: não carrega pandas
+    from core import estoque_rapido
+
+    produtos = estoque_rapido.estoque_baixo(opcoes.limite)
+    _escrever(estoque_rapido.Produto._fields, produtos, opcoes.formato)
+    return SAIDA_FALHA if produtos and opcoes.falhar else SAIDA_OK
+
+
+def cmd_snapshot(opcoes):
+    from core import saldos
+
+    if opcoes.dia:
+        saldos.gerar_snapshot(opcoes.dia)
+        dia = opcoes.dia
+    else:
+        dia = saldos.atualizar_snapshots()
+    # Saída vazia quando o último snapshot ainda é recente
+    _escrever(["dia"], [(dia.isoformat(),)] if dia else [], opcoes.formato)
+    return SAIDA_OK
+
+
+def cmd_mudancas(opcoes):
+    # Também só sqlite3; quem consome guarda o maior `seq` e o passa em --desde
+    from core import mudancas
+
+    _escrever(mudancas.Mudanca._fields, mudancas.mudancas_desde(opcoes.desde, opcoes.limite), opcoes.formato)
+    return SAIDA_OK
+
+
+def cmd_mais_vendidos(opcoes):
+    from core import vendas
+
+    _escrever_df(vendas.top_vendidos(opcoes.n, opcoes.dias, opcoes.ate), opcoes.formato)
+    return SAIDA_OK
+
+
+def cmd_vendas_categoria(opcoes):
+    from core import vendas
+
+    _escrever_df(vendas.vendas_por_categoria(opcoes.dias, opcoes.ate), opcoes.formato)
+    return SAIDA_OK
+
+
+def cmd_previsao(opcoes):
+    from core import previsao_demanda
+
+    if opcoes.selecionar:
+        def progresso(feitos, total):
+            print(f"seleção de modelos: {feitos}/{total} fragmento(s)", file=sys.stderr)
+
+        previsao_demanda.selecionar_modelos(historico_dias=opcoes.historico_dias, ate=opcoes.ate,
+                                            processos=opcoes.processos, progresso=progresso)
+    modelo = opcoes.modelo or ("selecionado" if opcoes.selecionar else "auto")
+    _escrever_df(
+        previsao_demanda.prever_demanda(modelo, opcoes.horizonte, opcoes.historico_dias, ate=opcoes.ate),
+        opcoes.formato,
+    )
+    return SAIDA_OK
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog="python -m estoque", description="Tarefas do estoque sem a interface web.")
+    parser.add_argument("--banco", help=f"arquivo SQLite (padrão: {config.DB_PATH})")
+    parser.add_argument("--formato", choices=FORMATOS, default="csv",
+                        help="formato da saída: csv com cabeçalho ou json (um objeto por linha)")
+    comandos = parser.add_subparsers(dest="comando", required=True, metavar="COMANDO")
+
+    p = comandos.add_parser("importar", help="importa os CSVs de produtos e movimentações")
+    p.add_argument("--produtos", default="data/raw/produtos.csv", help="CSV de produtos ('' para pular)")
+    p.add_argument("--movimentacoes", default="data/raw/movimentacoes.csv", help="CSV de movimentações ('' para pular)")
+    p.add_argument("--incremental", action="store_true", help="só movimentações com id acima do último do banco")
+    p.add_argument("--tamanho-bloco", type=int, default=50_000)
+    p.set_defaults(funcao=cmd_importar)
+
+    p = comandos.add_parser("movimentacoes", help="registra um lote de movimentações (sai com 1 se houver rejeitadas)")
+    p.add_argument("arquivo", nargs="?", default="-", help="CSV ou JSON por linha ('-' = entrada padrão)")
+    p.add_argument("--entrada", choices=FORMATOS, help="formato da entrada (padrão: pela extensão; csv para '-')")
+    p.add_argument("--politica", choices=("parcial", "tudo_ou_nada"), default="parcial")
+    p.add_argument("--usuario", default="Sistema")
+    p.add_argument("--tamanho-bloco", type=int, default=5000)
+    p.set_defaults(funcao=cmd_movimentacoes)
+
+    p = comandos.add_parser("estoque-baixo", help="produtos com estoque abaixo do limite")
+    p.add_argument("--limite", type=int, default=10)
+    p.add_argument("--falhar", action="store_true", help="sai com código 1 se houver algum produto na lista")
+    p.set_defaults(funcao=cmd_estoque_baixo)
+
+    p = comandos.add_parser("snapshot", help="grava o snapshot periódico dos saldos de estoque, se for hora")
+    p.add_argument("--dia", type=date.fromisoformat, help="grava o snapshot deste dia mesmo que não seja hora (AAAA-MM-DD)")
+    p.set_defaults(funcao=cmd_snapshot)
+
+    p = comandos.add_parser("mudancas", help="registros alterados depois de uma sequência do feed de mudanças")
+    p.add_argument("--desde", type=int, default=0, help="última sequência já processada (padrão: 0, tudo)")
+    p.add_argument("--limite", type=int, help="máximo de registros (continue do último seq recebido)")
+    p.set_defaults(funcao=cmd_mudancas)
+
+    p = comandos.add_parser("mais-vendidos", help="produtos com mais unidades vendidas")
+    p.add_argument("-n", type=int, default=10)
+    p.add_argument("--dias", type=int, default=30)
+    p.add_argument("--ate", type=date.fromisoformat, help="último dia da janela (AAAA-MM-DD; padrão: hoje)")
+    p.set_defaults(funcao=cmd_mais_vendidos)
+
+    p = comandos.add_parser("vendas-categoria", help="quantidade e receita vendidas por categoria")
+    p.add_argument("--dias", type=int, default=30)
+    p.add_argument("--ate", type=date.fromisoformat, help="último dia da janela (AAAA-MM-DD; padrão: hoje)")
+    p.set_defaults(funcao=cmd_vendas_categoria)
+
+    p = comandos.add_parser("previsao", help="previsão de demanda de todo o catálogo")
+    p.add_argument("--modelo", help="auto, selecionado ou um modelo (padrão: selecionado com --selecionar, senão auto)")
+    p.add_argument("--horizonte", type=int, help=f"dias à frente (padrão: {config.PREVISAO_HORIZONTE_DIAS})")
+    p.add_argument("--historico-dias", type=int, help=f"dias de histórico (padrão: {config.PREVISAO_HISTORICO_DIAS})")
+    p.add_argument("--ate", type=date.fromisoformat, help="último dia do histórico (AAAA-MM-DD; padrão: hoje)")
+    p.add_argument("--selecionar", action="store_true", help="refaz a seleção de modelo por produto antes de prever")
+    p.add_argument("--processos", type=int, help="processos da seleção de modelos (padrão: um por CPU)")
+    p.set_defaults(funcao=cmd_previsao)
+    return parser
+
+
+def main(argumentos=None):
+    opcoes = _parser().parse_args(argumentos)
+    if opcoes.banco:
+        config.DB_PATH = opcoes.banco
+    try:
+        return opcoes.funcao(opcoes)
+    except BrokenPipeError:
+        # Leitor fechou o pipe (ex.: `| head`): sai sem rastro, como as ferramentas de linha de comando
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return SAIDA_OK
+    except (ValueError, RuntimeError, OSError, sqlite3.Error) as erro:
+        print(f"Erro: {erro}", file=sys.stderr)
+        return SAIDA_FALHA
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
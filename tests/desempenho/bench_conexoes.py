@@ -0,0 +1,66 @@
+#Micro-benchmark: quantas conexões SQLite cada operação do core abre e quanto custa
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import core.gerenciamento_estoque as ge
+from core.conexao import fechar_conexoes
+from utils import config
+
+DB_ORIGEM = "data/raw/estoque.db"
+REPETICOES = 200
+
+_conectar_original = sqlite3.connect
+_contador = {"conexoes": 0}
+
+def _conectar_contando(*args, **kwargs):
+    _contador["conexoes"] += 1
+    return _conectar_original(*args, **kwargs)
+
+def _apontar_para(caminho):
+    # `core.conexao` abre `config.DB_PATH`; conexões já abertas para outro banco são fechadas
+    config.DB_PATH = caminho
+    fechar_conexoes()
+
+def operacoes():
+    return {
+        "carregar_produtos": lambda: ge.carregar_produtos(),
+        "carregar_movimentacoes": lambda: ge.carregar_movimentacoes(),
+        "buscar_produto": lambda: ge.buscar_produto("coca"),
+        "verificar_estoque_baixo": lambda: ge.verificar_estoque_baixo(),
+        "registrar_movimentacao": lambda: ge.registrar_movimentacao(2, "entrada", 1),
+    }
+
+def medir(nome, funcao):
+    funcao()  # aquecimento: inicialização do esquema fica fora da medição
+    _contador["conexoes"] = 0
+    inicio = time.perf_counter()
+    for _ in range(REPETICOES):
+        funcao()
+    duracao = time.perf_counter() - inicio
+    return {
+        "operacao": nome,
+        "conexoes_por_chamada": _contador["conexoes"] / REPETICOES,
+        "ms_por_chamada": duracao * 1000 / REPETICOES,
+    }
+
+def main():
+    pasta = tempfile.mkdtemp()
+    caminho = os.path.join(pasta, "estoque.db")
+    shutil.copy(DB_ORIGEM, caminho)
+    _apontar_para(caminho)
+    sqlite3.connect = _conectar_contando
+    try:
+        print(f"{'operação':<26}{'conexões/chamada':>18}{'ms/chamada':>12}")
+        for nome, funcao in operacoes().items():
+            r = medir(nome, funcao)
+            print(f"{r['operacao']:<26}{r['conexoes_por_chamada']:>18.2f}{r['ms_por_chamada']:>12.3f}")
+    finally:
+        sqlite3.connect = _conectar_original
+        shutil.rmtree(pasta, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#Benchmark das operações do core sobre dados sintéticos, com resultado em JSON
+#Execute a partir da raiz do projeto:
+#    python -m tests.desempenho.bench_core --tamanho 100k [--comparar data/processed/benchmarks/anterior.json]
+#
+#Gera (ou reaproveita, com --dados) os CSVs de tests.desempenho.gerador_dados,
+#importa para um banco temporário e mede cada operação: aquecimento, depois
+#rodadas até somar --tempo-min segundos (mínimo de MIN_RODADAS). O JSON segue o
+#formato do pytest-benchmark (machine_info, commit_info, benchmarks[].stats),
+#para comparar execuções na mesma máquina. Com --comparar, lista a variação da
+#mediana contra um resultado anterior e sai com código 1 se alguma operação
+#ficou mais lenta que --limiar.
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from tests.desempenho import gerador_dados
+from utils import config
+
+MIN_RODADAS = 5
+MAX_RODADAS = 10_000
+ATE = date(2025, 12, 31)  # último dia do histórico sintético
+
+def _sem_progresso(tabela, linhas, linhas_por_segundo):
+    pass
+
+def operacoes(id_vendido, categoria):
+    """nome -> função sem argumentos. Importações tardias: config.DB_PATH já aponta para o banco de teste."""
+    import core.gerenciamento_estoque as ge
+    from core import consultas, relatorios
+
+    noventa_dias = {"data_inicio": ATE - timedelta(days=89), "data_fim": ATE}
+    return {
+        "carregar_produtos": ge.carregar_produtos,
+        "registrar_movimentacao": lambda: ge.registrar_movimentacao(id_vendido, "saida", 1, usuario="bench", venda=True),
+        "buscar_produto[nome]": lambda: ge.buscar_produto(categoria.lower()),
+        "buscar_produto[id]": lambda: ge.buscar_produto(int(id_vendido)),
+        "verificar_estoque_baixo": ge.verificar_estoque_baixo,
+        "historico[primeira_pagina]": lambda: consultas.buscar_movimentacoes(),
+        "historico[categoria_90_dias]": lambda: consultas.buscar_movimentacoes(
+            dict(noventa_dias, categorias=[categoria])),
+        "historico[opcoes_filtro]": consultas.opcoes_filtro_historico,
+        "historico[serie_365_dias]": lambda: relatorios.serie_movimentacoes(
+            {"data_inicio": ATE - timedelta(days=364), "data_fim": ATE}),
+        "relatorio[valorizacao]": relatorios.valorizacao_estoque,
+        "relatorio[curva_abc]": lambda: relatorios.curva_abc(ate=ATE),
+        "relatorio[giro]": lambda: relatorios.giro_estoque(ate=ATE),
+        "relatorio[mais_vendidos]": lambda: relatorios.mais_vendidos(ate=ATE),
+        "relatorio[lucratividade]": lambda: relatorios.lucratividade_categorias(ate=ATE),
+        "relatorio[serie_vendas]": lambda: relatorios.serie_vendas(ate=ATE),
+    }
+
+def estatisticas(tempos):
+    """Mesmos campos de `stats` do pytest-benchmark (segundos)."""
+    ordenados = sorted(tempos)
+    q1, _, q3 = statistics.quantiles(ordenados, n=4) if len(ordenados) > 1 else (ordenados[0],) * 3
+    media = statistics.fmean(ordenados)
+    return {
+        "min": ordenados[0],
+        "max": ordenados[-1],
+        "mean": media,
+        "stddev": statistics.stdev(ordenados) if len(ordenados) > 1 else 0.0,
+        "median": statistics.median(ordenados),
+        "iqr": q3 - q1,
+        "q1": q1,
+        "q3": q3,
+        "rounds": len(ordenados),
+        "total": sum(ordenados),
+        "ops": 1 / media if media else 0.0,
+    }
+
+def medir(funcao, tempo_min):
+    funcao()  # aquecimento: esquema, cache de páginas e de instruções fora da medição
+    tempos = []
+    total = 0.0
+    while len(tempos) < MIN_RODADAS or (total < tempo_min and len(tempos) < MAX_RODADAS):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+        total += tempos[-1]
+    return estatisticas(tempos)
+
+def _commit():
+    try:
+        saida = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout
+        sujo = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                              capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {"id": None, "dirty": None}
+    return {"id": saida.strip(), "dirty": bool(sujo.strip())}
+
+def _maquina():
+    return {
+        "node": platform.node(),
+        "processor": platform.processor(),
+        "machine": platform.machine(),
+        "python_version": platform.python_version(),
+        "python_implementation": platform.python_implementation(),
+        "system": platform.system(),
+        "release": platform.release(),
+        "cpu_count": os.cpu_count(),
+        "sqlite_version": sqlite3.sqlite_version,
+    }
+
+def comparar(atual, anterior, limiar):
+    """Variação da mediana por operação. Retorna a lista de regressões acima de `limiar`."""
+    antes = {b["name"]: b["stats"]["median"] for b in anterior["benchmarks"]}
+    regressoes = []
+    print(f"\n{'operação':<32}{'antes (ms)':>12}{'agora (ms)':>12}{'variação':>10}")
+    for b in atual["benchmarks"]:
+        if b["name"] not in antes:
+            continue
+        variacao = b["stats"]["median"] / antes[b["name"]] - 1
+        marca = "  <-- mais lento" if variacao > limiar else ""
+        print(f"{b['name']:<32}{antes[b['name']] * 1000:>12.3f}{b['stats']['median'] * 1000:>12.3f}"
+              f"{variacao:>+10.1%}{marca}")
+        if marca:
+            regressoes.append(b["name"])
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do core sobre dados sintéticos.")
+    parser.add_argument("--tamanho", choices=gerador_dados.TAMANHOS, default="100k")
+    parser.add_argument("--dados", help="pasta com produtos.csv e movimentacoes.csv (padrão: gera em pasta temporária)")
+    parser.add_argument("--saida", help="arquivo JSON (padrão: data/processed/benchmarks/<tamanho>-<data>.json)")
+    parser.add_argument("--tempo-min", type=float, default=1.0, help="segundos de medição por operação")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    parser.add_argument("--limiar", type=float, default=0.20, help="variação da mediana tida como regressão")
+    opcoes = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    try:
+        if opcoes.dados:
+            produtos_csv = os.path.join(opcoes.dados, "produtos.csv")
+            movimentacoes_csv = os.path.join(opcoes.dados, "movimentacoes.csv")
+        else:
+            print(f"Gerando dados sintéticos ({opcoes.tamanho})...")
+            produtos_csv, movimentacoes_csv = gerador_dados.escrever_csv(pasta, opcoes.tamanho)
+
+        config.DB_PATH = os.path.join(pasta, "estoque.db")
+        import core.gerenciamento_estoque as ge
+        from core.conexao import obter_conexao
+
+        # A importação é medida uma vez só: cada rodada partiria de um banco vazio
+        inicio = time.perf_counter()
+        importadas = ge.importar_csv_para_db(produtos_csv, movimentacoes_csv, progresso=_sem_progresso)
+        duracao = time.perf_counter() - inicio
+        linhas = sum(importadas.values())
+        resultados = [{
+            "name": "importar_csv_para_db",
+            "stats": estatisticas([duracao]),
+            "extra_info": dict(importadas, linhas_por_segundo=linhas / duracao),
+        }]
+
+        # Vende sempre o produto mais vendido, com estoque de sobra para todas as rodadas
+        con = obter_conexao()
+        id_vendido, categoria = con.execute(
+            """SELECT m.id_produto, p.categoria FROM movimentacoes m JOIN produtos p USING (id_produto)
+            WHERE m.venda = 1 GROUP BY m.id_produto ORDER BY COUNT(*) DESC LIMIT 1"""
+        ).fetchone()
+        ge.registrar_movimentacao(id_vendido, "entrada", 10_000_000, usuario="bench", observacao="Estoque do benchmark")
+
+        print(f"\n{'operação':<32}{'mediana (ms)':>14}{'mín (ms)':>10}{'op/s':>10}{'rodadas':>9}")
+        print(f"{'importar_csv_para_db':<32}{duracao * 1000:>14.1f}{duracao * 1000:>10.1f}"
+              f"{'':>10}{1:>9}   ({linhas / duracao:,.0f} linhas/s)")
+        for nome, funcao in operacoes(id_vendido, categoria).items():
+            s = medir(funcao, opcoes.tempo_min)
+            resultados.append({"name": nome, "stats": s})
+            print(f"{nome:<32}{s['median'] * 1000:>14.3f}{s['min'] * 1000:>10.3f}{s['ops']:>10,.0f}{s['rounds']:>9}")
+    finally:
+        from core.conexao import fechar_conexoes
+        fechar_conexoes()
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    relatorio = {
+        "machine_info": _maquina(),
+        "commit_info": _commit(),
+        "datetime": datetime.now().isoformat(timespec="seconds"),
+        "params": {"tamanho": opcoes.tamanho, "semente": gerador_dados.SEMENTE, "tempo_min": opcoes.tempo_min},
+        "benchmarks": resultados,
+    }
+    saida = opcoes.saida or os.path.join(
+        "data", "processed", "benchmarks", f"{opcoes.tamanho}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(saida) or ".", exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    print(f"\nResultado gravado em {saida}")
+
+    if opcoes.comparar:
+        with open(opcoes.comparar, encoding="utf-8") as arquivo:
+            anterior = json.load(arquivo)
+        if anterior.get("params", {}).get("tamanho") != opcoes.tamanho:
+            print("Aviso: a execução anterior usou outro tamanho de dados.")
+        regressoes = comparar(relatorio, anterior, opcoes.limiar)
+        if regressoes:
+            print(f"\n{len(regressoes)} operação(ões) mais lenta(s) que o limiar de {opcoes.limiar:.0%}.")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,213 @@
+#Gerador determinístico de dados sintéticos (catálogo + histórico de movimentações)
+#Execute a partir da raiz do projeto:
+#    python -m tests.desempenho.gerador_dados --tamanho 100k --pasta data/processed/sinteticos
+#
+#Mesma semente e tamanho => arquivos idênticos. Os CSVs têm as colunas do
+#importador (core.gerenciamento_estoque.importar_csv_para_db). As vendas
+#seguem popularidade do tipo Zipf, padrão semanal (fim de semana mais forte),
+#sazonalidade anual por categoria e uma leve tendência de alta; reposições
+#(entradas) entram quando o saldo não cobre as vendas do dia, de modo que o
+#estoque nunca fica negativo. As movimentações são geradas em blocos de
+#dias, em ordem cronológica, sem montar o histórico inteiro em memória.
+
+import argparse
+import os
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+# tamanho -> (produtos, vendas); as reposições somam mais ~10%
+TAMANHOS = {
+    "1k": (50, 1_000),
+    "100k": (2_000, 100_000),
+    "10m": (100_000, 10_000_000),
+}
+DIAS_HISTORICO = 730
+SEMENTE = 42
+
+# categoria -> (preço médio, amplitude da sazonalidade anual, mês de pico)
+CATEGORIAS = {
+    "Bebidas": (8.0, 0.45, 1),
+    "Sorvetes": (12.0, 0.8, 1),
+    "Salgados": (6.0, 0.1, 6),
+    "Lanches": (20.0, 0.1, 7),
+    "Porções": (30.0, 0.2, 7),
+    "Sobremesas": (10.0, 0.3, 12),
+    "Frutas": (4.0, 0.35, 10),
+    "Mercearia": (15.0, 0.05, 1),
+    "Limpeza": (18.0, 0.05, 1),
+    "Panetones": (35.0, 0.95, 12),
+}
+PESO_DIA_SEMANA = np.array([0.85, 0.85, 0.9, 0.95, 1.15, 1.4, 1.2])  # segunda..domingo
+LOTE_DIAS = 21
+LINHAS_POR_BLOCO = 500_000
+
+def gerar_produtos(n, semente=SEMENTE):
+    """Catálogo com `n` produtos; estoque_atual é preenchido depois, a partir do histórico."""
+    rng = np.random.default_rng([semente, 0])
+    nomes_categorias = np.array(list(CATEGORIAS))
+    categorias = nomes_categorias[rng.integers(0, len(nomes_categorias), n)]
+    preco_medio = np.array([CATEGORIAS[c][0] for c in categorias])
+    return pd.DataFrame({
+        "id_produto": np.arange(1, n + 1),
+        "nome": [f"{c} {i:06d}" for i, c in enumerate(categorias, start=1)],
+        "categoria": categorias,
+        "preco_unitario": np.round(preco_medio * rng.lognormal(0, 0.35, n), 2),
+        "estoque_atual": 0,
+        "vendidos_ultimos_30_dias": 0,
+    })
+
+def _popularidade(n, rng):
+    # Zipf: poucos produtos concentram a maior parte das vendas
+    pesos = 1.0 / np.arange(1, n + 1) ** 1.1
+    return pesos[rng.permutation(n)] / pesos.sum()
+
+def _sazonalidade(dias):
+    """Fator multiplicativo categoria × dia (sazonalidade anual de cada categoria)."""
+    amplitude = np.array([a for _, a, _ in CATEGORIAS.values()])
+    pico = np.array([m for _, _, m in CATEGORIAS.values()])
+    dia_do_ano = np.array([d.timetuple().tm_yday for d in dias])
+    fase = 2 * np.pi * (dia_do_ano[None, :] - (pico[:, None] - 0.5) * 30.4) / 365.25
+    return 1 + amplitude[:, None] * np.cos(fase)
+
+def gerar_movimentacoes(produtos, n, dias=DIAS_HISTORICO, ate=date(2025, 12, 31), semente=SEMENTE,
+                        linhas_por_bloco=LINHAS_POR_BLOCO):
+    """Gera `n` vendas, mais as reposições, em blocos (DataFrames), em ordem cronológica.
+
+    Também acumula o saldo de cada produto, devolvido ao fim em
+    `produtos["estoque_atual"]` (o DataFrame é alterado no lugar).
+    """
+    rng = np.random.default_rng([semente, 1])
+    calendario = [ate - timedelta(days=dias - 1 - i) for i in range(dias)]
+    dia_semana = np.array([d.weekday() for d in calendario])
+    tendencia = np.linspace(0.85, 1.15, dias)
+    peso_dia = PESO_DIA_SEMANA[dia_semana] * tendencia
+    popularidade = _popularidade(len(produtos), rng)
+    categoria = pd.Categorical(produtos["categoria"], categories=list(CATEGORIAS)).codes
+    sazonal = _sazonalidade(calendario)
+    maximo = sazonal.max(axis=1)
+    ids = produtos["id_produto"].to_numpy()
+    descricao = produtos[["nome", "categoria"]].set_axis(ids)
+
+    # Linhas por dia proporcionais ao peso do dia e à sazonalidade do catálogo
+    peso_categoria = np.bincount(categoria, weights=popularidade, minlength=len(CATEGORIAS))
+    intensidade = peso_dia * (peso_categoria @ sazonal)
+    por_dia = np.floor(n * intensidade / intensidade.sum()).astype(np.int64)
+    por_dia[np.argsort(-intensidade)[: n - por_dia.sum()]] += 1
+
+    # Reposição: quando as vendas do dia passariam do saldo, entra de manhã
+    # um lote de ~LOTE_DIAS dias de demanda esperada (nunca há saldo negativo)
+    demanda_diaria = n * popularidade * 2.0 / dias  # saída geométrica(0,5) tem média 2
+    lote = np.ceil(demanda_diaria * LOTE_DIAS).astype(np.int64) + 5
+    saldo = lote.copy()
+    proximo_id = 1
+    bloco_inicial = pd.DataFrame({
+        "id_movimentacao": np.arange(1, len(produtos) + 1),
+        "id_produto": ids,
+        "tipo": "entrada",
+        "quantidade": lote,
+        "data": (calendario[0] - timedelta(days=1)).isoformat() + " 07:00:00",
+        "usuario": "Sistema",
+        "observacao": "Estoque inicial",
+        "venda": 0,
+    }).join(descricao, on="id_produto")
+    proximo_id += len(produtos)
+    yield bloco_inicial
+
+    inicio = 0
+    while inicio < dias:
+        # Blocos de dias inteiros com no máximo ~linhas_por_bloco linhas
+        fim = inicio + 1
+        while fim < dias and por_dia[inicio:fim + 1].sum() <= linhas_por_bloco:
+            fim += 1
+        linhas = int(por_dia[inicio:fim].sum())
+        if linhas == 0:
+            inicio = fim
+            continue
+
+        dia = np.repeat(np.arange(inicio, fim), por_dia[inicio:fim])
+        # Produto pela popularidade, corrigida pela sazonalidade do dia (amostragem por rejeição)
+        produto = rng.choice(len(produtos), size=linhas, p=popularidade)
+        faltam = np.arange(linhas)
+        while len(faltam):
+            c = categoria[produto[faltam]]
+            recusadas = rng.random(len(faltam)) * maximo[c] >= sazonal[c, dia[faltam]]
+            faltam = faltam[recusadas]
+            produto[faltam] = rng.choice(len(produtos), size=len(faltam), p=popularidade)
+        quantidade = rng.geometric(0.5, linhas)
+        segundos = rng.integers(8 * 3600, 22 * 3600, linhas)
+
+        entradas_dia, entradas_produto, entradas_quantidade = [], [], []
+        limites = np.searchsorted(dia, np.arange(inicio, fim + 1))
+        for d, (a, b) in enumerate(zip(limites[:-1], limites[1:]), start=inicio):
+            vendido = np.bincount(produto[a:b], weights=quantidade[a:b], minlength=len(produtos)).astype(np.int64)
+            repor = np.flatnonzero(vendido > saldo)
+            reposicao = vendido[repor] - saldo[repor] + lote[repor]
+            saldo[repor] += reposicao
+            saldo -= vendido
+            entradas_dia.append(np.full(len(repor), d))
+            entradas_produto.append(repor)
+            entradas_quantidade.append(reposicao)
+
+        n_entradas = sum(len(e) for e in entradas_produto)
+        entrada = np.r_[np.zeros(linhas, dtype=bool), np.ones(n_entradas, dtype=bool)]
+        dia = np.concatenate([dia, *entradas_dia])
+        produto = np.concatenate([produto, *entradas_produto])
+        quantidade = np.concatenate([quantidade, *entradas_quantidade])
+        segundos = np.r_[segundos, np.full(n_entradas, 7 * 3600)]
+        ordem = np.lexsort((segundos, dia))
+        dia, produto, entrada, quantidade, segundos = (
+            dia[ordem], produto[ordem], entrada[ordem], quantidade[ordem], segundos[ordem]
+        )
+
+        total = len(ordem)
+        datas = (np.datetime64(calendario[0]) + dia).astype("datetime64[s]") + segundos
+        bloco = pd.DataFrame({
+            "id_movimentacao": np.arange(proximo_id, proximo_id + total),
+            "id_produto": ids[produto],
+            "tipo": np.where(entrada, "entrada", "saida"),
+            "quantidade": quantidade,
+            "data": np.datetime_as_string(datas, unit="s"),
+            "usuario": "Sistema",
+            "observacao": np.where(entrada, "Reposição", "Venda PDV"),
+            "venda": (~entrada).astype(np.int64),
+        })
+        bloco["data"] = bloco["data"].str.replace("T", " ", regex=False)
+        bloco = bloco.join(descricao, on="id_produto")
+        proximo_id += total
+        inicio = fim
+        yield bloco
+
+    produtos["estoque_atual"] = saldo
+
+def escrever_csv(pasta, tamanho="100k", semente=SEMENTE, dias=DIAS_HISTORICO, ate=date(2025, 12, 31)):
+    """Grava produtos.csv e movimentacoes.csv em `pasta`. Retorna os dois caminhos."""
+    n_produtos, n_movimentacoes = TAMANHOS[tamanho]
+    os.makedirs(pasta, exist_ok=True)
+    caminho_produtos = os.path.join(pasta, "produtos.csv")
+    caminho_movimentacoes = os.path.join(pasta, "movimentacoes.csv")
+
+    produtos = gerar_produtos(n_produtos, semente)
+    colunas = ["id_movimentacao", "id_produto", "tipo", "quantidade", "data",
+               "usuario", "observacao", "nome", "categoria", "venda"]
+    with open(caminho_movimentacoes, "w", encoding="utf-8", newline="") as arquivo:
+        for numero, bloco in enumerate(gerar_movimentacoes(produtos, n_movimentacoes, dias, ate, semente)):
+            bloco[colunas].to_csv(arquivo, index=False, header=numero == 0)
+    produtos.to_csv(caminho_produtos, index=False)
+    return caminho_produtos, caminho_movimentacoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera CSVs sintéticos para testes de desempenho.")
+    parser.add_argument("--tamanho", choices=TAMANHOS, default="100k")
+    parser.add_argument("--pasta", default="data/processed/sinteticos")
+    parser.add_argument("--semente", type=int, default=SEMENTE)
+    opcoes = parser.parse_args()
+
+    inicio = time.perf_counter()
+    caminhos = escrever_csv(os.path.join(opcoes.pasta, opcoes.tamanho), opcoes.tamanho, opcoes.semente)
+    print(f"Gerado em {time.perf_counter() - inicio:.1f} s: {', '.join(caminhos)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#Teste de estresse: vários caixas vendendo o mesmo produto ao mesmo tempo
+#Execute a partir da raiz do projeto:
+#    python -m tests.integracao.stress_concorrencia [--modo threads|processos] [--trabalhadores 8] [--vendas 200]
+#
+#Cada trabalhador registra vendas de 1 unidade do mesmo SKU, que começa com
+#estoque para só metade das tentativas. Ao final confere que nenhuma venda
+#se perdeu (estoque final = inicial - vendas aceitas), que não houve venda
+#acima do estoque e que o estoque bate com o razão de movimentações.
+#Sai com código 1 se alguma checagem falhar. Com --escritor, as vendas passam
+#pelo escritor único de core.escritor (um por processo).
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from utils import config
+
+def _silenciar():
+    # registrar_movimentacao imprime cada recusa; aqui só interessa a contagem
+    sys.stdout = open(os.devnull, "w")
+
+def _iniciar_processo():
+    _silenciar()
+    import core.gerenciamento_estoque  # noqa: F401  (importação fora da medição)
+
+def _aquecer():
+    time.sleep(0.2)
+
+def _vender(caminho, id_produto, vendas, escritor_unico=False):
+    """Trabalhador: tenta `vendas` vendas de 1 unidade. Retorna (aceitas, latências em segundos)."""
+    config.DB_PATH = caminho
+    config.ESCRITOR_UNICO = escritor_unico
+    import core.gerenciamento_estoque as ge
+    from core.conexao import fechar_conexoes
+
+    aceitas, latencias = 0, []
+    for _ in range(vendas):
+        inicio = time.perf_counter()
+        aceitas += bool(ge.registrar_movimentacao(id_produto, "saida", 1, usuario="stress", venda=True))
+        latencias.append(time.perf_counter() - inicio)
+    fechar_conexoes()
+    return aceitas, latencias
+
+def _preparar(caminho, estoque):
+    config.DB_PATH = caminho
+    import core.gerenciamento_estoque as ge
+    from core.conexao import fechar_conexoes
+
+    id_produto = ge.adicionar_produto({"nome": "SKU disputado", "categoria": "Teste", "preco_unitario": 1.0,
+                                       "estoque_atual": estoque})
+    # Conexões não podem atravessar o fork/spawn dos processos trabalhadores
+    fechar_conexoes()
+    return id_produto
+
+def _conferir(caminho, id_produto, estoque_inicial, tentativas, aceitas):
+    config.DB_PATH = caminho
+    from core.conexao import obter_conexao
+    from core.saldos import reconciliar
+
+    con = obter_conexao()
+    estoque_final = con.execute("SELECT estoque_atual FROM produtos WHERE id_produto = ?", (id_produto,)).fetchone()[0]
+    vendas_gravadas = con.execute(
+        "SELECT COUNT(*) FROM movimentacoes WHERE id_produto = ? AND tipo = 'saida' AND usuario = 'stress'",
+        (id_produto,),
+    ).fetchone()[0]
+    return {
+        # Toda recusa deve ser por falta de estoque, nunca por banco ocupado
+        "vendas aceitas até esgotar o estoque": aceitas == min(estoque_inicial, tentativas),
+        "sem atualização perdida": estoque_final == estoque_inicial - aceitas,
+        "sem venda acima do estoque": estoque_final >= 0 and aceitas <= estoque_inicial,
+        "uma movimentação por venda aceita": vendas_gravadas == aceitas,
+        "estoque igual ao razão": reconciliar().empty,
+    }, estoque_final
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Vendas concorrentes do mesmo produto.")
+    parser.add_argument("--modo", choices=("threads", "processos"), default="threads")
+    parser.add_argument("--trabalhadores", type=int, default=8)
+    parser.add_argument("--vendas", type=int, default=200, help="tentativas de venda por trabalhador")
+    parser.add_argument("--estoque", type=int, help="estoque inicial (padrão: metade das tentativas)")
+    parser.add_argument("--escritor", action="store_true", help="grava pelo escritor único (core.escritor)")
+    opcoes = parser.parse_args()
+
+    tentativas = opcoes.trabalhadores * opcoes.vendas
+    estoque = opcoes.estoque if opcoes.estoque is not None else tentativas // 2
+
+    pasta = tempfile.mkdtemp()
+    caminho = os.path.join(pasta, "estoque.db")
+    try:
+        id_produto = _preparar(caminho, estoque)
+        if opcoes.modo == "threads":
+            executor = ThreadPoolExecutor(opcoes.trabalhadores)
+        else:
+            executor = ProcessPoolExecutor(opcoes.trabalhadores, mp_context=multiprocessing.get_context("spawn"),
+                                           initializer=_iniciar_processo)
+
+        stdout = sys.stdout
+        _silenciar()
+        try:
+            with executor:
+                # Sobe todos os trabalhadores antes de medir
+                for futuro in [executor.submit(_aquecer) for _ in range(opcoes.trabalhadores)]:
+                    futuro.result()
+                inicio = time.perf_counter()
+                futuros = [executor.submit(_vender, caminho, id_produto, opcoes.vendas, opcoes.escritor)
+                           for _ in range(opcoes.trabalhadores)]
+                resultados = [f.result() for f in futuros]
+                duracao = time.perf_counter() - inicio
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+        aceitas = sum(r[0] for r in resultados)
+        latencias = sorted(l for r in resultados for l in r[1])
+        checagens, estoque_final = _conferir(caminho, id_produto, estoque, tentativas, aceitas)
+
+        print(f"modo: {opcoes.modo}{' + escritor único' if opcoes.escritor else ''}, "
+              f"trabalhadores: {opcoes.trabalhadores}, tentativas: {tentativas}")
+        print(f"estoque inicial: {estoque}, final: {estoque_final}")
+        print(f"vendas aceitas: {aceitas}, recusadas: {tentativas - aceitas}")
+        print(f"vazão: {tentativas / duracao:,.0f} tentativas/s ({duracao:.2f} s)")
+        print(f"latência: p50 {_percentil(latencias, 50) * 1000:.2f} ms, p99 {_percentil(latencias, 99) * 1000:.2f} ms")
+        for nome, ok in checagens.items():
+            print(f"  [{'ok' if ok else 'FALHOU'}] {nome}")
+        return 0 if all(checagens.values()) else 1
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+if __name__ == "__main__":
+    raise SystemExit(main())
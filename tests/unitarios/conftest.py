@@ -0,0 +1,84 @@
+#Fixtures dos testes automatizados (pytest)
+#Execute a partir da raiz do projeto:
+#    python -m pytest tests/unitarios
+#
+#Cada teste usa um banco SQLite novo em um diretório temporário; o
+#data/raw/estoque.db do projeto nunca é tocado.
+
+import os
+
+import pytest
+
+from core.conexao import fechar_conexoes
+from utils import config
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PRODUTOS_CSV = os.path.join(RAIZ, "data", "raw", "produtos.csv")
+MOVIMENTACOES_CSV = os.path.join(RAIZ, "data", "raw", "movimentacoes.csv")
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """Caminho de um banco vazio (já migrado na primeira conexão), usado como `config.DB_PATH`."""
+    caminho = str(tmp_path / "estoque.db")
+    monkeypatch.setattr(config, "DB_PATH", caminho)
+    monkeypatch.setattr(config, "HISTORICO_ARQUIVO_DIR", str(tmp_path / "historico"))
+    monkeypatch.setattr(config, "ESCRITOR_UNICO", False)
+    yield caminho
+    fechar_conexoes()
+
+
+@pytest.fixture
+def produto(banco):
+    """ID de um produto novo, com 10 unidades em estoque."""
+    from core import estoque_rapido
+
+    return estoque_rapido.adicionar_produto("Produto de teste", 2.0, "Teste", estoque_inicial=10)
+
+
+@pytest.fixture
+def banco_importado(banco):
+    """Banco com os CSVs de exemplo de data/raw importados."""
+    from core.gerenciamento_estoque import importar_csv_para_db
+
+    importar_csv_para_db(PRODUTOS_CSV, MOVIMENTACOES_CSV, progresso=lambda *args: None)
+    return banco
+
+
+@pytest.fixture
+def banco_historico(banco):
+    """Dois produtos com movimentações diárias de janeiro a abril de 2025.
+
+    Todo dia há uma venda de 1 unidade do produto 1 e 2 do produto 2; às
+    segundas, uma perda de 5 unidades do produto 1 (saída que não é venda);
+    no dia 1 de cada mês, uma entrada de 100 de cada. O estoque guardado
+    bate com o razão.
+    """
+    from datetime import date, timedelta
+
+    from core import estoque_rapido
+    from core.conexao import transacao
+
+    for nome in ("Produto A", "Produto B"):
+        estoque_rapido.adicionar_produto(nome, 10.0, "Teste")
+    linhas = []
+    dia = date(2025, 1, 1)
+    while dia < date(2025, 5, 1):
+        if dia.day == 1:
+            linhas += [(1, "entrada", 100, f"{dia} 08:00:00", 0), (2, "entrada", 100, f"{dia} 08:00:00", 0)]
+        linhas += [(1, "saida", 1, f"{dia} 12:00:00", 1), (2, "saida", 2, f"{dia} 12:00:00", 1)]
+        if dia.weekday() == 0:
+            linhas.append((1, "saida", 5, f"{dia} 18:00:00", 0))
+        dia += timedelta(days=1)
+    with transacao(modo="IMMEDIATE") as con:
+        con.executemany(
+            "INSERT INTO movimentacoes (id_produto, tipo, quantidade, data, usuario, venda) "
+            "VALUES (?, ?, ?, ?, 'Teste', ?)",
+            linhas,
+        )
+        con.execute(
+            """UPDATE produtos SET estoque_atual = (
+            SELECT SUM(CASE WHEN tipo = 'entrada' THEN quantidade ELSE -quantidade END)
+            FROM movimentacoes m WHERE m.id_produto = produtos.id_produto)"""
+        )
+    return banco
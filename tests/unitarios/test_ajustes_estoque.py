@@ -0,0 +1,45 @@
+from core import estoque_rapido, gerenciamento_estoque, saldos
+from core.conexao import obter_conexao
+
+
+def _ajustes(id_produto):
+    return obter_conexao().execute(
+        "SELECT tipo, quantidade, venda, observacao FROM movimentacoes WHERE id_produto = ? ORDER BY id_movimentacao",
+        (id_produto,),
+    ).fetchall()
+
+
+def test_estoque_inicial_vira_movimentacao(banco):
+    com_estoque = estoque_rapido.adicionar_produto("Produto A", 2.0, "Teste", estoque_inicial=8)
+    sem_estoque = estoque_rapido.adicionar_produto("Produto B", 2.0, "Teste")
+
+    assert _ajustes(com_estoque) == [("entrada", 8, 0, "Estoque inicial")]
+    assert _ajustes(sem_estoque) == []
+    assert estoque_rapido.estoque(com_estoque) == 8
+    assert saldos.reconciliar().empty
+
+
+def test_edicao_de_estoque_vira_ajuste(banco):
+    id_produto = estoque_rapido.adicionar_produto("Produto A", 2.0, "Teste", estoque_inicial=5)
+
+    estoque_rapido.editar_produto(id_produto, {}, estoque_atual=9)
+    estoque_rapido.editar_produto(id_produto, {}, estoque_atual=2)
+    estoque_rapido.editar_produto(id_produto, {"nome": "Produto A2"}, estoque_atual=2)
+
+    observacao = "Ajuste de estoque (edição do produto)"
+    # Diferença negativa vira saída que não é venda; sem diferença, nada é gravado
+    assert _ajustes(id_produto)[1:] == [("entrada", 4, 0, observacao), ("saida", 7, 0, observacao)]
+    assert estoque_rapido.estoque(id_produto) == 2
+    assert obter_conexao().execute("SELECT COUNT(*) FROM vendas_diarias").fetchone()[0] == 0
+    assert saldos.reconciliar().empty
+
+
+def test_funcoes_do_app_usam_o_razao(banco):
+    produto = {"nome": "Produto A", "categoria": "Teste", "preco_unitario": 2.0, "estoque_atual": 6}
+    id_produto = gerenciamento_estoque.adicionar_produto(produto)
+
+    gerenciamento_estoque.editar_produto(id_produto, {"preco_unitario": 3.0, "estoque_atual": 1})
+
+    assert produto["id_produto"] == id_produto
+    assert [(tipo, quantidade) for tipo, quantidade, _, _ in _ajustes(id_produto)] == [("entrada", 6), ("saida", 5)]
+    assert saldos.reconciliar().empty
@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+from core import estoque_rapido
+from core.busca import consulta_fts
+from core.conexao import obter_conexao
+from core.gerenciamento_estoque import buscar_produto, carregar_produtos
+
+
+@pytest.mark.parametrize("termo", [1, "coca", "Bebidas"])
+def test_busca_igual_a_grade(banco_importado, termo):
+    # O CSV de exemplo grava vendidos_ultimos_30_dias; o valor exibido vem das vendas da janela
+    estoque_rapido.vender(1, 2)
+    grade = carregar_produtos().set_index("id_produto")
+
+    encontrados = buscar_produto(termo)
+
+    assert 1 in encontrados["id_produto"].tolist()
+    assert list(encontrados.columns) == ["id_produto"] + list(grade.columns)
+    pd.testing.assert_frame_equal(
+        encontrados.set_index("id_produto"), grade.loc[encontrados["id_produto"]], check_dtype=False
+    )
+    assert encontrados.set_index("id_produto").loc[1, "vendidos_ultimos_30_dias"] == 2
+
+
+def test_busca_por_classe_sem_termo(banco_importado):
+    assert buscar_produto("", classe="A").empty
+
+
+def _ids(termo):
+    return buscar_produto(termo)["id_produto"].tolist()
+
+
+def _indice_integro():
+    # Com rank = 1 o índice é comparado com o conteúdo de `produtos`; levanta
+    # sqlite3.DatabaseError se divergirem
+    obter_conexao().execute("INSERT INTO produtos_busca(produtos_busca, rank) VALUES ('integrity-check', 1)")
+
+
+def test_indice_acompanha_o_catalogo(banco):
+    novo = estoque_rapido.adicionar_produto("Paçoca Rolha", 0.5, "Doces")
+    assert _ids("pacoca") == [novo]
+    assert _ids("doc") == [novo]
+
+    estoque_rapido.editar_produto(novo, {"nome": "Pé de moleque", "categoria": "Confeitaria"})
+    assert _ids("pacoca") == []
+    assert _ids("moleque") == [novo]
+    assert _ids("confeitaria") == [novo]
+
+    estoque_rapido.remover_produto(novo)
+    assert _ids("moleque") == []
+    _indice_integro()
+
+
+def test_reimportacao_mantem_indice(banco_importado):
+    from core.gerenciamento_estoque import importar_csv_para_db
+    from tests.unitarios.conftest import MOVIMENTACOES_CSV, PRODUTOS_CSV
+
+    importar_csv_para_db(PRODUTOS_CSV, MOVIMENTACOES_CSV, progresso=lambda *args: None)
+
+    _indice_integro()
+    assert _ids("coca") == [1]
+
+
+def test_busca_ignora_acentos(banco_importado):
+    nomes = buscar_produto("guarana")["nome"].tolist()
+    assert nomes and all("Guaraná" in nome for nome in nomes)
+    assert _ids("GUARANÁ") == _ids("guarana")
+
+
+@pytest.mark.parametrize("termo", ['"', "(", "coca)", "NOT", "coca OR", "a*b", "-", "NEAR(coca"])
+def test_sintaxe_fts_nao_levanta_erro(banco_importado, termo):
+    assert isinstance(buscar_produto(termo), pd.DataFrame)
+
+
+def test_consulta_fts_cita_cada_palavra():
+    assert consulta_fts('coca) "2L') == '"coca"* "2L"*'
+    assert consulta_fts("(") is None
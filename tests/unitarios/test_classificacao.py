@@ -0,0 +1,53 @@
+from datetime import date
+
+import pandas as pd
+
+from core import classificacao, estoque_rapido
+from core.conexao import obter_conexao, transacao
+
+HOJE = date(2025, 5, 1)
+
+
+def _vender_em(id_produto, quantidade, data):
+    with transacao(modo="IMMEDIATE") as con:
+        con.execute(
+            "INSERT INTO movimentacoes (id_produto, tipo, quantidade, data, usuario, venda) "
+            "VALUES (?, 'saida', ?, ?, 'Teste', 1)",
+            (id_produto, quantidade, data),
+        )
+
+
+def _classes():
+    return classificacao.classificacoes().drop(columns=["nome", "categoria"])
+
+
+def test_incremental_igual_ao_completo(banco_historico):
+    for nome in ("Produto C", "Produto D"):
+        estoque_rapido.adicionar_produto(nome, 10.0, "Teste")
+    _vender_em(3, 5, "2025-03-03 12:00:00")
+    assert classificacao.classificar_produtos(hoje=HOJE) == 4
+
+    # Na mesma semana: venda retroativa grande do produto 4 e um produto novo
+    # com venda, o que muda a classe ABC dos demais
+    _vender_em(4, 400, "2025-04-02 12:00:00")
+    novo = estoque_rapido.adicionar_produto("Produto E", 1.0, "Teste")
+    _vender_em(novo, 3, "2025-04-10 12:00:00")
+    # Venda depois do fim da janela (domingo, 27/04) não força recálculo do produto 1
+    _vender_em(1, 50, "2025-04-29 12:00:00")
+
+    recalculados = classificacao.classificar_produtos(hoje=HOJE)
+    incremental = _classes()
+
+    assert recalculados == 2
+    classificacao.classificar_produtos(hoje=HOJE, completo=True)
+    pd.testing.assert_frame_equal(incremental, _classes())
+    assert incremental.set_index("id_produto").loc[4, "classe_abc"] == "A"
+
+
+def test_sem_mudancas_nada_e_recalculado(banco_historico):
+    assert classificacao.classificar_produtos(hoje=HOJE) == 2
+    assert classificacao.classificar_produtos(hoje=HOJE) == 0
+
+    estoque_rapido.remover_produto(2)
+    assert classificacao.classificar_produtos(hoje=HOJE) == 0
+    assert obter_conexao().execute("SELECT id_produto FROM classificacao_produtos").fetchall() == [(1,)]
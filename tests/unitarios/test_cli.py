@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from core import estoque_rapido
+from estoque.__main__ import SAIDA_FALHA, SAIDA_OK, SAIDA_USO, main
+
+
+def test_uso_incorreto(banco, capsys):
+    with pytest.raises(SystemExit) as saida:
+        main(["--banco", banco, "comando-inexistente"])
+    assert saida.value.code == SAIDA_USO
+
+
+def test_importar_arquivo_ausente(banco, tmp_path, capsys):
+    codigo = main(["--banco", banco, "importar", "--produtos", str(tmp_path / "nao_existe.csv"), "--movimentacoes", ""])
+
+    assert codigo == SAIDA_FALHA
+    assert "não encontrado" in capsys.readouterr().err
+
+
+def test_estoque_baixo_falhar(produto, banco, capsys):
+    assert main(["--banco", banco, "estoque-baixo", "--limite", "5"]) == SAIDA_OK
+    assert main(["--banco", banco, "estoque-baixo", "--limite", "11"]) == SAIDA_OK
+    assert main(["--banco", banco, "estoque-baixo", "--limite", "5", "--falhar"]) == SAIDA_OK
+    assert main(["--banco", banco, "--formato", "json", "estoque-baixo", "--limite", "11", "--falhar"]) == SAIDA_FALHA
+
+    linhas = capsys.readouterr().out.splitlines()
+    assert json.loads(linhas[-1])["id_produto"] == produto
+
+
+def test_movimentacoes_com_rejeitadas(produto, banco, tmp_path, capsys):
+    arquivo = tmp_path / "lote.csv"
+    arquivo.write_text(
+        "id_produto,tipo,quantidade,venda\n"
+        f"{produto},saida,1,sim\n"
+        f"{produto},saida,10,nao\n",
+        encoding="utf-8",
+    )
+
+    assert main(["--banco", banco, "movimentacoes", str(arquivo)]) == SAIDA_FALHA
+
+    saida = capsys.readouterr()
+    assert saida.out.splitlines() == ["linha,motivo", "1,Quantidade indisponível em estoque"]
+    assert "1 movimentação(ões) aplicada(s), 1 rejeitada(s)." in saida.err
+    assert estoque_rapido.estoque(produto) == 9
+
+
+def test_movimentacoes_sem_rejeitadas(produto, banco, tmp_path, capsys):
+    arquivo = tmp_path / "lote.jsonl"
+    arquivo.write_text(json.dumps({"id_produto": produto, "tipo": "entrada", "quantidade": 4}) + "\n", encoding="utf-8")
+
+    assert main(["--banco", banco, "movimentacoes", str(arquivo)]) == SAIDA_OK
+    assert estoque_rapido.estoque(produto) == 14
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core import estoque_rapido
+from core.conexao import obter_conexao
+from core.estoque_rapido import ConflitoVersao
+
+
+def test_edicao_com_versao_lida(produto):
+    versao = estoque_rapido.produto(produto).versao
+
+    estoque_rapido.editar_produto(produto, {"preco_unitario": 3.0}, versao=versao)
+
+    atual = estoque_rapido.produto(produto)
+    assert atual.preco_unitario == 3.0
+    assert atual.versao == versao + 1
+
+
+def test_edicao_com_versao_antiga(produto):
+    versao = estoque_rapido.produto(produto).versao
+    # Outra pessoa vende depois da leitura: o produto muda de versão
+    estoque_rapido.vender(produto, 1)
+
+    with pytest.raises(ConflitoVersao):
+        estoque_rapido.editar_produto(produto, {"nome": "Outro nome"}, versao=versao)
+    with pytest.raises(ConflitoVersao):
+        estoque_rapido.remover_produto(produto, versao=versao)
+
+    atual = estoque_rapido.produto(produto)
+    assert atual.nome == "Produto de teste"
+    # Sem `versao`, a última escrita vale
+    estoque_rapido.remover_produto(produto)
+    assert estoque_rapido.produto(produto) is None
+
+
+def test_vendas_concorrentes_nao_passam_do_estoque(produto):
+    def vender(_):
+        try:
+            estoque_rapido.vender(produto, 1)
+            return True
+        except ValueError:
+            return False
+
+    with ThreadPoolExecutor(8) as executor:
+        vendidas = sum(executor.map(vender, range(20)))
+
+    assert vendidas == 10
+    assert estoque_rapido.estoque(produto) == 0
+    razao = obter_conexao().execute(
+        "SELECT SUM(CASE WHEN tipo = 'entrada' THEN quantidade ELSE -quantidade END) "
+        "FROM movimentacoes WHERE id_produto = ?",
+        (produto,),
+    ).fetchone()[0]
+    assert razao == 0
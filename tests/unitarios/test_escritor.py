@@ -0,0 +1,56 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core import escritor, estoque_rapido
+from core.conexao import obter_conexao
+from utils import config
+
+
+@pytest.fixture
+def escritor_unico(banco, monkeypatch):
+    monkeypatch.setattr(config, "ESCRITOR_UNICO", True)
+    yield
+    escritor.parar()
+
+
+def _vender(id_produto):
+    try:
+        estoque_rapido.vender(id_produto, 1)
+        return None
+    except ValueError as erro:
+        return str(erro)
+
+
+def test_recusa_nao_afeta_o_grupo(escritor_unico):
+    id_produto = estoque_rapido.adicionar_produto("Produto de teste", 2.0, estoque_inicial=3)
+
+    with ThreadPoolExecutor(8) as executor:
+        motivos = list(executor.map(_vender, [id_produto] * 8))
+
+    assert motivos.count(None) == 3
+    assert set(motivos) - {None} == {"Quantidade indisponível em estoque"}
+    assert estoque_rapido.estoque(id_produto) == 0
+    vendas = obter_conexao().execute(
+        "SELECT COUNT(*) FROM movimentacoes WHERE id_produto = ? AND venda = 1", (id_produto,)
+    ).fetchone()[0]
+    assert vendas == 3
+
+
+def test_motivo_da_recusa(escritor_unico):
+    assert escritor.enviar((999_999, "saida", 1)) == "ID de produto inválido"
+    assert escritor.enviar((1, "troca", 1)) == "Tipo de movimentação inválido"
+
+
+def test_pedido_isolado_nao_espera_a_janela(escritor_unico, monkeypatch):
+    # Sem outros pedidos na fila, o grupo é gravado na hora, não ao fim da janela
+    monkeypatch.setattr(config, "ESCRITOR_JANELA_MS", 2000)
+    id_produto = estoque_rapido.adicionar_produto("Produto de teste", 2.0, estoque_inicial=10)
+    escritor.iniciar()
+
+    inicio = time.perf_counter()
+    for _ in range(5):
+        estoque_rapido.vender(id_produto, 1)
+    assert time.perf_counter() - inicio < 1.0
+    assert estoque_rapido.estoque(id_produto) == 5
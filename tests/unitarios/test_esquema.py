@@ -0,0 +1,107 @@
+import sqlite3
+
+import pytest
+
+from core import esquema
+
+# Esquema do banco antes das migrações: tabelas criadas por
+# `to_sql(if_exists='replace')`, sem chaves, índices nem CHECKs
+BASE_PRODUTOS = """CREATE TABLE "produtos" (
+"id_produto" INTEGER, "nome" TEXT, "categoria" TEXT, "preco_unitario" REAL,
+"estoque_atual" INTEGER, "vendidos_ultimos_30_dias" INTEGER)"""
+BASE_MOVIMENTACOES = """CREATE TABLE "movimentacoes" (
+"id_movimentacao" INTEGER, "id_produto" INTEGER, "tipo" TEXT, "quantidade" INTEGER, "data" TEXT,
+"usuario" TEXT, "observacao" TEXT, "nome" TEXT, "categoria" TEXT)"""
+
+
+@pytest.fixture
+def banco_antigo(tmp_path):
+    con = sqlite3.connect(str(tmp_path / "antigo.db"), isolation_level=None)
+    con.execute(BASE_PRODUTOS)
+    con.execute(BASE_MOVIMENTACOES)
+    con.executemany(
+        "INSERT INTO produtos VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (1, "Coca-Cola 2L", "Bebidas", 8.5, 20, 3),
+            (2, "Guaraná 2L", "Bebidas", 7.0, None, None),
+            # Id repetido (a tabela antiga não tinha chave): vale a última linha
+            (2, "Guaraná Antarctica 2L", "Bebidas", 7.0, 15, 0),
+        ],
+    )
+    con.executemany(
+        "INSERT INTO movimentacoes VALUES (?, ?, ?, ?, ?, 'Sistema', '', NULL, NULL)",
+        [
+            (1, 1, "entrada", 25, "2025-01-01"),
+            (2, 1, "saida", 3, "2025-01-02 10:00:00"),
+            (3, 1, "saida", 2, "2025-01-02 15:00:00"),
+            (4, 2, "entrada", 16, "2025-01-01"),
+            (5, 2, "saida", 1, "2025-01-03 09:00:00"),
+        ],
+    )
+    yield con
+    con.close()
+
+
+def _nomes(con, tipo):
+    return {linha[0] for linha in con.execute("SELECT name FROM sqlite_master WHERE type = ?", (tipo,))}
+
+
+def test_migracao_de_banco_antigo(banco_antigo):
+    con = banco_antigo
+    assert esquema.versao(con) == 0
+
+    assert esquema.migrar(con) == esquema.VERSAO_ATUAL
+    assert esquema.versao(con) == esquema.VERSAO_ATUAL
+
+    tabelas = _nomes(con, "table")
+    assert {"vendas_diarias", "plano_reposicao", "classificacao_produtos", "saldos_estoque",
+            "historico_corte", "historico_arquivado", "mudancas", "mudancas_sequencia"} <= tabelas
+    gatilhos = _nomes(con, "trigger")
+    assert {"vendas_diarias_ai", "vendas_diarias_au", "vendas_diarias_ad", "saldos_estoque_ai",
+            "saldos_estoque_au", "produtos_versao_au", "mudancas_produtos_ai",
+            "mudancas_movimentacoes_ai"} <= gatilhos
+    if esquema._fts5_disponivel(con):
+        assert "produtos_busca" in tabelas
+        assert {"produtos_busca_ai", "produtos_busca_au", "produtos_busca_ad"} <= gatilhos
+    assert "idx_movimentacoes_produto_data" in _nomes(con, "index")
+
+    # Chave primária: duplicata resolvida e colunas novas com padrão
+    assert con.execute("SELECT id_produto, nome, estoque_atual, versao FROM produtos ORDER BY 1").fetchall() == [
+        (1, "Coca-Cola 2L", 20, 0), (2, "Guaraná Antarctica 2L", 15, 0)
+    ]
+    with pytest.raises(sqlite3.IntegrityError):
+        con.execute("INSERT INTO produtos (id_produto, nome, preco_unitario) VALUES (1, 'X', 1)")
+    # O histórico antigo não distinguia vendas: toda saída conta como venda
+    assert con.execute("SELECT id_movimentacao FROM movimentacoes WHERE venda = 1 ORDER BY 1").fetchall() == [
+        (2,), (3,), (5,)
+    ]
+    assert con.execute("SELECT * FROM vendas_diarias ORDER BY 1, 2").fetchall() == [
+        (1, "2025-01-02", 5, 42.5), (2, "2025-01-03", 1, 7.0)
+    ]
+    assert con.execute("SELECT valor FROM mudancas_sequencia").fetchone() == (0,)
+
+
+def test_banco_migrado_funciona_com_os_gatilhos(banco_antigo):
+    con = banco_antigo
+    esquema.migrar(con)
+
+    con.execute(
+        "INSERT INTO movimentacoes (id_movimentacao, id_produto, tipo, quantidade, data, venda) "
+        "VALUES (6, 2, 'saida', 4, '2025-01-03 18:00:00', 1)"
+    )
+    assert con.execute("SELECT quantidade FROM vendas_diarias WHERE id_produto = 2").fetchone() == (5,)
+    with pytest.raises(sqlite3.IntegrityError):
+        con.execute(
+            "INSERT INTO movimentacoes (id_produto, tipo, quantidade, data) VALUES (1, 'devolucao', 1, '2025-01-04')"
+        )
+
+
+def test_migracao_e_idempotente(banco_antigo):
+    con = banco_antigo
+    esquema.migrar(con)
+    antes = con.execute("SELECT type, name, sql FROM sqlite_master ORDER BY 1, 2").fetchall()
+
+    assert esquema.migrar(con) == esquema.VERSAO_ATUAL
+
+    assert con.execute("SELECT type, name, sql FROM sqlite_master ORDER BY 1, 2").fetchall() == antes
+    assert con.execute("SELECT COUNT(*) FROM vendas_diarias").fetchone() == (2,)
@@ -0,0 +1,98 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from core import historico_arquivo, saldos  # noqa: E402
+from core.conexao import obter_conexao, transacao  # noqa: E402
+from core.consultas import buscar_movimentacoes, totais_diarios_movimentacoes  # noqa: E402
+from core.gerenciamento_estoque import carregar_movimentacoes, salvar_movimentacoes  # noqa: E402
+
+HOJE = date(2025, 4, 20)
+
+
+def _tabela(sql):
+    return pd.read_sql_query(sql, obter_conexao())
+
+
+def _retrato():
+    pagina, _ = buscar_movimentacoes(limite=10_000)
+    return {
+        "estoque_fev": saldos.estoque_em(date(2025, 2, 15))[["id_produto", "saldo"]],
+        "estoque_hoje": saldos.estoque_em()[["id_produto", "saldo"]],
+        "divergencias": saldos.reconciliar(),
+        "vendas_diarias": _tabela("SELECT * FROM vendas_diarias ORDER BY id_produto, dia"),
+        "totais": totais_diarios_movimentacoes().sort_values(["data", "nome", "tipo"], ignore_index=True),
+        "historico": pagina[["id_movimentacao", "id_produto", "tipo", "quantidade"]],
+    }
+
+
+def _comparar(antes, depois):
+    for chave in antes:
+        pd.testing.assert_frame_equal(antes[chave], depois[chave], check_dtype=False, obj=chave)
+
+
+def test_compactacao_preserva_consultas(banco_historico):
+    antes = _retrato()
+    assert antes["divergencias"].empty
+
+    resultado = historico_arquivo.compactar(meses_vivos=1, hoje=HOJE)
+
+    assert resultado["meses"] == ["2025-01", "2025-02"]
+    assert resultado["corte"] == "2025-03-01"
+    assert resultado["apagadas"] > 0
+    vivas = obter_conexao().execute("SELECT MIN(data) FROM movimentacoes").fetchone()[0]
+    assert vivas >= "2025-03-01"
+    _comparar(antes, _retrato())
+
+
+def test_recompactacao_com_movimentacao_retroativa(banco_historico):
+    historico_arquivo.compactar(meses_vivos=1, hoje=HOJE)
+    with transacao(modo="IMMEDIATE") as con:
+        con.execute(
+            "INSERT INTO movimentacoes (id_produto, tipo, quantidade, data, usuario, venda) "
+            "VALUES (1, 'entrada', 7, '2025-01-15 10:00:00', 'Teste', 0)"
+        )
+        con.execute("UPDATE produtos SET estoque_atual = estoque_atual + 7 WHERE id_produto = 1")
+    antes = _retrato()
+
+    historico_arquivo.compactar(meses_vivos=1, hoje=HOJE)
+
+    _comparar(antes, _retrato())
+    assert saldos.reconciliar().empty
+
+
+def test_substituicao_mantem_meses_compactados(banco_historico):
+    historico_arquivo.compactar(meses_vivos=1, hoje=HOJE)
+    antes = _retrato()
+    snapshots = _tabela("SELECT * FROM saldos_estoque WHERE dia < '2025-03-01' ORDER BY id_produto, dia")
+    assert not snapshots.empty
+
+    salvar_movimentacoes(carregar_movimentacoes())
+
+    _comparar(antes, _retrato())
+    pd.testing.assert_frame_equal(
+        snapshots, _tabela("SELECT * FROM saldos_estoque WHERE dia < '2025-03-01' ORDER BY id_produto, dia")
+    )
+
+
+
+def test_reimportacao_nao_duplica_meses_compactados(banco_historico, tmp_path):
+    from core.gerenciamento_estoque import importar_csv_para_db
+
+    # O arquivo de origem continua com os meses que vão para o Parquet
+    caminho = tmp_path / "movimentacoes.csv"
+    carregar_movimentacoes().to_csv(caminho, index=False)
+    historico_arquivo.compactar(meses_vivos=1, hoje=HOJE)
+    antes = _retrato()
+    antigas = obter_conexao().execute("SELECT COUNT(*) FROM movimentacoes WHERE data < '2025-03-01'").fetchone()[0]
+
+    importar_csv_para_db("", str(caminho), progresso=lambda *args: None)
+
+    _comparar(antes, _retrato())
+    assert saldos.reconciliar().empty
+    assert obter_conexao().execute(
+        "SELECT COUNT(*) FROM movimentacoes WHERE data < '2025-03-01'"
+    ).fetchone()[0] == antigas
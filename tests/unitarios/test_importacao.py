@@ -0,0 +1,96 @@
+import pandas as pd
+
+from core import esquema, saldos
+from core.conexao import obter_conexao, transacao
+from core.gerenciamento_estoque import importar_csv_para_db
+
+PRODUTOS = pd.DataFrame({
+    "id_produto": [1, 2],
+    "nome": ["Produto A", "Produto B"],
+    "categoria": ["Teste", "Teste"],
+    "preco_unitario": [2.0, 5.0],
+    "estoque_atual": [7, 10],
+})
+
+# Sem a coluna `venda`, como os arquivos antigos: toda saída conta como venda
+MOVIMENTACOES = pd.DataFrame({
+    "id_movimentacao": [1, 2, 3, 4, 5],
+    "id_produto": [1, 1, 2, 2, 1],
+    "tipo": ["entrada", "saida", "entrada", "saida", "saida"],
+    "quantidade": [10, 2, 12, 2, 1],
+    "data": ["2025-01-01 08:00:00", "2025-01-02 12:00:00", "2025-01-01 08:00:00",
+             "2025-01-02 13:00:00", "2025-01-03 12:00:00"],
+    "usuario": ["Teste"] * 5,
+})
+
+
+def _sem_progresso(*args):
+    pass
+
+
+def _gravar(tmp_path, produtos, movimentacoes):
+    caminho_produtos, caminho_movimentacoes = tmp_path / "produtos.csv", tmp_path / "movimentacoes.csv"
+    produtos.to_csv(caminho_produtos, index=False)
+    movimentacoes.to_csv(caminho_movimentacoes, index=False)
+    return str(caminho_produtos), str(caminho_movimentacoes)
+
+
+def _importar(tmp_path, produtos=PRODUTOS, movimentacoes=MOVIMENTACOES, **opcoes):
+    # Blocos de 2 linhas: o upsert atravessa vários blocos
+    return importar_csv_para_db(*_gravar(tmp_path, produtos, movimentacoes), tamanho_chunk=2,
+                                progresso=_sem_progresso, **opcoes)
+
+
+def _tabela(sql):
+    return obter_conexao().execute(sql).fetchall()
+
+
+def _consolidado_confere():
+    antes = _tabela("SELECT * FROM vendas_diarias ORDER BY 1, 2")
+    with transacao() as con:
+        esquema.reconstruir_vendas_diarias(con)
+    return _tabela("SELECT * FROM vendas_diarias ORDER BY 1, 2") == antes
+
+
+def test_importacao_em_blocos(banco, tmp_path):
+    assert _importar(tmp_path) == {"produtos": 2, "movimentacoes": 5}
+
+    assert _tabela("SELECT id_produto, estoque_atual FROM produtos ORDER BY 1") == [(1, 7), (2, 10)]
+    assert _tabela("SELECT id_movimentacao, venda FROM movimentacoes ORDER BY 1") == [
+        (1, 0), (2, 1), (3, 0), (4, 1), (5, 1)
+    ]
+    assert _tabela("SELECT id_produto, dia, quantidade FROM vendas_diarias ORDER BY 1, 2") == [
+        (1, "2025-01-02", 2), (1, "2025-01-03", 1), (2, "2025-01-02", 2)
+    ]
+    assert saldos.reconciliar().empty
+
+
+def test_reimportacao_atualiza_linhas_existentes(banco, tmp_path):
+    _importar(tmp_path)
+    produtos = PRODUTOS.assign(nome=["Produto A2", "Produto B"], estoque_atual=[5, 10])
+    movimentacoes = MOVIMENTACOES.copy()
+    movimentacoes.loc[4, "quantidade"] = 3
+
+    assert _importar(tmp_path, produtos, movimentacoes) == {"produtos": 2, "movimentacoes": 5}
+
+    assert _tabela("SELECT COUNT(*) FROM movimentacoes") == [(5,)]
+    assert _tabela("SELECT nome, estoque_atual FROM produtos WHERE id_produto = 1") == [("Produto A2", 5)]
+    assert _tabela("SELECT quantidade FROM vendas_diarias WHERE id_produto = 1 AND dia = '2025-01-03'") == [(3,)]
+    assert _consolidado_confere()
+    assert saldos.reconciliar().empty
+
+
+def test_importacao_incremental_ignora_linhas_ja_carregadas(banco, tmp_path):
+    _importar(tmp_path, movimentacoes=MOVIMENTACOES.iloc[:3])
+    # Linhas já carregadas mudaram no arquivo, mas a importação incremental não as relê
+    movimentacoes = MOVIMENTACOES.copy()
+    movimentacoes.loc[0, "quantidade"] = 99
+
+    importadas = _importar(tmp_path, movimentacoes=movimentacoes, incremental=True)
+
+    assert importadas["movimentacoes"] == 2
+    assert _tabela("SELECT quantidade FROM movimentacoes WHERE id_movimentacao = 1") == [(10,)]
+    assert _tabela("SELECT COUNT(*) FROM movimentacoes") == [(5,)]
+    assert _consolidado_confere()
+    assert saldos.reconciliar().empty
+    assert _importar(tmp_path, movimentacoes=movimentacoes, incremental=True)["movimentacoes"] == 0
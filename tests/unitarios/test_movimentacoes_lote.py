@@ -0,0 +1,90 @@
+import pytest
+
+from core import estoque_rapido
+from core.conexao import obter_conexao
+from core.gerenciamento_estoque import registrar_movimentacoes_em_lote
+
+
+def _vendas(id_produto):
+    return obter_conexao().execute(
+        "SELECT quantidade FROM movimentacoes WHERE id_produto = ? AND venda = 1 ORDER BY id_movimentacao",
+        (id_produto,),
+    ).fetchall()
+
+
+def test_venda_em_texto(produto):
+    lote = [
+        {"id_produto": produto, "tipo": "saida", "quantidade": 1, "venda": "False"},
+        {"id_produto": produto, "tipo": "saida", "quantidade": 2, "venda": "0"},
+        {"id_produto": produto, "tipo": "saida", "quantidade": 3, "venda": " nao "},
+        {"id_produto": produto, "tipo": "saida", "quantidade": 4, "venda": "Sim"},
+    ]
+
+    resultado = registrar_movimentacoes_em_lote(lote)
+
+    assert resultado == {"aplicadas": 4, "rejeitadas": []}
+    assert _vendas(produto) == [(4,)]
+
+
+def test_venda_irreconhecivel_rejeita_a_linha(produto):
+    lote = [
+        {"id_produto": produto, "tipo": "saida", "quantidade": 1, "venda": "talvez"},
+        {"id_produto": produto, "tipo": "saida", "quantidade": 2, "venda": True},
+    ]
+
+    resultado = registrar_movimentacoes_em_lote(lote)
+
+    assert resultado == {"aplicadas": 1, "rejeitadas": [(0, "Valor de venda inválido")]}
+    assert estoque_rapido.estoque(produto) == 8
+
+
+def test_data_fora_do_padrao_rejeita_a_linha(produto):
+    lote = [
+        {"id_produto": produto, "tipo": "saida", "quantidade": 1, "venda": True, "data": "16/10/2026 10:00"},
+        {"id_produto": produto, "tipo": "saida", "quantidade": 2, "venda": True, "data": "2026-10-16T10:00"},
+    ]
+
+    resultado = registrar_movimentacoes_em_lote(lote)
+
+    assert resultado == {"aplicadas": 1, "rejeitadas": [(0, "Data inválida")]}
+    con = obter_conexao()
+    assert con.execute(
+        "SELECT data FROM movimentacoes WHERE id_produto = ? AND quantidade = 2", (produto,)
+    ).fetchone()[0] == "2026-10-16 10:00:00"
+    assert con.execute("SELECT dia FROM vendas_diarias WHERE id_produto = ?", (produto,)).fetchall() == [("2026-10-16",)]
+
+
+def test_politica_parcial_aplica_as_validas(produto):
+    lote = [
+        {"id_produto": produto, "tipo": "saida", "quantidade": 4},
+        {"id_produto": produto, "tipo": "saida", "quantidade": 50},
+        {"id_produto": 999, "tipo": "entrada", "quantidade": 1},
+        {"id_produto": produto, "tipo": "entrada", "quantidade": 3},
+    ]
+
+    resultado = registrar_movimentacoes_em_lote(lote, politica="parcial")
+
+    assert resultado["aplicadas"] == 2
+    assert resultado["rejeitadas"] == [(1, "Quantidade indisponível em estoque"), (2, "ID de produto inválido")]
+    assert estoque_rapido.estoque(produto) == 9
+
+
+def test_politica_tudo_ou_nada_desfaz_o_lote(produto):
+    # A linha inválida está no segundo bloco: o primeiro já gravado também é desfeito
+    lote = [
+        {"id_produto": produto, "tipo": "saida", "quantidade": 1, "venda": True},
+        {"id_produto": produto, "tipo": "entrada", "quantidade": 5},
+        {"id_produto": produto, "tipo": "devolucao", "quantidade": 1},
+    ]
+    antes = obter_conexao().execute("SELECT COUNT(*) FROM movimentacoes").fetchone()[0]
+
+    resultado = registrar_movimentacoes_em_lote(lote, politica="tudo_ou_nada", tamanho_bloco=2)
+
+    assert resultado == {"aplicadas": 0, "rejeitadas": [(2, "Tipo de movimentação inválido")]}
+    assert estoque_rapido.estoque(produto) == 10
+    assert obter_conexao().execute("SELECT COUNT(*) FROM movimentacoes").fetchone()[0] == antes
+
+
+def test_politica_invalida(produto):
+    with pytest.raises(ValueError):
+        registrar_movimentacoes_em_lote([], politica="algumas")
@@ -0,0 +1,54 @@
+from core import estoque_rapido, mudancas
+from core.gerenciamento_estoque import importar_csv_para_db
+
+from tests.unitarios.conftest import MOVIMENTACOES_CSV, PRODUTOS_CSV
+
+
+def _sem_progresso(*args):
+    pass
+
+
+def test_reimportacao_com_upsert(banco_importado):
+    # O UPSERT da importação cai no DO UPDATE em todas as linhas
+    seq = mudancas.ultima_sequencia()
+    importadas = importar_csv_para_db(PRODUTOS_CSV, MOVIMENTACOES_CSV, progresso=_sem_progresso)
+    assert importadas["produtos"] > 0 and importadas["movimentacoes"] > 0
+    assert mudancas.ultima_sequencia() > seq
+
+    importadas = importar_csv_para_db(PRODUTOS_CSV, MOVIMENTACOES_CSV, incremental=True, progresso=_sem_progresso)
+    assert importadas["movimentacoes"] == 0
+
+
+def test_uma_linha_por_registro_com_a_ultima_sequencia(banco_importado):
+    seq = mudancas.ultima_sequencia()
+    estoque_rapido.registrar_movimentacao(1, "entrada", 5)
+    estoque_rapido.vender(1, 2)
+
+    novas = mudancas.mudancas_desde(seq)
+    assert {(m.tabela, m.id_registro) for m in novas} == {("produtos", 1), ("movimentacoes", 1)}
+    assert [m.seq for m in novas] == sorted(m.seq for m in novas)
+    assert max(m.seq for m in novas) == mudancas.ultima_sequencia()
+
+
+def test_resumo_de_insercao_edicao_e_remocao(banco_importado):
+    seq = mudancas.ultima_sequencia()
+    novo = estoque_rapido.adicionar_produto("Produto de teste", 3.5, "Teste", estoque_inicial=4)
+    estoque_rapido.editar_produto(2, {"nome": "Renomeado"})
+    estoque_rapido.remover_produto(3)
+
+    resumo = mudancas.resumir(mudancas.mudancas_desde(seq))
+    assert resumo["produtos"] == {novo, 2}
+    assert resumo["removidos"] == {3}
+    assert resumo["movimentacoes"] == {novo}
+    assert resumo["seq"] == mudancas.ultima_sequencia()
+
+
+def test_limite_e_continuacao(banco_importado):
+    seq = mudancas.ultima_sequencia()
+    for id_produto in (1, 2, 4):
+        estoque_rapido.registrar_movimentacao(id_produto, "entrada", 1)
+
+    primeiras = mudancas.mudancas_desde(seq, limite=2)
+    resto = mudancas.mudancas_desde(primeiras[-1].seq)
+    assert len(primeiras) == 2
+    assert len(primeiras) + len(resto) == len(mudancas.mudancas_desde(seq))
@@ -0,0 +1,26 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from core import historico_arquivo
+from core.previsao_demanda import matriz_demanda
+
+
+def test_matriz_so_com_vendas(banco_historico):
+    ids, inicio, matriz = matriz_demanda(dias=31, ate=date(2025, 1, 31))
+
+    assert ids.tolist() == [1, 2]
+    assert inicio == date(2025, 1, 1)
+    # As perdas de segunda-feira do produto 1 não são demanda
+    np.testing.assert_array_equal(matriz[0], np.ones(31))
+    np.testing.assert_array_equal(matriz[1], np.full(31, 2))
+
+
+def test_matriz_igual_depois_da_compactacao(banco_historico):
+    pytest.importorskip("pyarrow")
+    antes = matriz_demanda(dias=120, ate=date(2025, 4, 30))[2]
+
+    historico_arquivo.compactar(meses_vivos=1, hoje=date(2025, 4, 20))
+
+    np.testing.assert_array_equal(antes, matriz_demanda(dias=120, ate=date(2025, 4, 30))[2])
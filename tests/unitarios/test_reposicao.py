@@ -0,0 +1,61 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from core import estoque_rapido, reposicao
+
+HOJE = date(2025, 4, 30)
+PARAMETROS = {"janela_dias": 30, "prazo_dias": 7, "nivel_servico": 0.95, "cobertura_dias": 14}
+
+
+def test_calcular_plano():
+    estatisticas = pd.DataFrame({
+        "id_produto": [1, 2, 3],
+        "estoque_atual": [10, 100, 0],
+        # 2 por dia todos os dias; 60 em um único dia; nada vendido
+        "total": [60, 60, 0],
+        "total_quadrados": [120, 3600, 0],
+    })
+
+    plano = reposicao.calcular_plano(estatisticas, PARAMETROS).set_index("id_produto")
+
+    # Venda constante: sem estoque de segurança
+    assert plano.loc[1, "media_diaria"] == pytest.approx(2.0)
+    assert plano.loc[1, "estoque_seguranca"] == pytest.approx(0.0)
+    assert plano.loc[1, "ponto_pedido"] == pytest.approx(14.0)
+    assert plano.loc[1, "repor"] == 1
+    assert plano.loc[1, "quantidade_sugerida"] == 14 + 28 - 10
+    # Mesma média com picos: o estoque de segurança cobre o desvio
+    assert plano.loc[2, "estoque_seguranca"] > 0
+    assert plano.loc[2, "ponto_pedido"] > plano.loc[1, "ponto_pedido"]
+    # Sem vendas e sem estoque: repor, mas sem quantidade estimada
+    assert plano.loc[3, "repor"] == 1
+    assert plano.loc[3, "quantidade_sugerida"] == 0
+    assert pd.isna(plano.loc[3, "dias_cobertura"])
+
+
+def test_plano_recalcula_so_o_necessario(banco_historico):
+    assert reposicao.atualizar_plano(hoje=HOJE, **PARAMETROS) == 2
+    assert reposicao.atualizar_plano(hoje=HOJE, **PARAMETROS) == 0
+
+    estoque_rapido.vender(1, 1)
+    assert reposicao.atualizar_plano(hoje=HOJE, **PARAMETROS) == 1
+
+    # Outro dia ou outros parâmetros refazem o catálogo inteiro
+    assert reposicao.atualizar_plano(hoje=date(2025, 5, 1), **PARAMETROS) == 2
+    assert reposicao.atualizar_plano(hoje=date(2025, 5, 1), **{**PARAMETROS, "prazo_dias": 30}) == 2
+
+
+def test_planejar_reposicao(banco_historico):
+    sem_estoque = estoque_rapido.adicionar_produto("Produto C", 5.0, "Teste")
+
+    plano = reposicao.planejar_reposicao(hoje=HOJE, **{**PARAMETROS, "prazo_dias": 200})
+
+    # Com 200 dias de prazo, os dois produtos com venda precisam de pedido
+    assert set(plano["id_produto"]) == {1, 2, sem_estoque}
+    assert (plano["repor"] == 1).all()
+    # O produto 2 vende o dobro com menos estoque: vem antes do 1
+    ordem = [i for i in plano["id_produto"] if i != sem_estoque]
+    assert ordem == [2, 1]
+    assert len(reposicao.planejar_reposicao(hoje=HOJE, **PARAMETROS)) == 1
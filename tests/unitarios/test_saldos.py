@@ -0,0 +1,121 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from core import saldos
+from core.conexao import obter_conexao, transacao
+from estoque.__main__ import SAIDA_OK
+from estoque.__main__ import main as cli
+from utils import config
+
+
+def _razao(ate):
+    return dict(obter_conexao().execute(
+        "SELECT id_produto, SUM(CASE WHEN tipo = 'entrada' THEN quantidade ELSE -quantidade END) "
+        "FROM movimentacoes WHERE data < ? GROUP BY id_produto",
+        (ate,),
+    ).fetchall())
+
+
+def _estoque_em(momento):
+    return dict(saldos.estoque_em(momento)[["id_produto", "saldo"]].itertuples(index=False, name=None))
+
+
+def test_estoque_em_com_e_sem_snapshot(banco_historico):
+    sem_snapshot = saldos.estoque_em(date(2025, 2, 15))
+    assert sem_snapshot["dia_snapshot"].isna().all()
+    assert _estoque_em(date(2025, 2, 15)) == _razao("2025-02-16")
+
+    saldos.gerar_snapshot(date(2025, 1, 31))
+
+    com_snapshot = saldos.estoque_em(date(2025, 2, 15))
+    assert (com_snapshot["dia_snapshot"] == "2025-01-31").all()
+    assert _estoque_em(date(2025, 2, 15)) == _razao("2025-02-16")
+    # Datetime: só o que aconteceu até o instante (a venda das 12h ainda não)
+    assert _estoque_em(datetime(2025, 2, 15, 10, 0)) == _razao("2025-02-15 10:00:00")
+    assert _estoque_em(None) == _razao("9999-12-31")
+
+
+def test_movimentacao_retroativa_ajusta_snapshot(banco_historico):
+    saldos.gerar_snapshot(date(2025, 1, 31))
+    with transacao(modo="IMMEDIATE") as con:
+        con.execute(
+            "INSERT INTO movimentacoes (id_produto, tipo, quantidade, data, usuario, venda) "
+            "VALUES (1, 'entrada', 7, '2025-01-15 10:00:00', 'Teste', 0)"
+        )
+
+    assert _estoque_em(date(2025, 1, 31)) == _razao("2025-02-01")
+
+
+def test_atualizar_snapshots_respeita_intervalo(banco_historico, monkeypatch):
+    monkeypatch.setattr(config, "SALDOS_INTERVALO_DIAS", 30)
+
+    assert saldos.atualizar_snapshots(hoje=date(2025, 3, 1)) == date(2025, 2, 28)
+    assert saldos.atualizar_snapshots(hoje=date(2025, 3, 20)) is None
+    assert saldos.atualizar_snapshots(hoje=date(2025, 4, 1)) == date(2025, 3, 31)
+
+    dias = [linha[0] for linha in obter_conexao().execute("SELECT DISTINCT dia FROM saldos_estoque ORDER BY dia")]
+    assert dias == ["2025-02-28", "2025-03-31"]
+    assert _estoque_em(date(2025, 4, 10)) == _razao("2025-04-11")
+
+
+def test_cli_snapshot(banco_historico, capsys):
+    assert cli(["--banco", banco_historico, "snapshot", "--dia", "2025-03-31"]) == SAIDA_OK
+    assert capsys.readouterr().out.splitlines() == ["dia", "2025-03-31"]
+    assert obter_conexao().execute("SELECT COUNT(*) FROM saldos_estoque WHERE dia = '2025-03-31'").fetchone()[0] == 2
+
+    # Job diário: o último snapshot é antigo, então grava o de ontem e reconcilia
+    assert saldos.main(["--snapshot"]) == 0
+    ontem = (date.today() - timedelta(days=1)).isoformat()
+    assert obter_conexao().execute("SELECT MAX(dia) FROM saldos_estoque").fetchone()[0] == ontem
+
+
+def _desviar_estoque(id_produto, diferenca):
+    with transacao(modo="IMMEDIATE") as con:
+        con.execute("UPDATE produtos SET estoque_atual = estoque_atual + ? WHERE id_produto = ?", (diferenca, id_produto))
+
+
+def _estoque_guardado(id_produto):
+    return obter_conexao().execute("SELECT estoque_atual FROM produtos WHERE id_produto = ?", (id_produto,)).fetchone()[0]
+
+
+def test_reconciliar_sem_correcao(banco_historico):
+    assert saldos.reconciliar().empty
+    guardado = _estoque_guardado(1)
+    _desviar_estoque(1, 3)
+
+    divergencias = saldos.reconciliar()
+
+    assert divergencias[["id_produto", "diferenca"]].values.tolist() == [[1, 3]]
+    assert _estoque_guardado(1) == guardado + 3
+    assert saldos.main([]) == 1
+
+
+def test_reconciliar_corrigindo_estoque(banco_historico):
+    guardado = _estoque_guardado(1)
+    _desviar_estoque(1, 3)
+
+    assert len(saldos.reconciliar(corrigir="estoque")) == 1
+
+    assert _estoque_guardado(1) == guardado
+    assert saldos.reconciliar().empty
+
+
+def test_reconciliar_corrigindo_movimentacoes(banco_historico):
+    guardado = _estoque_guardado(1)
+    _desviar_estoque(1, -4)
+
+    assert len(saldos.reconciliar(corrigir="movimentacoes")) == 1
+
+    # A contagem guardada vale; o razão ganha um ajuste de saída de 4
+    assert _estoque_guardado(1) == guardado - 4
+    ajuste = obter_conexao().execute(
+        "SELECT tipo, quantidade, venda FROM movimentacoes WHERE observacao = 'Ajuste de reconciliação'"
+    ).fetchall()
+    assert ajuste == [("saida", 4, 0)]
+    assert saldos.reconciliar().empty
+
+
+def test_reconciliar_correcao_invalida(banco_historico):
+    with pytest.raises(ValueError):
+        saldos.reconciliar(corrigir="tudo")
@@ -0,0 +1,61 @@
+import pandas as pd
+
+from core import esquema
+from core.conexao import obter_conexao, transacao
+from core.gerenciamento_estoque import importar_csv_para_db
+from tests.unitarios.conftest import MOVIMENTACOES_CSV, PRODUTOS_CSV
+
+
+def _consolidado(con):
+    return con.execute("SELECT COALESCE(SUM(quantidade), 0) FROM vendas_diarias").fetchone()[0]
+
+
+def _vendas(con):
+    return con.execute(
+        "SELECT COALESCE(SUM(quantidade), 0) FROM movimentacoes WHERE tipo = 'saida' AND venda = 1"
+    ).fetchone()[0]
+
+
+def _bate_com_reconstrucao(con):
+    antes = con.execute("SELECT * FROM vendas_diarias ORDER BY 1, 2").fetchall()
+    with transacao() as con:
+        esquema.reconstruir_vendas_diarias(con)
+    return con.execute("SELECT * FROM vendas_diarias ORDER BY 1, 2").fetchall() == antes
+
+
+def test_alterar_e_apagar_venda(banco_historico):
+    con = obter_conexao()
+    total = _consolidado(con)
+    id_venda = con.execute(
+        "SELECT id_movimentacao FROM movimentacoes WHERE id_produto = 2 AND venda = 1 AND data LIKE '2025-03-10%'"
+    ).fetchone()[0]
+
+    con.execute("UPDATE movimentacoes SET quantidade = 7 WHERE id_movimentacao = ?", (id_venda,))
+    assert _consolidado(con) == total + 5
+    con.execute("UPDATE movimentacoes SET data = '2025-03-11 12:00:00' WHERE id_movimentacao = ?", (id_venda,))
+    dias = dict(con.execute("SELECT dia, quantidade FROM vendas_diarias WHERE id_produto = 2 "
+                            "AND dia IN ('2025-03-10', '2025-03-11')").fetchall())
+    assert dias == {"2025-03-11": 9}
+    # Deixar de ser venda (ex.: virou perda) também sai do consolidado
+    con.execute("UPDATE movimentacoes SET venda = 0 WHERE id_movimentacao = ?", (id_venda,))
+    assert _consolidado(con) == total - 2
+
+    con.execute("UPDATE movimentacoes SET venda = 1 WHERE id_movimentacao = ?", (id_venda,))
+    con.execute("DELETE FROM movimentacoes WHERE id_movimentacao = ?", (id_venda,))
+    assert _consolidado(con) == total - 2
+    assert _bate_com_reconstrucao(con)
+
+
+def test_reimportar_com_quantidades_alteradas(banco_importado, tmp_path):
+    con = obter_conexao()
+    vendidas = _consolidado(con)
+    # Cai no ON CONFLICT DO UPDATE: só os gatilhos de UPDATE rodam
+    movimentacoes = pd.read_csv(MOVIMENTACOES_CSV)
+    movimentacoes["quantidade"] *= 10
+    caminho = tmp_path / "movimentacoes.csv"
+    movimentacoes.to_csv(caminho, index=False)
+
+    importar_csv_para_db(PRODUTOS_CSV, str(caminho), progresso=lambda *args: None)
+
+    assert _consolidado(con) == _vendas(con) == 10 * vendidas
+    assert _bate_com_reconstrucao(con)
@@ -0,0 +1,53 @@
+# Configurações globais e constantes do sistema
+
+DB_PATH = "data/raw/estoque.db"
+
+# Pragmas aplicados uma única vez em cada conexão SQLite
+SQLITE_JOURNAL_MODE = "WAL"
+SQLITE_SYNCHRONOUS = "NORMAL"
+SQLITE_CACHE_KB = 16 * 1024             # cache de páginas por conexão (16 MiB)
+SQLITE_MMAP_BYTES = 256 * 1024 * 1024   # leitura via mmap (256 MiB)
+SQLITE_BUSY_TIMEOUT_MS = 5000
+
+# Novas tentativas ao abrir uma transação com o banco ocupado (SQLITE_BUSY)
+SQLITE_TENTATIVAS_OCUPADO = 5
+SQLITE_ESPERA_INICIAL_S = 0.05          # dobra a cada tentativa, com variação aleatória
+
+# Previsão de demanda
+PREVISAO_HISTORICO_DIAS = 730           # histórico usado para ajustar os modelos
+PREVISAO_HORIZONTE_DIAS = 30            # dias à frente previstos
+PREVISAO_DIR = "data/processed/previsao"  # matrizes, checkpoints e modelos escolhidos
+
+# Planejamento de reposição
+REPOSICAO_JANELA_DIAS = 90              # histórico de vendas usado para a velocidade
+REPOSICAO_PRAZO_ENTREGA_DIAS = 7        # lead time do fornecedor
+REPOSICAO_NIVEL_SERVICO = 0.95          # probabilidade de não faltar durante o prazo
+REPOSICAO_COBERTURA_DIAS = 14           # dias de venda cobertos por cada pedido
+
+# Classificação de produtos (ABC/XYZ/sazonalidade)
+CLASSIFICACAO_SEMANAS = 52              # semanas completas analisadas
+CLASSIFICACAO_LIMITES_ABC = (0.8, 0.95) # receita acumulada que fecha as classes A e B
+CLASSIFICACAO_LIMITES_XYZ = (0.5, 1.0)  # coeficiente de variação semanal que fecha X e Y
+CLASSIFICACAO_LIMITE_SAZONAL = 0.5      # índice de sazonalidade a partir do qual o produto é sazonal
+CLASSIFICACAO_MIN_SEMANAS_SAZONAL = 4   # semanas com venda exigidas para avaliar sazonalidade
+
+# Saldos de estoque (snapshots do razão de movimentações)
+SALDOS_INTERVALO_DIAS = 30              # dias entre um snapshot e o seguinte
+
+# Escritor único (`core.escritor`): movimentações gravadas em grupo por uma só thread
+ESCRITOR_UNICO = False                  # desligado: cada chamada abre sua própria transação
+ESCRITOR_JANELA_MS = 5                  # teto do tempo coletando pedidos para um grupo (não é uma espera fixa)
+ESCRITOR_LOTE_MAX = 500                 # pedidos por grupo
+ESCRITOR_TIMEOUT_S = 30                 # espera máxima pelo resultado de um pedido
+
+# Instrumentação (`core.metricas`): latência, consultas e linhas por operação
+METRICAS_ATIVAS = False                 # também pode ser ligada na página "Diagnóstico" do app
+METRICAS_ARQUIVO = "data/processed/metricas.prom"  # .json grava JSON; outra extensão, texto do Prometheus
+METRICAS_INTERVALO_S = 60               # intervalo mínimo entre exportações automáticas
+
+# Histórico compactado (`core.historico_arquivo`): meses fechados em Parquet
+HISTORICO_ARQUIVO_DIR = "data/processed/historico"  # partições ano=AAAA/mes=MM
+HISTORICO_MESES_VIVOS = 3               # meses fechados mantidos no SQLite além do mês atual
+
+# Feed de mudanças (`core.mudancas`): atualização ao vivo das telas do app
+MUDANCAS_INTERVALO_S = 5                # intervalo de consulta ao feed; 0 desliga a atualização automática
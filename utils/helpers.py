@@ -1,6 +1,16 @@
+_TROCA_SEPARADORES = str.maketrans(",.", ".,")
+
 def formatar_preco(valor):
     return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
+def formatar_precos(valores):
+    """`formatar_preco` para uma Series inteira (ex.: a página visível da grade); nulos ficam nulos.
+
+    Um único `map` com o formatador nativo e a troca de separadores em
+    `str.translate`, em vez de três `replace` por valor via `.apply`.
+    """
+    return "R$ " + valores.map("{:,.2f}".format, na_action="ignore").str.translate(_TROCA_SEPARADORES)
+
 def formatar_nomes_colunas(df):
     df = df.copy()
     nomes_personalizados = {